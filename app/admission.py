@@ -0,0 +1,169 @@
+from contextlib import asynccontextmanager
+from collections import Counter, deque
+import asyncio
+import math
+import time
+
+import metrics
+
+class Overloaded(Exception):
+    """
+    Raised by AdmissionController.acquire() when a request is shed.
+    `reason` is "queue_full", "predicted_wait" or "wait_timeout";
+    `retry_after` is a whole number of seconds for the Retry-After header.
+    """
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class Slot:
+    """
+    One admitted request. release() is idempotent, so a streaming response
+    can release from both its generator and the response that sends it.
+    """
+
+    __slots__ = ("controller", "wait", "start", "released")
+
+    def __init__(self, controller, wait):
+        self.controller = controller
+        self.wait = wait
+        self.start = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(time.monotonic() - self.start)
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO queue in front of the LLM stages.
+    At most `max_concurrency` requests hold a slot; up to `max_queue` more
+    wait for one. A request is shed instead of queued when the queue is full
+    or when its predicted wait (queue position x recent slot hold time /
+    slots) exceeds `max_wait`, and is shed from the queue once it has waited
+    `max_wait` seconds. max_concurrency <= 0 disables the limit.
+
+    Used from the event loop only (not thread-safe).
+    """
+
+    def __init__(self, max_concurrency, max_queue, max_wait, initial_hold_seconds=2.0, smoothing=0.2):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.smoothing = smoothing
+        self.hold_seconds = initial_hold_seconds # EWMA of how long a request keeps its slot
+        self.active = 0
+        self._waiters = deque()
+        self._counts = Counter()
+
+    @property
+    def enabled(self):
+        return self.max_concurrency > 0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def predicted_wait(self, position):
+        """
+        Expected seconds until the request at queue `position` (1 = next) gets a slot.
+        """
+        return position * self.hold_seconds / max(self.max_concurrency, 1)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.predicted_wait(self.queued + 1)))
+
+    def _shed(self, reason, waited=0.0):
+        self._counts[reason] += 1
+        metrics.admission.inc(result=reason)
+        if waited:
+            metrics.admission_wait_seconds.observe(waited, result=reason)
+        raise Overloaded(reason, self.retry_after())
+
+    def _admit(self, waited):
+        self._counts["admitted"] += 1
+        metrics.admission.inc(result="admitted")
+        metrics.admission_wait_seconds.observe(waited, result="admitted")
+        return Slot(self, waited)
+
+    async def acquire(self):
+        """
+        Waits for a slot (FIFO) and returns it; the caller must release() it.
+
+        Raises:
+            Overloaded: If the request is shed.
+        """
+        if not self.enabled:
+            return Slot(self, 0.0)
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return self._admit(0.0)
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+        if self.predicted_wait(len(self._waiters) + 1) > self.max_wait:
+            self._shed("predicted_wait")
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait([waiter], timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self._shed("wait_timeout", time.monotonic() - start)
+        return self._admit(time.monotonic() - start)
+
+    def _abandon(self, waiter):
+        """
+        Leaves the queue; a slot handed over at the same moment is passed on.
+        """
+        if waiter.done():
+            self._release(None)
+        else:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def _release(self, held_seconds):
+        if not self.enabled:
+            return
+        if held_seconds is not None:
+            self.hold_seconds += self.smoothing * (held_seconds - self.hold_seconds)
+        # Hand the slot straight to the oldest waiter (active count unchanged)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        `async with controller.slot() as slot:` around the admitted work.
+        """
+        admitted = await self.acquire()
+        try:
+            yield admitted
+        finally:
+            admitted.release()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "active": self.active,
+            "queued": self.queued,
+            "hold_seconds_ewma": round(self.hold_seconds, 3),
+            "counts": dict(self._counts),
+        }
@@ -0,0 +1,273 @@
+import rdflib
+from rdflib import RDF, RDFS
+from array import array
+from collections import deque
+import sys
+
+from graph_loader import graph_version
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+# Node type codes stored in GraphEngine.types
+NODE_TYPES = ("Other", "Subject", "Chapter", "Section", "Concept")
+
+# Predicates compiled into CSR adjacency (forward and reverse)
+DEFAULT_PREDICATES = {
+    "prerequisiteOf": NS.prerequisiteOf,
+    "hasChapter": NS.hasChapter,
+    "hasSection": NS.hasSection,
+    "hasConcept": NS.hasConcept,
+}
+
+HIERARCHY_PREDICATES = ("hasChapter", "hasSection", "hasConcept")
+
+class CSR:
+    """
+    Compressed sparse row adjacency: the neighbors of node i are
+    targets[offsets[i]:offsets[i + 1]] (int32 arrays).
+    """
+
+    def __init__(self, n_nodes, edges):
+        counts = [0] * (n_nodes + 1)
+        for src, _ in edges:
+            counts[src + 1] += 1
+        for i in range(n_nodes):
+            counts[i + 1] += counts[i]
+        self.offsets = array("i", counts)
+
+        fill = list(counts[:-1])
+        targets = [0] * len(edges)
+        for src, dst in edges:
+            targets[fill[src]] = dst
+            fill[src] += 1
+        self.targets = array("i", targets)
+
+    def neighbors(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def degree(self, i):
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def add(self, src, dst):
+        """
+        Appends dst to the neighbors of src in place (O(n + E) array shift).
+        """
+        self.targets.insert(self.offsets[src + 1], dst)
+        for i in range(src + 1, len(self.offsets)):
+            self.offsets[i] += 1
+
+    def nbytes(self):
+        return self.offsets.itemsize * len(self.offsets) + self.targets.itemsize * len(self.targets)
+
+class GraphEngine:
+    """
+    Compact in-memory engine for prerequisite / hierarchy traversal.
+
+    Every URI node is interned to an integer ID with parallel label and type
+    arrays, and each predicate is stored as forward + reverse CSR adjacency.
+    Traversals work on integer IDs only; convert with node_id()/uri()/label().
+    """
+
+    def __init__(self, uris, labels, types, edges_by_predicate):
+        self.uris = uris
+        self.labels = labels
+        self.types = array("b", types)
+        self.ids = {uri: i for i, uri in enumerate(uris)}
+        self.predicates = tuple(edges_by_predicate)
+
+        self._out = {}
+        self._in = {}
+        for name, edges in edges_by_predicate.items():
+            self._out[name] = CSR(len(uris), edges)
+            self._in[name] = CSR(len(uris), [(dst, src) for src, dst in edges])
+
+        self._by_label = {}
+        for i, label in enumerate(labels):
+            self._by_label.setdefault(label, []).append(i)
+
+    def __len__(self):
+        return len(self.uris)
+
+    # --- Node lookup ---
+
+    def node_id(self, uri):
+        return self.ids.get(rdflib.URIRef(uri), -1)
+
+    def uri(self, i):
+        return self.uris[i]
+
+    def label(self, i):
+        return self.labels[i]
+
+    def node_type(self, i):
+        return NODE_TYPES[self.types[i]]
+
+    def find(self, label, node_type=None):
+        """
+        Node IDs with exactly this label, optionally restricted to a type ("Section", ...).
+        """
+        ids = self._by_label.get(label, [])
+        if node_type:
+            code = NODE_TYPES.index(node_type)
+            ids = [i for i in ids if self.types[i] == code]
+        return list(ids)
+
+    def add_edge(self, predicate, src, dst):
+        """
+        Adds one `src predicate dst` edge to the forward and reverse CSR
+        (for incremental updates; both nodes must already be interned).
+        """
+        self._out[predicate].add(src, dst)
+        self._in[predicate].add(dst, src)
+
+    # --- Traversal ---
+
+    def _adjacency(self, predicates, direction):
+        predicates = self.predicates if predicates is None else ([predicates] if isinstance(predicates, str) else predicates)
+        tables = []
+        if direction in ("out", "both"):
+            tables.extend(self._out[p] for p in predicates)
+        if direction in ("in", "both"):
+            tables.extend(self._in[p] for p in predicates)
+        return tables
+
+    def neighbors(self, node, predicates=None, direction="out"):
+        """
+        Direct neighbors of a node over the given predicate(s).
+        direction: "out" (node -> x), "in" (x -> node) or "both".
+        """
+        result = []
+        for csr in self._adjacency(predicates, direction):
+            result.extend(csr.neighbors(node))
+        return result
+
+    def k_hop(self, nodes, predicates=None, k=1, direction="both"):
+        """
+        Breadth-first expansion up to k hops from the seed nodes.
+
+        Returns:
+            dict: node ID -> hop distance (seeds have distance 0).
+        """
+        tables = self._adjacency(predicates, direction)
+        dist = {n: 0 for n in nodes}
+        frontier = list(dist)
+        for hop in range(1, k + 1):
+            nxt = []
+            for n in frontier:
+                for csr in tables:
+                    for m in csr.targets[csr.offsets[n]:csr.offsets[n + 1]]:
+                        if m not in dist:
+                            dist[m] = hop
+                            nxt.append(m)
+            if not nxt:
+                break
+            frontier = nxt
+        return dist
+
+    def _closure(self, node, tables):
+        seen = set()
+        queue = deque([node])
+        while queue:
+            n = queue.popleft()
+            for csr in tables:
+                for m in csr.targets[csr.offsets[n]:csr.offsets[n + 1]]:
+                    if m not in seen:
+                        seen.add(m)
+                        queue.append(m)
+        seen.discard(node)
+        return seen
+
+    def ancestors(self, node, predicates="prerequisiteOf"):
+        """
+        All nodes that reach `node` through the predicate(s): for prerequisiteOf
+        everything upstream, for the hierarchy predicates its Section/Chapter/Subject.
+        """
+        return self._closure(node, self._adjacency(predicates, "in"))
+
+    def descendants(self, node, predicates="prerequisiteOf"):
+        """
+        All nodes reachable from `node` through the predicate(s).
+        """
+        return self._closure(node, self._adjacency(predicates, "out"))
+
+    def hierarchy_path(self, node):
+        """
+        [node, parent, grandparent, ...] following hasConcept/hasSection/hasChapter upwards.
+        """
+        path = [node]
+        tables = self._adjacency(HIERARCHY_PREDICATES, "in")
+        while True:
+            parents = [m for csr in tables for m in csr.neighbors(path[-1])]
+            if not parents or parents[0] in path:
+                return path
+            path.append(parents[0])
+
+    def memory_bytes(self):
+        """
+        Bytes held by the ID/type arrays and CSR tables (excludes the interned URI/label strings).
+        """
+        total = self.types.itemsize * len(self.types)
+        for table in list(self._out.values()) + list(self._in.values()):
+            total += table.nbytes()
+        return total + sys.getsizeof(self.ids) + sys.getsizeof(self.uris) + sys.getsizeof(self.labels)
+
+def compile_graph(graph, predicates=DEFAULT_PREDICATES):
+    """
+    Compiles an rdflib graph into a GraphEngine.
+
+    Args:
+        graph (rdflib.Graph): The loaded RDF graph (or union view).
+        predicates (dict): name -> predicate URI to compile into adjacency.
+
+    Returns:
+        GraphEngine: Engine over every URI subject/object in the graph.
+    """
+    ids = {}
+    uris = []
+
+    def intern(node):
+        i = ids.get(node)
+        if i is None:
+            i = ids[node] = len(uris)
+            uris.append(node)
+        return i
+
+    for s in graph.subjects(unique=True):
+        if isinstance(s, rdflib.URIRef):
+            intern(s)
+
+    edges_by_predicate = {}
+    for name, predicate in predicates.items():
+        edges = []
+        for s, o in graph.subject_objects(predicate):
+            if isinstance(s, rdflib.URIRef) and isinstance(o, rdflib.URIRef):
+                edges.append((intern(s), intern(o)))
+        edges_by_predicate[name] = edges
+
+    labels = [str(uri).split("/")[-1] for uri in uris]
+    for s, label in graph.subject_objects(RDFS.label):
+        i = ids.get(s)
+        if i is not None:
+            labels[i] = str(label)
+
+    type_codes = {NS[name]: code for code, name in enumerate(NODE_TYPES) if code}
+    types = [0] * len(uris)
+    for s, cls in graph.subject_objects(RDF.type):
+        i = ids.get(s)
+        if i is not None and cls in type_codes:
+            types[i] = type_codes[cls]
+
+    return GraphEngine(uris, labels, types, edges_by_predicate)
+
+def get_graph_engine(graph):
+    """
+    Returns the GraphEngine for the graph, compiled on first use and memoized
+    on the Graph object together with the graph_version (like
+    graph_loader.get_label_index), so a write recompiles it.
+    """
+    version = graph_version(graph)
+    memo = getattr(graph, "_graph_engine", None)
+    if memo is None or memo[0] != version:
+        memo = (version, compile_graph(graph))
+        graph._graph_engine = memo
+    return memo[1]
@@ -1,17 +1,42 @@
 import rdflib
+import bisect
+import hashlib
+from array import array
+import re
 import os
+import unicodedata
+from collections import namedtuple, deque
+from rdflib import RDF, RDFS, OWL, Literal, Variable
+from rdflib.graph import ReadOnlyGraphAggregate
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.sparql import Query
 
-def load_graph(file_path):
+from query_cache import copy_algebra
+from graph_snapshot import load_snapshot
+
+# Prefer binary snapshots (see build_snapshot.py) over re-parsing Turtle on every start
+GRAPH_SNAPSHOT_ENABLED = os.getenv("GRAPH_SNAPSHOT_ENABLED", "1") == "1"
+
+def load_graph(file_path, use_snapshot=GRAPH_SNAPSHOT_ENABLED):
     """
     Load an RDF graph from a Turtle file.
+    If a fresh binary snapshot of the file exists it is loaded instead.
     
     Args:
         file_path (str): The absolute path to the .ttl file.
+        use_snapshot (bool): Try the snapshot first (stale snapshots are ignored).
         
     Returns:
         rdflib.Graph: The loaded RDF graph.
     """
-    g = rdflib.Graph()
+    if use_snapshot:
+        g = load_snapshot(file_path)
+        if g is not None:
+            print(f"[INFO] Loaded graph snapshot for {file_path}")
+            print(f"[INFO] Graph scale: {len(g)} triples")
+            return VersionedGraph(store=g.store, identifier=g.identifier)
+    
+    g = VersionedGraph()
     try:
         g.parse(file_path, format="turtle")
         print(f"[INFO] Successfully loaded graph from {file_path}")
@@ -21,6 +46,487 @@ def load_graph(file_path):
         print(f"[ERROR] Failed to load graph: {e}")
         return None
 
+def union_view(*graphs):
+    """
+    Read-only merged view of several graphs (e.g. ABox + TBox) without copying
+    any triples. Unlike `g + tbox`, which materializes every triple into a new
+    Graph, lookups and SPARQL queries are answered from the source graphs.
+    
+    Args:
+        *graphs (rdflib.Graph): Graphs to combine.
+        
+    Returns:
+        rdflib.graph.ReadOnlyGraphAggregate: The merged view.
+    """
+    return ReadOnlyGraphAggregate([g for g in graphs if g is not None])
+
+class VersionedGraph(rdflib.Graph):
+    """
+    rdflib.Graph that counts its writes (add/addN/remove, and everything built
+    on them: parse, set, +=, SPARQL Update), so graph_version() notices
+    in-place changes. load_graph() returns this class.
+    """
+    writes = 0
+
+    def add(self, triple):
+        self.writes += 1
+        return super().add(triple)
+
+    def addN(self, quads):
+        self.writes += 1
+        return super().addN(quads)
+
+    def remove(self, triple):
+        self.writes += 1
+        return super().remove(triple)
+
+def _triple_digest(triple):
+    s, p, o = triple
+    if isinstance(o, Literal):
+        key = f"{s}\x1f{p}\x1f{o}\x1f{o.datatype}\x1f{o.language}"
+    else:
+        key = f"{s}\x1f{p}\x1f<{o}>"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+def graph_version(graph):
+    """
+    Returns a content fingerprint of the graph, used to key caches of query
+    results. The digest is stable across processes (blake2b of each triple,
+    order independent) and memoized on the Graph together with its write
+    count, so it is recomputed after any write to a VersionedGraph. A union
+    view combines the versions of its member graphs. Plain rdflib Graphs do
+    not count writes; their version is computed once.
+    
+    Args:
+        graph (rdflib.Graph): The loaded RDF graph (or union view).
+        
+    Returns:
+        str: "<triple count>-<order independent digest>" per member graph, joined by "+".
+    """
+    if isinstance(graph, ReadOnlyGraphAggregate):
+        return "+".join(graph_version(g) for g in graph.graphs)
+    writes = getattr(graph, "writes", 0)
+    memo = getattr(graph, "_content_version", None)
+    if memo is None or memo[0] != writes:
+        digest = 0
+        for triple in graph:
+            digest = (digest + _triple_digest(triple)) & 0xFFFFFFFFFFFFFFFF
+        memo = (writes, f"{len(graph)}-{digest:016x}")
+        graph._content_version = memo
+    return memo[1]
+
+def fold_text(text):
+    """
+    Form in which LabelIndex.scan() matches labels against free text: NFC
+    (a Hangul syllable is one code point, even when the input method sent
+    decomposed jamo), then casefolded. scan() offsets index into this string.
+    """
+    return unicodedata.normalize("NFC", text).casefold()
+
+LabelEntry = namedtuple("LabelEntry", ["label", "uri", "types", "term"])
+LabelMatch = namedtuple("LabelMatch", ["start", "end", "entries"])
+
+# Characters that make a regex alternative more than a plain substring
+_REGEX_META = re.compile(r"[.^$*+?{}\[\]\\()|]")
+# Flags of SPARQL regex() as rdflib's Builtin_REGEX maps them
+_REGEX_FLAGS = {"i": re.IGNORECASE, "s": re.DOTALL, "m": re.MULTILINE}
+
+class LabelIndex:
+    """
+    Inverted index over rdfs:label for fast concept lookup without SPARQL
+    regex scans.
+    
+    - exact:     casefolded label -> entries (dict lookup)
+    - prefix:    sorted casefolded labels + bisect
+    - substring: character uni/bi-gram postings, intersected and verified
+                 (works for Korean where there are no word boundaries)
+    """
+    
+    def __init__(self, entries):
+        self.entries = entries
+        self._folded = [entry.label.casefold() for entry in entries]
+        
+        self._exact = {}
+        for i, folded in enumerate(self._folded):
+            self._exact.setdefault(folded, []).append(i)
+        
+        self._sorted = sorted((folded, i) for i, folded in enumerate(self._folded))
+        self._sorted_keys = [folded for folded, _ in self._sorted]
+        
+        self._matcher = None # Aho-Corasick automaton over fold_text(label), built on first scan()
+        self._scan_ids = None
+        
+        self._grams = {}
+        for i, folded in enumerate(self._folded):
+            for gram in self._ngrams(folded):
+                self._grams.setdefault(gram, []).append(i)
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    @staticmethod
+    def _ngrams(text):
+        grams = set(text)
+        grams.update(text[i:i + 2] for i in range(len(text) - 1))
+        return grams
+    
+    def _select(self, ids, types):
+        result = [self.entries[i] for i in sorted(set(ids))]
+        if types:
+            types = set(types)
+            result = [entry for entry in result if types & entry.types]
+        return result
+    
+    def exact(self, text, types=None):
+        """
+        Entries whose label equals `text` (case-insensitive).
+        """
+        return self._select(self._exact.get(text.casefold(), []), types)
+    
+    def prefix(self, text, types=None):
+        """
+        Entries whose label starts with `text` (case-insensitive).
+        """
+        folded = text.casefold()
+        start = bisect.bisect_left(self._sorted_keys, folded)
+        ids = []
+        for key, i in self._sorted[start:]:
+            if not key.startswith(folded):
+                break
+            ids.append(i)
+        return self._select(ids, types)
+    
+    def _substring_ids(self, text, case_sensitive=False):
+        folded = text.casefold()
+        if not folded:
+            return list(range(len(self.entries)))
+        
+        # Intersect the postings of the query's grams, rarest first
+        postings = sorted((self._grams.get(gram, []) for gram in self._ngrams(folded)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        
+        if case_sensitive:
+            return [i for i in candidates if text in self.entries[i].label]
+        return [i for i in candidates if folded in self._folded[i]]
+    
+    def substring(self, text, types=None, case_sensitive=False):
+        """
+        Entries whose label contains `text` (what regex(?label, "text", "i") matches).
+        """
+        return self._select(self._substring_ids(text, case_sensitive), types)
+    
+    def match_regex(self, pattern, flags="", types=None):
+        """
+        Entries whose label matches a SPARQL regex(?label, pattern, flags).
+        Plain alternations ("A|B|C") are answered from the substring index;
+        anything else falls back to a compiled regex over all labels.
+        """
+        case_sensitive = "i" not in flags
+        alternatives = pattern.split("|")
+        
+        if all(alt and not _REGEX_META.search(alt) for alt in alternatives):
+            ids = []
+            for alt in alternatives:
+                ids.extend(self._substring_ids(alt, case_sensitive))
+            return self._select(ids, types)
+        
+        re_flags = 0
+        for flag in flags:
+            re_flags |= _REGEX_FLAGS.get(flag, 0)
+        compiled = re.compile(pattern, re_flags)
+        ids = [i for i, entry in enumerate(self.entries) if compiled.search(entry.label)]
+        return self._select(ids, types)
+    
+    def scan(self, text, types=None, min_length=1):
+        """
+        Finds every label that occurs verbatim (case-insensitive) in free text,
+        e.g. a user question. Overlapping matches are resolved leftmost-longest,
+        so "합성함수의 미분" wins over "합성함수" and "미분". Text and labels
+        are compared in fold_text() form, so matches cover whole syllables.
+        
+        Returns:
+            list[LabelMatch]: Non-overlapping matches in text order (offsets
+            into fold_text(text)).
+        """
+        if self._matcher is None:
+            self._scan_ids = {}
+            for i, entry in enumerate(self.entries):
+                self._scan_ids.setdefault(fold_text(entry.label), []).append(i)
+            self._matcher = AhoCorasick(self._scan_ids)
+        
+        hits = sorted(self._matcher.find_all(fold_text(text)), key=lambda hit: (hit[0], -(hit[1] - hit[0])))
+        matches = []
+        covered_until = 0
+        for start, end, pattern in hits:
+            if start < covered_until or end - start < min_length:
+                continue
+            entries = self._select(self._scan_ids[pattern], types)
+            if not entries:
+                continue
+            matches.append(LabelMatch(start, end, entries))
+            covered_until = end
+        return matches
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher: finds every occurrence of any of the
+    patterns in a text in a single pass (O(len(text) + matches)).
+    """
+    
+    def __init__(self, patterns):
+        # Trie as parallel lists: goto transitions, failure links, outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern)
+        
+        # BFS to build failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if self._goto[fail].get(ch, 0) != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+    
+    def find_all(self, text):
+        """
+        Yields (start, end, pattern) for every occurrence in `text`.
+        """
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for pattern in self._out[node]:
+                yield (i + 1 - len(pattern), i + 1, pattern)
+
+def build_label_index(graph):
+    """
+    Builds a LabelIndex from every rdfs:label in the graph.
+    
+    Args:
+        graph (rdflib.Graph): The loaded RDF graph.
+        
+    Returns:
+        LabelIndex: Index of (label, uri, types, term) entries.
+    """
+    entries = []
+    for s, _, label in graph.triples((None, RDFS.label, None)):
+        if not isinstance(s, rdflib.URIRef):
+            continue
+        entries.append(LabelEntry(str(label), s, frozenset(graph.objects(s, RDF.type)), label))
+    return LabelIndex(entries)
+
+def get_label_index(graph):
+    """
+    Returns the LabelIndex for the graph, building it on first use and
+    memoizing it on the Graph object together with the graph_version, so
+    the SPARQL rewriter never resolves labels against a stale index.
+    """
+    version = graph_version(graph)
+    memo = getattr(graph, "_label_index", None)
+    if memo is None or memo[0] != version:
+        memo = (version, build_label_index(graph))
+        graph._label_index = memo
+    return memo[1]
+
+MATH_NS = "http://snu.ac.kr/math/"
+NS = rdflib.Namespace(MATH_NS)
+
+# Hierarchy levels (top -> bottom) and the property linking each level to the next
+HIERARCHY_LEVELS = ("Subject", "Chapter", "Section", "Concept")
+HIERARCHY_PROPERTIES = {"Chapter": NS.hasChapter, "Section": NS.hasSection, "Concept": NS.hasConcept}
+
+class HierarchyTable:
+    """
+    Materialized Concept -> Section -> Chapter -> Subject hierarchy.
+    
+    Every Subject/Chapter/Section/Concept node gets an integer ID; for each
+    level an array holds the ID of the node's ancestor at that level (-1 if
+    none), so any ancestor lookup is O(1) regardless of hierarchy depth.
+    """
+    
+    def __init__(self, uris, labels, levels, parents):
+        self.uris = uris
+        self.labels = labels
+        self.levels = array("b", levels)
+        self.ids = {uri: i for i, uri in enumerate(uris)}
+        self.ancestors = {level: array("i", [-1]) * len(uris) for level in HIERARCHY_LEVELS}
+        
+        # Top-down so each parent's ancestors are final before its children copy them
+        for i in sorted(range(len(uris)), key=lambda n: self.levels[n]):
+            self.ancestors[HIERARCHY_LEVELS[self.levels[i]]][i] = i
+            parent = parents[i]
+            if parent < 0:
+                continue
+            for level in HIERARCHY_LEVELS[:self.levels[parent] + 1]:
+                self.ancestors[level][i] = self.ancestors[level][parent]
+    
+    def __len__(self):
+        return len(self.uris)
+    
+    def node_id(self, uri):
+        return self.ids.get(rdflib.URIRef(uri), -1)
+    
+    def ancestor_label(self, uri, level):
+        """
+        Label of the node's ancestor at `level` ("Subject", "Chapter", ...), or None.
+        """
+        i = self.node_id(uri)
+        if i < 0:
+            return None
+        ancestor = self.ancestors[level][i]
+        return self.labels[ancestor] if ancestor >= 0 else None
+    
+    def lookup(self, uri):
+        """
+        Returns {"Subject": label, "Chapter": label, "Section": label, "Concept": label}
+        for the node (levels below it are None), or None for unknown nodes.
+        """
+        i = self.node_id(uri)
+        if i < 0:
+            return None
+        result = {}
+        for level in HIERARCHY_LEVELS:
+            ancestor = self.ancestors[level][i]
+            result[level] = self.labels[ancestor] if ancestor >= 0 else None
+        return result
+
+def build_hierarchy_table(graph):
+    """
+    Builds a HierarchyTable from rdf:type and the hasChapter/hasSection/hasConcept edges.
+    
+    Args:
+        graph (rdflib.Graph): The loaded RDF graph.
+        
+    Returns:
+        HierarchyTable: Array-backed ancestor table.
+    """
+    uris, labels, levels = [], [], []
+    ids = {}
+    for level_no, level in enumerate(HIERARCHY_LEVELS):
+        for node in graph.subjects(RDF.type, NS[level]):
+            if node in ids:
+                continue
+            ids[node] = len(uris)
+            uris.append(node)
+            label = graph.value(node, RDFS.label)
+            labels.append(str(label) if label is not None else str(node).split("/")[-1])
+            levels.append(level_no)
+    
+    parents = [-1] * len(uris)
+    multi_parent = 0
+    for level, prop in HIERARCHY_PROPERTIES.items():
+        for parent, child in graph.subject_objects(prop):
+            if parent not in ids or child not in ids:
+                continue
+            if parents[ids[child]] >= 0:
+                multi_parent += 1 # Keep the first parent; the tree is expected to be strict
+                continue
+            parents[ids[child]] = ids[parent]
+    
+    if multi_parent:
+        print(f"[WARN] {multi_parent} hierarchy nodes have more than one parent; using the first.")
+    return HierarchyTable(uris, labels, levels, parents)
+
+def get_hierarchy_table(graph):
+    """
+    Returns the HierarchyTable for the graph, memoized on the Graph object
+    together with the graph_version (like get_label_index), so enrichment
+    never reads a table built before the last write.
+    """
+    version = graph_version(graph)
+    memo = getattr(graph, "_hierarchy_table", None)
+    if memo is None or memo[0] != version:
+        memo = (version, build_hierarchy_table(graph))
+        graph._hierarchy_table = memo
+    return memo[1]
+
+def enrich_hierarchy(rows, table, key="target", keep_key=False):
+    """
+    Post-processing for query results: fills "<key>Subject" and "<key>Chapter"
+    columns from the HierarchyTable using the URI in the "<key>" column, so
+    queries only need to select the target nodes (no hasConcept/hasSection/
+    hasChapter OPTIONAL join).
+    
+    Args:
+        rows (list[dict]): execute_sparql rows.
+        table (HierarchyTable): Table for the graph the rows came from.
+        key (str): Column holding the target URI.
+        keep_key (bool): Keep the URI column (otherwise dropped and rows de-duplicated).
+        
+    Returns:
+        list[dict]: Enriched rows.
+    """
+    enriched = []
+    seen = set()
+    for row in rows:
+        row = dict(row)
+        uri = row.get(key)
+        info = table.lookup(uri) if uri else None
+        for level in ("Subject", "Chapter"):
+            column = f"{key}{level}"
+            if row.get(column) is None:
+                row[column] = info[level] if info else None
+        if not keep_key:
+            row.pop(key, None)
+            identity = tuple(sorted(row.items(), key=lambda kv: kv[0]))
+            if identity in seen:
+                continue
+            seen.add(identity)
+        enriched.append(row)
+    return enriched
+
+# Schema queries are parsed once; the namespace literal is passed as an initBinding.
+# Results are ordered so schema_info (part of the LLM cache key) is stable across restarts.
+_SCHEMA_QUERY_NS = {"owl": OWL, "rdfs": RDFS}
+
+_CLASSES_QUERY = prepareQuery("""
+    SELECT DISTINCT ?cls
+    WHERE {
+        ?cls a owl:Class .
+        FILTER(STRSTARTS(STR(?cls), ?base))
+    }
+    ORDER BY ?cls
+    """, initNs=_SCHEMA_QUERY_NS)
+
+_PROPERTIES_QUERY = prepareQuery("""
+    SELECT DISTINCT ?prop ?type ?domain ?range ?comment
+    WHERE {
+        VALUES ?type { owl:ObjectProperty owl:DatatypeProperty }
+        ?prop a ?type .
+        OPTIONAL { ?prop rdfs:domain ?domain }
+        OPTIONAL { ?prop rdfs:range ?range }
+        OPTIONAL { ?prop rdfs:comment ?comment }
+        FILTER(STRSTARTS(STR(?prop), ?base))
+    }
+    ORDER BY ?type ?prop
+    """, initNs=_SCHEMA_QUERY_NS)
+
+def _run_prepared(graph, prepared, bindings):
+    # Private algebra copy: rdflib expression nodes are not safe to share across threads
+    return graph.query(Query(prepared.prologue, copy_algebra(prepared.algebra)), initBindings=bindings)
+
 def generate_schema_info(graph):
     """
     Extracts schema information (Classes, Properties) from the graph
@@ -50,14 +556,7 @@ def generate_schema_info(graph):
     schema_str += "Classes:\n"
     # Query for all classes (rdf:type owl:Class)
     # Also considering RDFS classes if simple TBox
-    query_classes = """
-    SELECT DISTINCT ?cls
-    WHERE {
-        ?cls a owl:Class .
-        FILTER(STRSTARTS(STR(?cls), "http://snu.ac.kr/math/"))
-    }
-    """
-    results = graph.query(query_classes)
+    results = _run_prepared(graph, _CLASSES_QUERY, {Variable("base"): Literal(MATH_NS)})
     for row in results:
         cls_name = row.cls.split("/")[-1] # Get local name
         schema_str += f"- :{cls_name}\n"
@@ -67,19 +566,7 @@ def generate_schema_info(graph):
     # 3. Extract Properties (ObjectProperty & DatatypeProperty)
     schema_str += "Properties (with Domain & Range):\n"
     
-    query_props = """
-    SELECT DISTINCT ?prop ?type ?domain ?range ?comment
-    WHERE {
-        VALUES ?type { owl:ObjectProperty owl:DatatypeProperty }
-        ?prop a ?type .
-        OPTIONAL { ?prop rdfs:domain ?domain }
-        OPTIONAL { ?prop rdfs:range ?range }
-        OPTIONAL { ?prop rdfs:comment ?comment }
-        FILTER(STRSTARTS(STR(?prop), "http://snu.ac.kr/math/"))
-    }
-    ORDER BY ?type ?prop
-    """
-    results_props = graph.query(query_props)
+    results_props = _run_prepared(graph, _PROPERTIES_QUERY, {Variable("base"): Literal(MATH_NS)})
     
     for row in results_props:
         prop_name = row.prop.split("/")[-1]
@@ -113,10 +600,8 @@ if __name__ == "__main__":
     tbox = load_graph(TBOX_PATH)
     
     if g and tbox:
-        # Merge graphs for schema extraction test
-        # In real app, we might want to keep them separate or just rely on the fact 
-        # that we need TBox for schema info.
-        full_graph = g + tbox
+        # Merged read-only view for schema extraction test (no triple copy)
+        full_graph = union_view(g, tbox)
     
         print("\nExtracting Schema Info...")
         schema_text = generate_schema_info(full_graph)
@@ -0,0 +1,130 @@
+import rdflib
+import hashlib
+import pickle
+import json
+import gc
+import os
+
+# Snapshot file layout:
+#   line 1: SNAPSHOT_MAGIC
+#   line 2: JSON header (format version, rdflib version, source file sha256, triple count)
+#   rest:   pickled rdflib.Graph (protocol 5)
+# The payload is a raw pickle: loading a snapshot runs whatever code it encodes,
+# so only load snapshots built locally by build_snapshot.py and keep SNAPSHOT_DIR
+# writable by the server's own user only. Never load snapshots from elsewhere.
+SNAPSHOT_MAGIC = b"MATH-KG-SNAPSHOT\n"
+SNAPSHOT_FORMAT_VERSION = 1
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.getenv("GRAPH_SNAPSHOT_DIR", os.path.join(PROJECT_ROOT, "data", "snapshot"))
+
+def file_sha256(path):
+    """
+    Content hash of a source file (used to detect stale snapshots).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def snapshot_path_for(source_path):
+    """
+    Default snapshot location for a Turtle file: data/snapshot/<file name>.snap
+    """
+    return os.path.join(SNAPSHOT_DIR, os.path.basename(source_path) + ".snap")
+
+def write_snapshot(graph, source_path, snapshot_path=None):
+    """
+    Serializes a parsed graph to a binary snapshot tagged with the source file's hash.
+
+    Args:
+        graph (rdflib.Graph): Graph parsed from `source_path`.
+        source_path (str): The Turtle file the graph came from.
+        snapshot_path (str): Output path (default: snapshot_path_for(source_path)).
+
+    Returns:
+        str: The snapshot path.
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(source_path)
+    header = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "rdflib": rdflib.__version__,
+        "source": os.path.basename(source_path),
+        "source_sha256": file_sha256(source_path),
+        "triples": len(graph),
+    }
+    payload = pickle.dumps(graph, protocol=5)
+
+    os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(json.dumps(header).encode("utf-8") + b"\n")
+        f.write(payload)
+    os.replace(tmp_path, snapshot_path) # Atomic: readers never see a half-written file
+    return snapshot_path
+
+def read_snapshot_header(snapshot_path):
+    """
+    Returns the JSON header of a snapshot, or None if it is missing/invalid.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            if f.readline() != SNAPSHOT_MAGIC:
+                return None
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+def load_snapshot(source_path, snapshot_path=None):
+    """
+    Loads the snapshot for `source_path` if it is fresh, i.e. written by this
+    format/rdflib version from a source file with the same content hash.
+    The payload is unpickled (trusted local files only, see SNAPSHOT_DIR).
+
+    Returns:
+        rdflib.Graph | None: The graph, or None if the snapshot is missing, stale,
+        corrupt or truncated (the caller then falls back to parsing Turtle).
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(source_path)
+    if not os.path.exists(snapshot_path):
+        return None
+
+    try:
+        with open(snapshot_path, "rb") as f:
+            data = f.read() # Single read; header and payload are sliced from memory
+    except OSError:
+        return None
+
+    if not data.startswith(SNAPSHOT_MAGIC):
+        return None
+    try:
+        header_end = data.index(b"\n", len(SNAPSHOT_MAGIC))
+        header = json.loads(data[len(SNAPSHOT_MAGIC):header_end])
+    except ValueError as e:
+        print(f"[WARN] Corrupt snapshot header in {snapshot_path}: {e}")
+        return None
+    if not isinstance(header, dict):
+        print(f"[WARN] Corrupt snapshot header in {snapshot_path}")
+        return None
+
+    if header.get("format") != SNAPSHOT_FORMAT_VERSION or header.get("rdflib") != rdflib.__version__:
+        return None
+    if header.get("source_sha256") != file_sha256(source_path):
+        print(f"[INFO] Snapshot {snapshot_path} is stale; falling back to Turtle.")
+        return None
+
+    # Unpickling creates millions of small containers; pausing the cyclic GC
+    # during the load avoids repeated full-heap scans and is several times faster.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        graph = pickle.loads(memoryview(data)[header_end + 1:])
+    except Exception as e:
+        print(f"[WARN] Failed to read snapshot {snapshot_path}: {e}")
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return graph
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import deque
+
+class LatencyStats:
+    """
+    In-process latency samples per key (e.g. pipeline mode or "<mode>.answer"),
+    keeping the most recent `max_samples` per key for percentiles.
+    """
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, key, seconds):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.max_samples)).append(seconds)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def percentile(self, key, q, min_samples=1):
+        """
+        q-th percentile (0-100) of the kept samples in seconds, or None with
+        fewer than `min_samples` samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def stats(self):
+        """
+        Returns {key: {count, avg_ms, p50_ms, p95_ms, max_ms}} over the kept samples.
+        """
+        with self._lock:
+            snapshot = {key: sorted(samples) for key, samples in self._samples.items()}
+            counts = dict(self._counts)
+
+        result = {}
+        for key, samples in sorted(snapshot.items()):
+            n = len(samples)
+            result[key] = {
+                "count": counts[key],
+                "avg_ms": round(sum(samples) / n * 1000, 2),
+                "p50_ms": round(samples[(n - 1) // 2] * 1000, 2),
+                "p95_ms": round(samples[min(n - 1, int(n * 0.95))] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return result
+
+class LatencyBudget:
+    """
+    Deadline of one request, split into per-stage shares of the total.
+    A stage gets min(total * share, time left); stages without a share get
+    whatever is left.
+    """
+
+    def __init__(self, total_seconds, shares=None):
+        self.total = total_seconds
+        self.shares = shares or {}
+        self.expires = time.monotonic() + total_seconds
+
+    def remaining(self):
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def stage(self, name):
+        share = self.shares.get(name)
+        if share is None:
+            return self.remaining()
+        return min(self.total * share, self.remaining())
@@ -0,0 +1,152 @@
+from collections import deque
+import time
+
+from graph_engine import get_graph_engine
+from graph_loader import get_hierarchy_table
+from prerequisite_index import get_prerequisite_index
+
+# Node types a learner can be told to study (in order of preference for ambiguous labels)
+STUDY_UNIT_TYPES = ("Section", "Concept")
+
+def resolve_unit(engine, label):
+    """
+    Node ID of the Section/Concept with this label (Sections win when both exist).
+
+    Raises:
+        LookupError: If no such node exists.
+    """
+    label = (label or "").strip()
+    for node_type in STUDY_UNIT_TYPES:
+        ids = engine.find(label, node_type=node_type)
+        if ids:
+            return ids[0]
+    raise LookupError(f"'{label}'은(는) 온톨로지에 없는 개념입니다.")
+
+def study_plan(index, target, known=()):
+    """
+    Topologically ordered prerequisites of `target` (deepest first), ending with
+    the target itself. Known units and everything upstream of them are skipped.
+    Concepts are listed only when their Section is not already in the plan.
+
+    Args:
+        index (PrerequisiteIndex): Closure for the graph.
+        target (int): Node ID to study.
+        known (iterable[int]): Node IDs the learner already knows.
+
+    Returns:
+        list[int]: Node IDs in study order.
+    """
+    engine = index.engine
+    needed = index.all_prerequisites(target, known=list(known))
+    needed_set = set(needed)
+
+    plan = []
+    for node in needed:
+        node_type = engine.node_type(node)
+        if node_type not in STUDY_UNIT_TYPES:
+            continue
+        if node_type == "Concept" and needed_set.intersection(index.containers(node)):
+            continue
+        plan.append(node)
+    return plan + [target]
+
+def shortest_chain(index, source, target):
+    """
+    Shortest prerequisite chain source -> ... -> target (BFS over the same lifted
+    relation as the closure, so Concepts inherit their Section's links). Only
+    nodes the closure marks as prerequisites of the target are expanded.
+
+    Returns:
+        list[int] | None: Node IDs from source to target, or None if `source`
+        is not a prerequisite of `target`.
+    """
+    if source == target:
+        return [source]
+    if not index.is_prerequisite(source, target): # O(1) reject before any traversal
+        return None
+
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for nxt in index.direct_dependents(node):
+            if nxt in parents or (nxt != target and not index.is_prerequisite(nxt, target)):
+                continue
+            parents[nxt] = node
+            if nxt == target:
+                chain = [nxt]
+                while parents[chain[-1]] is not None:
+                    chain.append(parents[chain[-1]])
+                return chain[::-1]
+            queue.append(nxt)
+    return None
+
+def to_evidence(engine, table, nodes, descs):
+    """
+    Formats node IDs in the chat `evidence` shape (subject, chapter, concept, desc).
+    """
+    evidence = []
+    for node, desc in zip(nodes, descs):
+        info = table.lookup(engine.uri(node)) or {}
+        evidence.append({
+            "subject": info.get("Subject") or "Unknown",
+            "chapter": info.get("Chapter") or "Unknown",
+            "concept": engine.label(node),
+            "desc": desc,
+        })
+    return evidence
+
+def build_learning_path(graph, target, source=None, known=()):
+    """
+    LLM-free learning path for the /path endpoint.
+
+    - source given: shortest prerequisite chain source -> target ("chain")
+    - otherwise: ordered study plan for target, skipping `known` ("plan")
+
+    Args:
+        graph (rdflib.Graph): The loaded graph (engine/closure/hierarchy are memoized on it).
+        target (str): Label of the Section/Concept to reach.
+        source (str): Optional label to start the chain from.
+        known (list[str]): Labels the learner already knows (plan mode).
+
+    Returns:
+        dict: {"answer", "evidence", "mode", "elapsed_ms"} (same answer/evidence shape as /chat).
+
+    Raises:
+        LookupError: If a label is not in the ontology.
+    """
+    start = time.perf_counter()
+    engine = get_graph_engine(graph)
+    index = get_prerequisite_index(graph)
+    table = get_hierarchy_table(graph)
+    target_id = resolve_unit(engine, target)
+    target_label = engine.label(target_id)
+
+    if source:
+        source_id = resolve_unit(engine, source)
+        chain = shortest_chain(index, source_id, target_id)
+        mode = "chain"
+        if chain is None:
+            answer = f"'{engine.label(source_id)}'은(는) '{target_label}'의 선수 학습 경로에 없습니다."
+            evidence = []
+        else:
+            answer = f"'{engine.label(source_id)}'에서 '{target_label}'까지의 최단 선수 학습 경로입니다 ({len(chain) - 1}단계)."
+            descs = [f"{step}단계" if step else "출발" for step in range(len(chain))]
+            evidence = to_evidence(engine, table, chain, descs)
+    else:
+        known_ids = [resolve_unit(engine, label) for label in known]
+        plan = study_plan(index, target_id, known_ids)
+        mode = "plan"
+        if len(plan) == 1:
+            answer = f"'{target_label}'을(를) 바로 학습할 수 있습니다. 추가로 필요한 선수 학습이 없습니다."
+        else:
+            answer = f"'{target_label}'을(를) 학습하기 위한 선수 학습 순서입니다 ({len(plan) - 1}개 단원)."
+        descs = [f"선수 학습 {i + 1}/{len(plan) - 1}" for i in range(len(plan) - 1)] + ["학습 목표"]
+        evidence = to_evidence(engine, table, plan, descs)
+
+    return {
+        "answer": answer,
+        "evidence": evidence,
+        "mode": mode,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
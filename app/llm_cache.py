@@ -0,0 +1,140 @@
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import json
+import time
+import re
+import os
+
+def normalize_question(question):
+    """
+    Normalizes a user question so trivially different phrasings share a cache key.
+    (Unicode NFKC, lower-case, collapsed whitespace, trailing punctuation removed)
+
+    Args:
+        question (str): Raw user question.
+
+    Returns:
+        str: Normalized question.
+    """
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.~")
+
+def hash_text(text):
+    """
+    Short stable hash for long inputs (prompt templates, schema info, data summaries).
+    """
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()[:16]
+
+def make_key(*parts):
+    """
+    Builds a cache key from arbitrary JSON-serializable parts.
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    Persistent memoization of LLM results backed by a local SQLite file.
+
+    - Survives restarts (one row per key, JSON value)
+    - LRU eviction once `max_entries` is exceeded (by last access time)
+    - TTL expiry (`ttl_seconds`, 0 disables)
+    - Hit/miss counters per namespace (e.g. "sparql", "answer")
+    """
+
+    def __init__(self, path, max_entries=10000, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._counters = {}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+        self._conn.commit()
+
+    def _count(self, namespace, field):
+        counter = self._counters.setdefault(namespace, {"hits": 0, "misses": 0})
+        counter[field] += 1
+
+    def get(self, namespace, key):
+        """
+        Returns the cached value, or None on a miss (or expired entry).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if not row:
+                self._count(namespace, "misses")
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._count(namespace, "hits")
+            return json.loads(row[0])
+
+    def set(self, namespace, key, value):
+        """
+        Stores a value and evicts expired / least recently used entries.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, namespace, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            if self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+            overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters per namespace plus the current entry count.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            namespaces = {}
+            for namespace, counter in self._counters.items():
+                total = counter["hits"] + counter["misses"]
+                namespaces[namespace] = {
+                    **counter,
+                    "hit_rate": round(counter["hits"] / total, 4) if total else 0.0,
+                }
+        return {"entries": entries, "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds, "namespaces": namespaces}
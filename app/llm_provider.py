@@ -0,0 +1,471 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import Future
+from dotenv import load_dotenv
+import contextvars
+import threading
+import asyncio
+import hashlib
+import random
+import json
+import time
+import math
+import re
+import os
+
+import metrics
+import tracing
+
+# LLM Backend Settings
+# Provider and model per stage ("sparql", "answer"); unset stage settings fall
+# back to LLM_PROVIDER / LLM_MODEL, so a faster or cheaper model can be used for
+# one stage without code changes.
+#   gemini: Google Gemini (GOOGLE_API_KEY)
+#   stub:   deterministic local responses with configurable latency (offline load tests)
+DEFAULT_MODELS = {"gemini": "gemini-3-flash-preview", "stub": "stub"}
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", DEFAULT_MODELS.get(LLM_PROVIDER, ""))
+# Upper bound on in-flight calls per provider instance
+LLM_PROVIDER_MAX_INFLIGHT = int(os.getenv("LLM_PROVIDER_MAX_INFLIGHT", "16"))
+
+# Stub provider: latency = LLM_STUB_LATENCY_SECONDS +- LLM_STUB_JITTER_SECONDS,
+# drawn from a RNG seeded by the prompt, so the same prompt always takes as long.
+LLM_STUB_LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "0"))
+LLM_STUB_JITTER_SECONDS = float(os.getenv("LLM_STUB_JITTER_SECONDS", "0"))
+# Extra latency per 1000 prompt tokens (models prefill cost, so prompt size shows up in latency)
+LLM_STUB_SECONDS_PER_1K_PROMPT_TOKENS = float(os.getenv("LLM_STUB_SECONDS_PER_1K_PROMPT_TOKENS", "0"))
+LLM_STUB_STREAM_CHUNK_CHARS = int(os.getenv("LLM_STUB_STREAM_CHUNK_CHARS", "8"))
+# Optional JSON file: [{"match": "<substring of the prompt>", "response": "<text>"}, ...]
+LLM_STUB_RESPONSES = os.getenv("LLM_STUB_RESPONSES", "")
+
+LLMResponse = namedtuple("LLMResponse", ["text", "usage", "latency"])
+
+def estimate_tokens(text):
+    """
+    Rough token count for providers that report none (about 4 UTF-8 bytes per
+    token; Hangul syllables are 3 bytes).
+    """
+    return math.ceil(len((text or "").encode("utf-8")) / 4)
+
+def make_usage(prompt_tokens, output_tokens):
+    return {
+        "prompt_tokens": int(prompt_tokens or 0),
+        "output_tokens": int(output_tokens or 0),
+        "total_tokens": int(prompt_tokens or 0) + int(output_tokens or 0),
+    }
+
+def _next_in_thread(iterator, default):
+    """
+    next(iterator, default) on the loop's default executor, as a Future that
+    cannot be cancelled once next() is running (so its done callbacks only run
+    when the iterator is no longer executing).
+    """
+    job = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        if not job.set_running_or_notify_cancel():
+            return
+        try:
+            job.set_result(context.run(next, iterator, default))
+        except BaseException as e:
+            job.set_exception(e)
+
+    asyncio.get_running_loop().run_in_executor(None, run)
+    return job
+
+class LLMProvider(ABC):
+    """
+    Common interface of the LLM backends (subclasses implement _generate and
+    optionally _stream).
+
+    generate() / stream() are blocking (call them from a thread pool);
+    agenerate() / astream() are the asyncio versions. Every call adds its token
+    usage and latency to the provider's counters (usage_stats()) and to the
+    per-stage metrics (metrics.py; `stage` is the pipeline stage of the call).
+    """
+
+    name = "base"
+
+    def __init__(self, model, json_mode=True, max_inflight=LLM_PROVIDER_MAX_INFLIGHT):
+        self.model = model
+        self.json_mode = json_mode
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._usage = {"calls": 0, "errors": 0, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0}
+
+    @property
+    def model_id(self):
+        """
+        Identifies the backend in LLM cache keys.
+        """
+        return f"{self.name}:{self.model}"
+
+    def _record(self, usage, seconds, error=None, stage="unknown"):
+        if error is not None:
+            metrics.record_error(f"llm_{stage}", error)
+        else:
+            metrics.llm_latency_seconds.observe(seconds, stage=stage, model=self.model_id)
+        if usage:
+            metrics.llm_prompt_tokens.observe(usage["prompt_tokens"], stage=stage)
+            metrics.llm_tokens.inc(usage["prompt_tokens"], stage=stage, model=self.model_id, kind="prompt")
+            metrics.llm_tokens.inc(usage["output_tokens"], stage=stage, model=self.model_id, kind="output")
+        with self._lock:
+            self._usage["calls"] += 1
+            self._usage["errors"] += int(error is not None)
+            self._usage["prompt_tokens"] += usage["prompt_tokens"] if usage else 0
+            self._usage["output_tokens"] += usage["output_tokens"] if usage else 0
+            self._usage["seconds"] += seconds
+
+    def usage_stats(self):
+        with self._lock:
+            usage = dict(self._usage)
+        usage["seconds"] = round(usage["seconds"], 3)
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["output_tokens"]
+        return {"model": self.model_id, **usage}
+
+    # --- Backend hooks ---
+
+    @abstractmethod
+    def _generate(self, prompt, timeout=None):
+        """
+        Returns (text, usage dict).
+        `timeout` (seconds) bounds the backend call where the backend supports it.
+        """
+
+    def _stream(self, prompt, timeout=None):
+        """
+        Yields text chunks; returns (via StopIteration.value) the usage dict.
+        `timeout` (seconds) bounds the whole backend call where the backend supports it.
+        """
+        text, usage = self._generate(prompt, timeout)
+        yield text
+        return usage
+
+    # --- Public API ---
+
+    def generate(self, prompt, stage="unknown", timeout=None):
+        """
+        `timeout` caps the backend call (seconds), so an abandoned call does
+        not hold its thread past the caller's deadline.
+
+        Returns:
+            LLMResponse: (text, usage, latency seconds)
+        """
+        start = time.perf_counter()
+        with tracing.span("llm", stage=stage, model=self.model_id) as trace_span, self._slots:
+            try:
+                text, usage = self._generate(prompt, timeout)
+            except Exception as e:
+                self._record(None, time.perf_counter() - start, error=e, stage=stage)
+                raise
+            if trace_span:
+                trace_span.set(prompt_tokens=usage["prompt_tokens"], output_tokens=usage["output_tokens"])
+        latency = time.perf_counter() - start
+        self._record(usage, latency, stage=stage)
+        return LLMResponse(text, usage, latency)
+
+    def stream(self, prompt, stage="unknown", timeout=None):
+        """
+        Yields text chunks as they arrive; usage is recorded when the stream ends.
+        `timeout` caps the backend call (seconds). Closing this generator closes
+        the backend stream too, so an abandoned stream stops pulling chunks.
+        """
+        start = time.perf_counter()
+        with self._slots:
+            chunks = self._stream(prompt, timeout)
+            try:
+                while True:
+                    yield next(chunks)
+            except StopIteration as done:
+                usage = done.value or make_usage(estimate_tokens(prompt), 0)
+            except Exception as e:
+                self._record(None, time.perf_counter() - start, error=e, stage=stage)
+                raise
+            finally:
+                chunks.close()
+        self._record(usage, time.perf_counter() - start, stage=stage)
+
+    async def _acquire_slot(self):
+        """
+        Takes one of the provider's in-flight slots without blocking the event
+        loop. A slot acquired after the caller was cancelled is given back.
+        """
+        if self._slots.acquire(blocking=False):
+            return
+        waiter = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            waiter.add_done_callback(lambda _: self._slots.release())
+            raise
+
+    async def agenerate(self, prompt, stage="unknown"):
+        return await asyncio.to_thread(self.generate, prompt, stage)
+
+    async def astream(self, prompt, stage="unknown"):
+        """
+        Async iterator over stream(); each chunk is fetched on a worker thread.
+        The stream (and its slot) is closed however iteration ends; a chunk
+        still being fetched when the consumer stops is waited for on its
+        thread, then the stream is closed.
+        """
+        chunks = self.stream(prompt, stage)
+        end = object()
+        job = None
+        try:
+            while True:
+                job = _next_in_thread(chunks, end)
+                chunk = await asyncio.wrap_future(job)
+                if chunk is end:
+                    return
+                yield chunk
+        finally:
+            if job is None or job.done():
+                chunks.close()
+            else:
+                job.add_done_callback(lambda _: chunks.close())
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini through google-generativeai. One GenerativeModel per provider
+    instance is reused by every call and thread (the SDK multiplexes them over
+    a shared gRPC channel); providers are cached per (stage settings) by
+    get_provider(), so the client is created once per process.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model, json_mode=True, max_inflight=LLM_PROVIDER_MAX_INFLIGHT):
+        super().__init__(model, json_mode, max_inflight)
+        import google.generativeai as genai
+
+        api_key = load_google_api_key()
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY is not set in .env file.")
+        genai.configure(api_key=api_key)
+        generation_config = {"response_mime_type": "application/json"} if json_mode else None
+        self._client = genai.GenerativeModel(model, generation_config=generation_config)
+
+    @property
+    def model_id(self):
+        # Plain model name: keeps LLM cache entries from before the provider split valid
+        return self.model
+
+    @staticmethod
+    def _response_usage(response, prompt):
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata and metadata.total_token_count:
+            return make_usage(metadata.prompt_token_count, metadata.candidates_token_count)
+        return make_usage(estimate_tokens(prompt), estimate_tokens(getattr(response, "text", "")))
+
+    def _generate(self, prompt, timeout=None):
+        request_options = {"timeout": timeout} if timeout else None
+        response = self._client.generate_content(prompt, request_options=request_options)
+        return response.text, self._response_usage(response, prompt)
+
+    def _stream(self, prompt, timeout=None):
+        last = None
+        request_options = {"timeout": timeout} if timeout else None
+        for chunk in self._client.generate_content(prompt, stream=True, request_options=request_options):
+            last = chunk
+            yield chunk.text
+        return self._response_usage(last, prompt) if last is not None else None
+
+    async def agenerate(self, prompt, stage="unknown"):
+        start = time.perf_counter()
+        await self._acquire_slot()
+        try:
+            response = await self._client.generate_content_async(prompt)
+        except Exception as e:
+            self._record(None, time.perf_counter() - start, error=e, stage=stage)
+            raise
+        finally:
+            self._slots.release()
+        usage = self._response_usage(response, prompt)
+        latency = time.perf_counter() - start
+        self._record(usage, latency, stage=stage)
+        return LLMResponse(response.text, usage, latency)
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic offline stand-in for load tests and benchmarks. Answers are
+    replayed from LLM_STUB_RESPONSES when a "match" substring occurs in the
+    prompt, otherwise derived from the prompt itself:
+      - SPARQL prompts: a label-regex query over the question's words
+      - answer prompts: a short Korean answer whose evidence lists the retrieved labels
+    Token usage is estimated from the text lengths.
+    """
+
+    name = "stub"
+
+    def __init__(self, model="stub", json_mode=True, max_inflight=LLM_PROVIDER_MAX_INFLIGHT,
+                 latency=LLM_STUB_LATENCY_SECONDS, jitter=LLM_STUB_JITTER_SECONDS, responses_path=LLM_STUB_RESPONSES,
+                 seconds_per_1k_prompt_tokens=LLM_STUB_SECONDS_PER_1K_PROMPT_TOKENS):
+        super().__init__(model, json_mode, max_inflight)
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_1k_prompt_tokens = seconds_per_1k_prompt_tokens
+        self.responses = []
+        if responses_path:
+            with open(responses_path, encoding="utf-8") as f:
+                self.responses = json.load(f)
+
+    def delay(self, prompt):
+        """
+        Simulated latency for this prompt (same prompt, same delay).
+        """
+        latency = self.latency + estimate_tokens(prompt) / 1000 * self.seconds_per_1k_prompt_tokens
+        if not self.jitter:
+            return latency
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        return max(latency + random.Random(seed).uniform(-self.jitter, self.jitter), 0.0)
+
+    def respond(self, prompt):
+        for entry in self.responses:
+            if entry["match"] in prompt:
+                return entry["response"]
+        question = _section(prompt, "### User Question")
+        if "### Retrieved Knowledge" in prompt:
+            return json.dumps(_stub_answer(question, _section(prompt, "### Retrieved Knowledge")), ensure_ascii=False)
+        return json.dumps(_stub_sparql(question), ensure_ascii=False)
+
+    def _generate(self, prompt, timeout=None):
+        delay = self.delay(prompt)
+        if timeout and delay > timeout:
+            # Like a backend deadline: the call fails once `timeout` has passed
+            time.sleep(timeout)
+            raise TimeoutError(f"Stub call exceeded its {timeout:.1f}s timeout")
+        time.sleep(delay)
+        text = self.respond(prompt)
+        return text, make_usage(estimate_tokens(prompt), estimate_tokens(text))
+
+    def _stream(self, prompt, timeout=None):
+        # Half of the latency before the first chunk, the rest spread over the chunks
+        delay = self.delay(prompt)
+        text = self.respond(prompt)
+        size = max(LLM_STUB_STREAM_CHUNK_CHARS, 1)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        # Like a backend deadline: the call fails once `timeout` has passed
+        deadline = time.monotonic() + timeout if timeout else None
+        time.sleep(delay / 2 if deadline is None else min(delay / 2, max(deadline - time.monotonic(), 0)))
+        for chunk in chunks:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Stub stream exceeded its {timeout:.1f}s timeout")
+            yield chunk
+            time.sleep(delay / 2 / len(chunks))
+        return make_usage(estimate_tokens(prompt), estimate_tokens(text))
+
+def _section(prompt, heading):
+    """
+    Text between a "### ..." heading and the next one.
+    """
+    start = prompt.find(heading)
+    if start == -1:
+        return ""
+    start = prompt.find("\n", start) + 1
+    end = prompt.find("\n    ###", start)
+    return prompt[start:end if end != -1 else len(prompt)].strip()
+
+_STUB_WORD = re.compile(r"[가-힣A-Za-z]{2,}")
+
+def _stub_sparql(question):
+    words = _STUB_WORD.findall(question) or ["수학"]
+    pattern = "|".join(words[:5])
+    query = (
+        "PREFIX : <http://snu.ac.kr/math/> PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#> "
+        "SELECT ?targetLabel ?targetSubject ?targetChapter WHERE { ?target a :Concept ; rdfs:label ?targetLabel . "
+        f"FILTER(regex(?targetLabel, '{pattern}', 'i')) "
+        "OPTIONAL { ?targetSection :hasConcept ?target . ?targetChapNode :hasSection ?targetSection . "
+        "?targetSubNode :hasChapter ?targetChapNode . ?targetSubNode rdfs:label ?targetSubject . "
+        "?targetChapNode rdfs:label ?targetChapter . } }"
+    )
+    return {"query": query, "explanation": f"(stub) '{pattern}'을(를) 검색합니다."}
+
+def _summary_rows(data_summary):
+    """
+    (label, subject, chapter) triples from a data_summary: JSON rows, or the
+    grouped "[Subject > Chapter]" / "- Concept (...)" format of prompt_encoder.py.
+    """
+    if data_summary.startswith("["):
+        try:
+            rows = json.loads(data_summary.split("\n")[0])
+            return [(r.get("targetLabel"), r.get("targetSubject"), r.get("targetChapter")) for r in rows if isinstance(r, dict)]
+        except ValueError:
+            pass
+    triples = []
+    subject = chapter = None
+    for line in data_summary.split("\n"):
+        if line.startswith("[") and " > " in line:
+            subject, chapter = line.strip("[]").split(" > ", 1)
+        elif line.startswith("- "):
+            triples.append((line[2:].split(" (")[0], subject, chapter))
+    return triples
+
+def _stub_answer(question, data_summary):
+    evidence = []
+    for label, subject, chapter in _summary_rows(data_summary):
+        if label and all(item["concept"] != label for item in evidence):
+            evidence.append({
+                "subject": subject or "Unknown",
+                "chapter": chapter or "Unknown",
+                "concept": label,
+                "desc": "(stub) 검색된 개념",
+            })
+    answer = f"(stub) '{question}'에 대한 답변입니다. 관련 개념 {len(evidence)}개를 찾았습니다."
+    return {"answer": answer, "evidence": evidence[:10]}
+
+def load_google_api_key():
+    """
+    GOOGLE_API_KEY from the environment, .env, or the project root's .env.
+    """
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        parent_env = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
+        if os.path.exists(parent_env):
+            load_dotenv(parent_env)
+            api_key = os.getenv("GOOGLE_API_KEY")
+    return api_key
+
+PROVIDERS = {"gemini": GeminiProvider, "stub": StubProvider}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def provider_settings(stage):
+    """
+    (provider name, model) for a stage: LLM_<STAGE>_PROVIDER / LLM_<STAGE>_MODEL,
+    falling back to LLM_PROVIDER / LLM_MODEL.
+    """
+    prefix = f"LLM_{stage.upper()}_"
+    provider = os.getenv(prefix + "PROVIDER", LLM_PROVIDER)
+    model = os.getenv(prefix + "MODEL", LLM_MODEL if provider == LLM_PROVIDER else DEFAULT_MODELS.get(provider, ""))
+    return provider, model
+
+def get_provider(stage):
+    """
+    Provider for a pipeline stage, created on first use and shared afterwards
+    (stages with the same settings share one instance and its client).
+
+    Raises:
+        ValueError: Unknown provider, or missing credentials.
+    """
+    provider, model = provider_settings(stage)
+    key = (provider, model)
+    with _providers_lock:
+        instance = _providers.get(key)
+        if instance is None:
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unknown LLM provider '{provider}' (choose from {', '.join(PROVIDERS)})")
+            instance = PROVIDERS[provider](model)
+            _providers[key] = instance
+        return instance
+
+def usage_stats():
+    """
+    Token usage and call counts of every provider created so far.
+    """
+    with _providers_lock:
+        providers = list(_providers.values())
+    return [provider.usage_stats() for provider in providers]
@@ -1,6 +1,16 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from pydantic import BaseModel
+from typing import List, Literal, Optional
+from collections import Counter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import asyncio
+import atexit
+import functools
+import time
+import json
 import uvicorn
 import os
 import sys
@@ -8,8 +18,76 @@ import sys
 # Add current directory to path so imports work
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from reasoning_engine import generate_sparql, execute_sparql, generate_answer
-from graph_loader import load_graph, generate_schema_info
+from reasoning_engine import generate_sparql, execute_sparql, generate_answer, generate_answer_stream, fast_path_sparql, build_graph_only_answer, SPARQL_STAGE, ANSWER_STAGE, llm_cache, sparql_result_cache, prepared_query_cache
+from graph_loader import load_graph, generate_schema_info, get_label_index, get_hierarchy_table, union_view
+from graph_engine import get_graph_engine
+from prerequisite_index import get_prerequisite_index
+from learning_path import build_learning_path
+from retrieval import retrieve_subgraph
+from ngram_index import get_ngram_index, similar_labels
+from latency_stats import LatencyStats, LatencyBudget
+from llm_provider import get_provider, provider_settings, usage_stats
+from prompt_encoder import prompt_size_stats
+from sparql_pool import SparqlWorkerPool, SPARQL_WORKERS
+from admission import AdmissionController, Overloaded
+import metrics
+import tracing
+
+# Concurrency Settings
+# LLM and rdflib (SPARQL) calls are blocking, so they run on dedicated
+# thread pools instead of the event loop. The LLM pool size is the hard cap on
+# in-flight Gemini calls; extra requests wait in the pool queue.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+GRAPH_MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", "4"))
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_TIMEOUT_SECONDS", "60"))
+
+# Latency Budget
+# Each request gets CHAT_BUDGET_SECONDS, split across stages. A stage that
+# misses its share degrades instead of failing: SPARQL generation falls back to
+# local subgraph retrieval, the answer falls back to a graph-only template.
+# CHAT_TIMEOUT_SECONDS stays as the hard backstop. LLM calls get the time left
+# (plus LLM_TIMEOUT_GRACE_SECONDS, so the budget miss and not a backend timeout
+# error decides the fallback) as their backend request timeout.
+CHAT_BUDGET_SECONDS = float(os.getenv("CHAT_BUDGET_SECONDS", "20"))
+STAGE_BUDGET_SHARES = {
+    "sparql_llm": float(os.getenv("BUDGET_SPARQL_LLM_SHARE", "0.4")),
+    "sparql": float(os.getenv("BUDGET_SPARQL_SHARE", "0.15")),
+    # answer: whatever is left
+}
+LLM_TIMEOUT_GRACE_SECONDS = float(os.getenv("LLM_TIMEOUT_GRACE_SECONDS", "0.25"))
+
+# Hedged LLM Calls
+# A duplicate call starts when the first is slower than the stage's recent
+# LLM_HEDGE_PERCENTILE latency (never earlier than LLM_HEDGE_MIN_DELAY_SECONDS);
+# the first result wins. The loser keeps its LLM pool thread until it returns
+# (at most until the deadline, via the backend request timeout).
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+
+# Pipeline Mode
+# "two_call": question -> SPARQL (LLM or fast path) -> rows -> answer (LLM)
+# "retrieval": question -> local label match + k-hop subgraph -> answer (one LLM call)
+# Selectable per request (ChatRequest.mode); this is the default.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_call")
+
+# Admission Control
+# At most ADMISSION_MAX_CONCURRENCY chat requests run the pipeline (LLM stages)
+# at once; up to ADMISSION_MAX_QUEUE more wait in order. A request is shed when
+# the queue is full, when its predicted queue time exceeds
+# ADMISSION_MAX_WAIT_SECONDS, or once it has waited that long. Shed requests get
+# a graph-only answer when the question names a known concept
+# (ADMISSION_SHED_MODE=graph_only), otherwise 429 with Retry-After.
+# ADMISSION_MAX_CONCURRENCY=0 disables admission control.
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+ADMISSION_SHED_MODE = os.getenv("ADMISSION_SHED_MODE", "graph_only") # "graph_only" | "reject"
+
+llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+graph_executor = ThreadPoolExecutor(max_workers=GRAPH_MAX_CONCURRENCY, thread_name_prefix="graph")
+admission = AdmissionController(ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
 
 app = FastAPI()
 
@@ -24,46 +102,544 @@ app.add_middleware(
 
 # Load Graph ONCE at startup
 print("Initializing Knowledge Graph...")
-TBOX_PATH = "/Users/hanjaehoon/pythonz/onthology_camp/dongbo_kids/math_bot_proto/data/ontology/math_tbox.ttl"
-DATA_PATH = "/Users/hanjaehoon/pythonz/onthology_camp/dongbo_kids/math_bot_proto/data/knowledge_graph/math_abox.ttl"
+# Loaded from binary snapshots when fresh ones exist (python build_snapshot.py)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TBOX_PATH = os.getenv("TBOX_PATH", os.path.join(PROJECT_ROOT, "data", "ontology", "math_tbox.ttl"))
+DATA_PATH = os.getenv("DATA_PATH", os.path.join(PROJECT_ROOT, "data", "knowledge_graph", "math_abox.ttl"))
 
 g = load_graph(DATA_PATH)
 tbox = load_graph(TBOX_PATH)
-full_graph = g + tbox
+full_graph = union_view(g, tbox) # Zero-copy merged view (g + tbox would duplicate every triple)
 schema_info = generate_schema_info(full_graph)
+label_index = get_label_index(full_graph)
+hierarchy_table = get_hierarchy_table(full_graph)
+graph_engine = get_graph_engine(full_graph)
+prerequisite_index = get_prerequisite_index(full_graph)
+ngram_index = get_ngram_index(full_graph) # Reused from data/snapshot/ while the graph_version is unchanged
+print(f"[INFO] Label index: {len(label_index)} labels, hierarchy table: {len(hierarchy_table)} nodes")
+print(f"[INFO] Graph engine: {len(graph_engine)} nodes, {graph_engine.memory_bytes() / 1024:.1f} KiB")
+print(f"[INFO] N-gram index: {len(ngram_index)} documents, {len(ngram_index.terms)} n-grams")
 print("Graph Initialized.")
 
+for stage in (SPARQL_STAGE, ANSWER_STAGE):
+    try:
+        get_provider(stage)
+        print(f"[INFO] LLM for {stage}: {':'.join(provider_settings(stage))}")
+    except Exception as e:
+        print(f"[WARN] LLM for {stage} unavailable ({e}); answers will be graph-only")
+
+# LLM-written SPARQL runs in worker processes with their own copy of the graph:
+# a runaway query is killed at its deadline instead of pinning a server thread.
+sparql_pool = None
+if SPARQL_WORKERS > 0 and os.name == "posix":
+    sparql_pool = SparqlWorkerPool([DATA_PATH, TBOX_PATH])
+    atexit.register(sparql_pool.close)
+    print(f"[INFO] SPARQL workers: {sparql_pool.size} processes (timeout {sparql_pool.timeout}s, LIMIT {sparql_pool.max_rows})")
+else:
+    print("[INFO] SPARQL workers disabled; queries run in the graph thread pool")
+
+# End-to-end and per-stage latency per pipeline mode (GET /pipeline/stats)
+pipeline_latency = LatencyStats()
+# Per-stage LLM call latency (hedge delays) and hedge/degrade counters
+llm_latency = LatencyStats()
+pipeline_events = Counter()
+
+def server_metrics():
+    """
+    Scrape-time values for GET /metrics that live outside metrics.py.
+    """
+    families = [
+        ("chatbot_pipeline_events", "counter", "Hedged LLM calls, hedge wins and degraded stages.",
+         [({"event": event}, count) for event, count in sorted(pipeline_events.items())]),
+        ("chatbot_executor_queued", "gauge", "Jobs waiting for a thread per executor.",
+         [({"executor": "llm"}, llm_executor._work_queue.qsize()), ({"executor": "graph"}, graph_executor._work_queue.qsize())]),
+        ("chatbot_admission_queue_depth", "gauge", "Chat requests waiting for an admission slot.", [({}, admission.queued)]),
+        ("chatbot_admission_active", "gauge", "Chat requests holding an admission slot.", [({}, admission.active)]),
+    ]
+    if sparql_pool:
+        stats = sparql_pool.stats()
+        families.append(("chatbot_sparql_workers", "gauge", "SPARQL worker processes by state.",
+                         [({"state": "live"}, stats["workers"]), ({"state": "idle"}, stats["idle"])]))
+        families.append(("chatbot_sparql_worker_restarts", "counter", "SPARQL workers replaced after a timeout or crash.",
+                         [({}, stats["restarts"])]))
+    return families
+
+metrics.registry.add_collector(server_metrics)
+
 class ChatRequest(BaseModel):
     message: str
+    mode: Optional[Literal["two_call", "retrieval"]] = None # None: PIPELINE_MODE
+
+class PathRequest(BaseModel):
+    target: str
+    source: Optional[str] = None # Given: shortest chain source -> target; else: study plan
+    known: List[str] = []
+
+async def run_in_pool(executor, func, *args, **kwargs):
+    """
+    Runs a blocking function on the given executor without blocking the event loop.
+    If the awaiting request is cancelled (e.g. timeout) before the job starts,
+    the queued job is dropped as well. The caller's context (current trace
+    span) is carried into the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, context.run, functools.partial(func, *args, **kwargs))
+
+def close_after(job, stream):
+    """
+    Closes a blocking stream generator once its in-flight next() (`job`, a
+    Future on the LLM pool) is done. A timed-out next() cannot be interrupted,
+    so the orphaned work is capped at the chunk it is waiting for: closing the
+    generator then closes the provider stream and frees its slot instead of
+    reading the rest of the answer on an LLM pool thread.
+    """
+    if job is None:
+        stream.close()
+    else:
+        job.add_done_callback(lambda _: stream.close())
+
+def hedge_delay(stage):
+    """
+    Seconds to wait before hedging an LLM call of this stage, or None (hedging
+    off or not enough samples yet).
+    """
+    if not LLM_HEDGE_ENABLED:
+        return None
+    delay = llm_latency.percentile(stage, LLM_HEDGE_PERCENTILE, min_samples=LLM_HEDGE_MIN_SAMPLES)
+    return None if delay is None else max(delay, LLM_HEDGE_MIN_DELAY_SECONDS)
+
+async def call_llm(stage, timeout, func, *args, **kwargs):
+    """
+    Runs a blocking LLM call on the LLM pool within `timeout` seconds, hedged
+    with a second identical call after hedge_delay(stage). `func` gets the time
+    left (+ LLM_TIMEOUT_GRACE_SECONDS) as its `timeout` keyword, so an abandoned
+    call ends at the deadline instead of holding an LLM pool thread.
+    
+    Raises:
+        asyncio.TimeoutError: If no call finished in time.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first = asyncio.ensure_future(run_in_pool(llm_executor, func, *args, timeout=timeout + LLM_TIMEOUT_GRACE_SECONDS, **kwargs))
+    tasks = [first]
+    try:
+        delay = hedge_delay(stage)
+        if delay is not None and delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                pipeline_events[f"hedged.{stage}"] += 1
+                tracing.annotate(hedged_after_ms=round(delay * 1000, 1))
+                tasks.append(asyncio.ensure_future(run_in_pool(llm_executor, func, *args, timeout=timeout - delay + LLM_TIMEOUT_GRACE_SECONDS, **kwargs)))
+        
+        done, _ = await asyncio.wait(tasks, timeout=max(timeout - (loop.time() - start), 0), return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            tracing.annotate(timed_out=True)
+            raise asyncio.TimeoutError()
+        winner = first if first in done else done.pop()
+        if winner is not first:
+            pipeline_events[f"hedge_won.{stage}"] += 1
+            tracing.annotate(hedge_won=True)
+        return winner.result()
+    finally:
+        llm_latency.record(stage, loop.time() - start)
+        for task in tasks:
+            task.cancel()
+
+async def retrieve_knowledge(user_msg, mode=PIPELINE_MODE, budget=None):
+    """
+    Stages 1-2 of the pipeline: question -> SPARQL (LLM) -> rows (rdflib).
+    sparql_res['route'] records whether the local subgraph retrieval
+    ("retrieval"), the LLM-free fast path ("fast_path"), the
+    SPARQL-generation LLM ("llm") or the retrieval fallback after the LLM
+    missed its budget ("retrieval_fallback") produced the rows.
+    """
+    budget = budget or LatencyBudget(CHAT_BUDGET_SECONDS, STAGE_BUDGET_SHARES)
+    
+    # Retrieval-first mode: no SPARQL round trip when the question names a known label
+    if mode == "retrieval":
+        retrieved = await run_in_pool(graph_executor, retrieve_subgraph, user_msg, full_graph)
+        if retrieved:
+            print(f"[RETRIEVAL] {len(retrieved['rows'])} nodes")
+            metrics.retrieved_rows.observe(len(retrieved["rows"]), route="retrieval")
+            return {"query": "", "explanation": retrieved["explanation"], "route": "retrieval"}, retrieved["rows"]
+    
+    # 1. Reasoning (fast path first: questions naming a known concept skip the LLM)
+    with tracing.span("fast_path") as trace_span:
+        sparql_res = fast_path_sparql(user_msg, label_index)
+        if trace_span:
+            trace_span.set(hit=bool(sparql_res))
+    if sparql_res:
+        sparql_res["route"] = "fast_path"
+    else:
+        # Closest labels from the n-gram index steer the generated regex toward existing spellings
+        with tracing.span("label_hints") as trace_span:
+            label_hints = await run_in_pool(graph_executor, similar_labels, user_msg, full_graph)
+            if trace_span:
+                trace_span.set(hints=len(label_hints))
+        try:
+            with tracing.span("sparql_llm", budget_ms=round(budget.stage("sparql_llm") * 1000)):
+                sparql_res = dict(await call_llm("sparql_llm", budget.stage("sparql_llm"), generate_sparql, user_msg, schema_info, label_hints=label_hints))
+            sparql_res["route"] = "llm"
+        except asyncio.TimeoutError:
+            pipeline_events["degraded.sparql_llm"] += 1
+            print(f"[WARN] SPARQL generation missed its {budget.total * STAGE_BUDGET_SHARES['sparql_llm']:.1f}s budget; using local retrieval")
+            retrieved = await run_in_pool(graph_executor, retrieve_subgraph, user_msg, full_graph)
+            if retrieved:
+                metrics.retrieved_rows.observe(len(retrieved["rows"]), route="retrieval_fallback")
+                return {"query": "", "explanation": retrieved["explanation"], "route": "retrieval_fallback"}, retrieved["rows"]
+            metrics.retrieved_rows.observe(0, route="retrieval_fallback")
+            return {"query": "", "explanation": "", "route": "retrieval_fallback"}, []
+    print(f"[SPARQL][{sparql_res['route']}] {sparql_res.get('query')}")
+    
+    # 2. Execution (fast-path queries are built locally and stay in-process)
+    if sparql_res.get('query'):
+        pool = sparql_pool if sparql_res["route"] == "llm" else None
+        db_res = await run_in_pool(graph_executor, execute_sparql, sparql_res['query'], full_graph, enrich=sparql_res.get('enrich'), pool=pool, timeout=budget.stage("sparql"))
+        print(f"[DB] Found {len(db_res)} rows")
+    else:
+        db_res = []
+    metrics.retrieved_rows.observe(len(db_res), route=sparql_res["route"])
+    
+    return sparql_res, db_res
+
+def degrade_answer(db_res, sparql_res, reason):
+    """
+    Graph-only answer for a missed or failed answer stage.
+    """
+    pipeline_events["degraded.answer"] += 1
+    print(f"[WARN] Answer stage {reason}; returning graph-only answer")
+    return build_graph_only_answer(db_res, sparql_res.get('explanation', ''))
+
+def record_latency(mode, stages):
+    """
+    Records stage durations (seconds) under "<mode>.<stage>" and the total under "<mode>"
+    (also as chatbot_stage_seconds histograms for /metrics).
+    Returns the same durations in milliseconds for the response.
+    """
+    for stage, seconds in stages.items():
+        pipeline_latency.record(f"{mode}.{stage}", seconds)
+        metrics.stage_seconds.observe(seconds, mode=mode, stage=stage)
+    total = sum(stages.values())
+    pipeline_latency.record(mode, total)
+    metrics.stage_seconds.observe(total, mode=mode, stage="total")
+    return {**{stage: round(seconds * 1000, 1) for stage, seconds in stages.items()}, "total": round(total * 1000, 1)}
+
+async def run_chat_pipeline(user_msg, mode=PIPELINE_MODE):
+    start = time.perf_counter()
+    budget = LatencyBudget(CHAT_BUDGET_SECONDS, STAGE_BUDGET_SHARES)
+    sparql_res, db_res = await retrieve_knowledge(user_msg, mode, budget)
+    retrieved = time.perf_counter()
+        
+    # 3. Answer Generation (whatever budget is left; graph-only answer on a miss)
+    try:
+        with tracing.span("answer_llm", budget_ms=round(budget.remaining() * 1000)):
+            final_response = await call_llm("answer", budget.remaining(), generate_answer, user_msg, db_res, sparql_res.get('explanation', ''))
+        if final_response.get("error"):
+            final_response = degrade_answer(db_res, sparql_res, "failed")
+    except asyncio.TimeoutError:
+        final_response = degrade_answer(db_res, sparql_res, "missed its deadline")
+    latency = record_latency(mode, {"retrieve": retrieved - start, "answer": time.perf_counter() - retrieved})
+    outcome = "degraded" if final_response.get("degraded") else "ok"
+    metrics.requests.inc(endpoint="chat", mode=mode, route=sparql_res["route"], outcome=outcome)
+    tracing.annotate(route=sparql_res["route"], rows=len(db_res), outcome=outcome)
+    return {**final_response, "route": sparql_res["route"], "mode": mode, "latency_ms": latency}
+
+async def shed_answer(user_msg, mode, endpoint, overloaded):
+    """
+    LLM-free answer for a request shed by admission control: fast-path rows
+    for a named concept, else the local subgraph, as a graph-only answer.
+
+    Returns:
+        tuple | None: (sparql_res, rows, response dict), or None when the
+        graph has nothing for the question (or ADMISSION_SHED_MODE=reject).
+    """
+    print(f"[WARN] Request shed ({overloaded.reason}); retry after {overloaded.retry_after}s")
+    local = None
+    if ADMISSION_SHED_MODE == "graph_only":
+        try:
+            local = await retrieve_local(user_msg)
+        except Exception as e:
+            metrics.record_error("shed_answer", e)
+            print(f"[WARN] Graph-only answer for shed request failed: {e}")
+    if not local:
+        metrics.requests.inc(endpoint=endpoint, mode=mode, route="unknown", outcome="rejected")
+        return None
+    sparql_res, db_res = local
+    metrics.requests.inc(endpoint=endpoint, mode=mode, route=sparql_res["route"], outcome="shed")
+    answer = build_graph_only_answer(db_res, sparql_res.get('explanation', ''))
+    return sparql_res, db_res, {**answer, "route": sparql_res["route"], "mode": mode, "shed": overloaded.reason}
+
+async def retrieve_local(user_msg):
+    """
+    Rows for the question without any LLM call, or None.
+    """
+    sparql_res = fast_path_sparql(user_msg, label_index)
+    if sparql_res:
+        db_res = await run_in_pool(graph_executor, execute_sparql, sparql_res['query'], full_graph, enrich=sparql_res.get('enrich'))
+        return ({**sparql_res, "route": "fast_path"}, db_res) if db_res else None
+    retrieved = await run_in_pool(graph_executor, retrieve_subgraph, user_msg, full_graph)
+    if not retrieved:
+        return None
+    return {"query": "", "explanation": retrieved["explanation"], "route": "retrieval"}, retrieved["rows"]
+
+def busy_response(overloaded):
+    """
+    429 for a shed request without a graph-only answer, in the /chat shape.
+    """
+    return JSONResponse(
+        status_code=429,
+        content={
+            "answer": f"지금 질문이 많아 답변이 늦어지고 있습니다. {overloaded.retry_after}초 후에 다시 질문해 주세요.",
+            "evidence": [],
+            "retry_after": overloaded.retry_after,
+        },
+        headers={"Retry-After": str(overloaded.retry_after)},
+    )
+
+def debug_requested(debug, header):
+    return debug or (header or "").lower() in ("1", "true")
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response, debug: bool = False, x_debug_trace: Optional[str] = Header(None)):
+    """
+    With ?debug=1 (or X-Debug-Trace: 1) the request is always traced and the
+    span tree is returned under "trace"; sampled requests (TRACE_SAMPLE_RATE)
+    get only the Server-Timing header.
+    When admission control sheds the request, the answer is graph-only
+    ("shed" says why) or a 429 with Retry-After.
+    """
+    mode = request.mode or PIPELINE_MODE
+    debug = debug_requested(debug, x_debug_trace)
+    user_msg = request.message
     try:
-        user_msg = request.message
         print(f"[User] {user_msg}")
         
-        # 1. Reasoning
-        sparql_res = generate_sparql(user_msg, schema_info)
-        print(f"[SPARQL] {sparql_res.get('query')}")
-        
-        # 2. Execution
-        if sparql_res.get('query'):
-            db_res = execute_sparql(sparql_res['query'], full_graph)
-            print(f"[DB] Found {len(db_res)} rows")
-        else:
-            db_res = []
-            
-        # 3. Answer Generation
-        final_response = generate_answer(user_msg, db_res, sparql_res.get('explanation', ''))
+        with tracing.start_trace("chat", sampled=True if debug else None, mode=mode) as trace:
+            async with admission.slot() as slot:
+                tracing.annotate(queue_wait_ms=round(slot.wait * 1000, 1))
+                final_response = await asyncio.wait_for(run_chat_pipeline(user_msg, mode), timeout=CHAT_TIMEOUT_SECONDS)
+        if trace:
+            response.headers["Server-Timing"] = trace.server_timing()
+            if debug:
+                final_response["trace"] = trace.to_dict()
         
         return final_response
+    
+    except Overloaded as e:
+        shed = await shed_answer(user_msg, mode, "chat", e)
+        return shed[2] if shed else busy_response(e)
+    
+    except asyncio.TimeoutError as e:
+        metrics.requests.inc(endpoint="chat", mode=mode, route="unknown", outcome="timeout")
+        metrics.record_error("chat", e)
+        print(f"[Error] Request timed out after {CHAT_TIMEOUT_SECONDS}s")
+        return {
+            "answer": "죄송합니다. 응답 시간이 초과되었습니다. 잠시 후 다시 시도해 주세요.",
+            "evidence": []
+        }
             
     except Exception as e:
+        metrics.requests.inc(endpoint="chat", mode=mode, route="unknown", outcome="error")
+        metrics.record_error("chat", e)
         print(f"[Error] {e}")
         return {
             "answer": "죄송합니다. 시스템 오류가 발생했습니다.",
             "evidence": []
         }
 
+def sse_event(event, data):
+    """
+    Formats one Server-Sent Event frame with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+_STREAM_END = object()
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse holding an admission slot: the slot is released when
+    the response ends, whether it completed, failed, was cancelled or the
+    client disconnected (Starlette skips the background task in some of these).
+    """
+
+    def __init__(self, content, slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+async def stream_chat_events(user_msg, mode=PIPELINE_MODE, debug=False, slot=None):
+    """
+    Yields SSE frames in order: 'sparql' -> 'rows' -> 'token'* -> 'evidence'.
+    On failure or timeout a single 'error' frame is sent instead of the rest.
+    Headers are sent before the pipeline runs, so a debug trace is attached to
+    the 'evidence' frame instead of a Server-Timing header.
+    The admission `slot` is released when the stream ends.
+    """
+    try:
+        with tracing.start_trace("chat_stream", sampled=True if debug else None, mode=mode) as trace:
+            if slot:
+                tracing.annotate(queue_wait_ms=round(slot.wait * 1000, 1))
+            async for frame in _stream_chat_events(user_msg, mode, trace if debug else None):
+                yield frame
+    finally:
+        if slot:
+            slot.release()
+
+async def shed_stream_events(sparql_res, db_res, response):
+    """
+    Graph-only answer of a shed request as 'sparql' -> 'rows' -> 'evidence' frames.
+    """
+    yield sse_event("sparql", {"query": sparql_res.get("query", ""), "explanation": sparql_res.get("explanation", ""), "route": sparql_res["route"]})
+    yield sse_event("rows", db_res)
+    yield sse_event("evidence", response)
+
+async def _stream_chat_events(user_msg, mode, trace):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + CHAT_TIMEOUT_SECONDS
+    budget = LatencyBudget(CHAT_BUDGET_SECONDS, STAGE_BUDGET_SHARES)
+    
+    def remaining():
+        return max(deadline - loop.time(), 0)
+    
+    try:
+        sparql_res, db_res = await asyncio.wait_for(retrieve_knowledge(user_msg, mode, budget), timeout=remaining())
+        retrieved = loop.time()
+        yield sse_event("sparql", {"query": sparql_res.get("query", ""), "explanation": sparql_res.get("explanation", ""), "route": sparql_res["route"]})
+        yield sse_event("rows", db_res)
+        
+        # The Gemini stream is a blocking iterator, so every next() goes through the LLM pool.
+        # Streams are not hedged (tokens already sent cannot be swapped); a missed
+        # deadline replaces the answer with the graph-only one in the final event.
+        # The LLM call itself is capped at the same deadline, and the stream is
+        # closed however this loop ends (answer, timeout, client disconnect).
+        answer_iter = generate_answer_stream(user_msg, db_res, sparql_res.get('explanation', ''), timeout=budget.remaining())
+        job = None
+        try:
+            while True:
+                job = llm_executor.submit(contextvars.copy_context().run, next, answer_iter, _STREAM_END)
+                try:
+                    item = await asyncio.wait_for(asyncio.wrap_future(job), timeout=budget.remaining())
+                except asyncio.TimeoutError:
+                    pipeline_events["stream_timeout"] += 1
+                    tracing.annotate(timed_out=True)
+                    item = ("result", degrade_answer(db_res, sparql_res, "missed its deadline"))
+                if item is _STREAM_END:
+                    break
+                kind, payload = item
+                if kind == "token":
+                    yield sse_event("token", {"text": payload})
+                else:
+                    if payload.get("error"):
+                        payload = degrade_answer(db_res, sparql_res, "failed")
+                    latency = record_latency(mode, {"retrieve": retrieved - start, "answer": loop.time() - retrieved})
+                    outcome = "degraded" if payload.get("degraded") else "ok"
+                    metrics.requests.inc(endpoint="chat_stream", mode=mode, route=sparql_res["route"], outcome=outcome)
+                    tracing.annotate(route=sparql_res["route"], rows=len(db_res), outcome=outcome)
+                    if trace:
+                        trace.finish()
+                        payload = {**payload, "trace": trace.to_dict()}
+                    yield sse_event("evidence", {**payload, "route": sparql_res["route"], "mode": mode, "latency_ms": latency})
+                    break
+        finally:
+            close_after(job, answer_iter)
+    
+    except asyncio.TimeoutError as e:
+        metrics.requests.inc(endpoint="chat_stream", mode=mode, route="unknown", outcome="timeout")
+        metrics.record_error("chat_stream", e)
+        print(f"[Error] Stream timed out after {CHAT_TIMEOUT_SECONDS}s")
+        yield sse_event("error", {"answer": "죄송합니다. 응답 시간이 초과되었습니다. 잠시 후 다시 시도해 주세요.", "evidence": []})
+    
+    except Exception as e:
+        metrics.requests.inc(endpoint="chat_stream", mode=mode, route="unknown", outcome="error")
+        metrics.record_error("chat_stream", e)
+        print(f"[Error] {e}")
+        yield sse_event("error", {"answer": "죄송합니다. 시스템 오류가 발생했습니다.", "evidence": []})
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, debug: bool = False, x_debug_trace: Optional[str] = Header(None)):
+    """
+    Admission is decided before the stream starts, so a shed request still
+    gets a real 429 (or a graph-only answer stream).
+    """
+    print(f"[User][stream] {request.message}")
+    mode = request.mode or PIPELINE_MODE
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    try:
+        slot = await admission.acquire()
+    except Overloaded as e:
+        shed = await shed_answer(request.message, mode, "chat_stream", e)
+        if not shed:
+            return busy_response(e)
+        return StreamingResponse(shed_stream_events(*shed), media_type="text/event-stream", headers=headers)
+    # The generator releases the slot when the pipeline finishes; the response
+    # releases it however it ends (also when the client disconnects before the
+    # generator ever starts, where neither its finally nor a background task runs)
+    try:
+        return SlotStreamingResponse(
+            stream_chat_events(request.message, mode, debug_requested(debug, x_debug_trace), slot),
+            slot,
+            media_type="text/event-stream",
+            headers=headers,
+        )
+    except BaseException:
+        slot.release()
+        raise
+
+@app.post("/path")
+async def learning_path(request: PathRequest):
+    """
+    LLM-free learning path over the prerequisite graph (study plan or shortest chain).
+    Returns the /chat answer/evidence shape so the frontend can render it directly.
+    """
+    try:
+        return await run_in_pool(graph_executor, build_learning_path, full_graph, request.target, request.source, request.known)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    """
+    Latency per pipeline mode ("two_call" vs "retrieval") and per stage,
+    LLM call latency per stage, hedge / degraded-answer counts, admission
+    queue state, token usage and answer-prompt size (compact encoding vs.
+    plain JSON rows).
+    """
+    return {
+        "default_mode": PIPELINE_MODE,
+        "budget_s": CHAT_BUDGET_SECONDS,
+        "hedging": LLM_HEDGE_ENABLED,
+        "admission": admission.stats(),
+        "latency": pipeline_latency.stats(),
+        "llm_latency": llm_latency.stats(),
+        "events": dict(pipeline_events),
+        "llm_usage": usage_stats(),
+        "answer_prompt_size": prompt_size_stats.stats(),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Per-stage latency histograms, token / cache / error counters and process
+    resources in the Prometheus text format. Metrics are per process: with
+    several uvicorn workers, scrape each one.
+    """
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "llm": {"enabled": True, **llm_cache.stats()} if llm_cache else {"enabled": False},
+        "sparql": sparql_result_cache.stats(),
+        "prepared_queries": prepared_query_cache.stats(),
+        "sparql_workers": sparql_pool.stats() if sparql_pool else {"enabled": False},
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,240 @@
+import threading
+import time
+import os
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# Histogram buckets (seconds): LLM / request latencies vs. in-process steps
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(list(zip(self.labelnames, key)), value))
+        return lines
+
+class Counter(_Metric):
+    """
+    Monotonic count per label set.
+    """
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_sample(self, labels, value):
+        return [f"{self.name}_total{format_labels(labels)} {_format_value(value)}"]
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram per label set (Prometheus semantics:
+    histogram_quantile() over the _bucket series gives p50/p95/p99).
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """
+        Context manager observing the elapsed seconds of its block.
+        """
+        return _Timer(self, labels)
+
+    def _render_sample(self, labels, entry):
+        with self._lock:
+            counts, total, count = list(entry[0]), entry[1], entry[2]
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{format_labels(labels + [('le', _format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class Registry:
+    """
+    Metrics of this process in the Prometheus text format (GET /metrics).
+
+    Besides registered Counters / Histograms, collectors are called at scrape
+    time for values that live elsewhere (pool sizes, event counters); each
+    returns a list of (name, type, help, [(labels dict, value), ...]).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"[WARN] Metrics collector failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                sample_name = f"{name}_total" if kind == "counter" else name
+                for labels, value in samples:
+                    lines.append(f"{sample_name}{format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+# --- Pipeline metrics (recorded by llm_provider.py, reasoning_engine.py, admission.py and main.py) ---
+
+llm_latency_seconds = registry.histogram(
+    "chatbot_llm_request_seconds", "LLM API call latency (request to last byte) per stage and model.", ("stage", "model"))
+llm_tokens = registry.counter(
+    "chatbot_llm_tokens", "LLM tokens per stage, model and kind (prompt / output).", ("stage", "model", "kind"))
+llm_prompt_tokens = registry.histogram(
+    "chatbot_llm_prompt_tokens", "Prompt size per LLM call in tokens.", ("stage",), buckets=TOKEN_BUCKETS)
+llm_json_parse_seconds = registry.histogram(
+    "chatbot_llm_json_parse_seconds", "Time to parse the LLM's JSON response.", ("stage",), buckets=FAST_BUCKETS)
+sparql_parse_seconds = registry.histogram(
+    "chatbot_sparql_parse_seconds", "SPARQL parse/translate (or prepared-template copy) time.", ("executor",), buckets=FAST_BUCKETS)
+sparql_eval_seconds = registry.histogram(
+    "chatbot_sparql_eval_seconds", "SPARQL evaluation time.", ("executor",))
+sparql_rows = registry.histogram(
+    "chatbot_sparql_rows", "Rows returned per executed SPARQL query.", (), buckets=ROW_BUCKETS)
+retrieved_rows = registry.histogram(
+    "chatbot_retrieved_rows", "Rows handed to the answer stage per request and route.", ("route",), buckets=ROW_BUCKETS)
+cache_lookups = registry.counter(
+    "chatbot_cache_lookups", "Cache lookups per cache and result (hit / miss).", ("cache", "result"))
+errors = registry.counter(
+    "chatbot_errors", "Errors per stage and exception class.", ("stage", "error"))
+stage_seconds = registry.histogram(
+    "chatbot_stage_seconds", "Wall time per pipeline mode and stage (retrieve / answer / total), including queueing.", ("mode", "stage"))
+requests = registry.counter(
+    "chatbot_requests", "Chat requests per endpoint, mode, route and outcome.", ("endpoint", "mode", "route", "outcome"))
+admission = registry.counter(
+    "chatbot_admission", "Admission decisions for the LLM stages (admitted / queue_full / predicted_wait / wait_timeout).", ("result",))
+admission_wait_seconds = registry.histogram(
+    "chatbot_admission_wait_seconds", "Time spent in the admission queue per result.", ("result",))
+
+def record_error(stage, error):
+    errors.inc(stage=stage, error=type(error).__name__)
+
+def record_cache(cache, hit):
+    cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def process_metrics():
+    """
+    CPU time, resident memory and thread count of the server process.
+    """
+    families = [("process_threads", "gauge", "Live Python threads.", [({}, threading.active_count())])]
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        families.append(("process_cpu_seconds", "counter", "User and system CPU time of the process.", [({}, round(usage.ru_utime + usage.ru_stime, 6))]))
+        families.append(("process_max_resident_memory_bytes", "gauge", "Peak resident set size.", [({}, usage.ru_maxrss * 1024)]))
+    try:
+        with open("/proc/self/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        families.append(("process_resident_memory_bytes", "gauge", "Resident set size.", [({}, rss_pages * _PAGE_SIZE)]))
+    except OSError:
+        pass
+    return families
+
+registry.add_collector(process_metrics)
@@ -0,0 +1,292 @@
+import numpy as np
+import rdflib
+from rdflib import RDF, RDFS
+import hashlib
+import unicodedata
+import math
+import re
+import os
+
+from graph_snapshot import SNAPSHOT_DIR
+from graph_loader import graph_version
+
+NGRAM_INDEX_FORMAT_VERSION = 2
+NGRAM_SIZES = (1, 2, 3)
+COMMENT_WEIGHT = 0.5 # Term-frequency weight of comment n-grams relative to the label's
+
+NGRAM_INDEX_PATH = os.getenv("NGRAM_INDEX_PATH", os.path.join(SNAPSHOT_DIR, "ngram_index.npz"))
+NGRAM_INDEX_PERSIST = os.getenv("NGRAM_INDEX_PERSIST", "1") == "1"
+
+def ngram_index_path(version, path=NGRAM_INDEX_PATH):
+    """
+    Index file for a graph version: "<path stem>-<version digest>.npz", so
+    indexes of different graphs never overwrite or load each other.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}-{hashlib.sha256(version.encode('utf-8')).hexdigest()[:16]}{ext}"
+
+# Everything except letters/digits is dropped, so "미분 계수" and "미분계수" share n-grams
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_text(text):
+    """
+    NFKC + casefold, with whitespace and punctuation removed.
+    """
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text or "").casefold())
+
+def char_ngrams(text, sizes=NGRAM_SIZES):
+    """
+    Character n-grams of the normalized text (Hangul syllables count as one character).
+    """
+    text = normalize_text(text)
+    grams = []
+    for n in sizes:
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+class NgramIndex:
+    """
+    TF-IDF index over character n-grams of every labelled node's label and comment.
+
+    The document-term matrix is stored transposed in CSR form (per n-gram:
+    document IDs + weights, rows L2-normalized per document), so scoring a
+    question is one sparse matrix-vector product done with np.bincount.
+    """
+
+    def __init__(self, uris, labels, types, terms, idf, indptr, doc_ids, weights, fingerprint, version=""):
+        self.uris = uris
+        self.labels = labels
+        self.types = types
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.idf = idf
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.fingerprint = fingerprint
+        self.version = version
+
+    def __len__(self):
+        return len(self.uris)
+
+    def query_vector(self, text):
+        """
+        (term IDs, L2-normalized TF-IDF weights) of the text; unknown n-grams are ignored.
+        """
+        counts = {}
+        for gram in char_ngrams(text):
+            term = self.vocab.get(gram)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        term_ids = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        tf = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        weights = tf * self.idf[term_ids]
+        return term_ids, weights / np.linalg.norm(weights)
+
+    def scores(self, text):
+        """
+        Cosine similarity of the text to every document (np.ndarray of len(self)).
+        """
+        term_ids, query_weights = self.query_vector(text)
+        if not len(term_ids):
+            return np.zeros(len(self.uris), dtype=np.float32)
+        starts = self.indptr[term_ids]
+        lengths = self.indptr[term_ids + 1] - starts
+        postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        contributions = self.weights[postings] * np.repeat(query_weights, lengths)
+        return np.bincount(self.doc_ids[postings], weights=contributions, minlength=len(self.uris))
+
+    def search(self, text, k=5, types=None, min_score=0.0):
+        """
+        Top-k most similar labelled nodes.
+
+        Args:
+            text (str): Question or term (misspellings / spacing differences are fine).
+            k (int): Number of results.
+            types (list[str]): Optional node types to keep ("Concept", "Section", ...).
+            min_score (float): Minimum cosine similarity.
+
+        Returns:
+            list[dict]: {"uri", "label", "type", "score"} ordered by score.
+        """
+        scores = self.scores(text)
+        if types:
+            scores = np.where(np.isin(self.types, list(types)), scores, 0.0)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"uri": self.uris[i], "label": self.labels[i], "type": str(self.types[i]), "score": round(float(scores[i]), 4)}
+            for i in top
+            if scores[i] > min_score
+        ]
+
+    def save(self, path):
+        """
+        Writes the index to a .npz file (no pickled objects).
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            format=np.array(NGRAM_INDEX_FORMAT_VERSION),
+            fingerprint=np.array(self.fingerprint),
+            version=np.array(self.version),
+            uris=np.array(self.uris),
+            labels=np.array(self.labels),
+            types=self.types,
+            terms=np.array(self.terms),
+            idf=self.idf,
+            indptr=self.indptr,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, fingerprint=None, version=None):
+        """
+        Loads a saved index, or returns None if it is missing, of another format
+        version, or built from different documents than `fingerprint` or from
+        another graph_version than `version`.
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["format"]) != NGRAM_INDEX_FORMAT_VERSION:
+                    return None
+                if fingerprint is not None and str(data["fingerprint"]) != fingerprint:
+                    return None
+                if version is not None and str(data["version"]) != version:
+                    return None
+                return cls(
+                    uris=data["uris"].tolist(),
+                    labels=data["labels"].tolist(),
+                    types=data["types"],
+                    terms=data["terms"].tolist(),
+                    idf=data["idf"],
+                    indptr=data["indptr"],
+                    doc_ids=data["doc_ids"],
+                    weights=data["weights"],
+                    fingerprint=str(data["fingerprint"]),
+                    version=str(data["version"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+def collect_documents(graph):
+    """
+    One document per labelled URI node: (uri, label, type, comment).
+    Sorted by URI so the fingerprint and document IDs are stable across loads.
+    """
+    type_names = {}
+    for s, cls in graph.subject_objects(RDF.type):
+        if isinstance(cls, rdflib.URIRef):
+            type_names.setdefault(s, str(cls).split("/")[-1].split("#")[-1])
+
+    documents = {}
+    for s, label in graph.subject_objects(RDFS.label):
+        if isinstance(s, rdflib.URIRef) and s not in documents:
+            documents[s] = [str(label), type_names.get(s, "Other"), ""]
+    for s, comment in graph.subject_objects(RDFS.comment):
+        if s in documents:
+            documents[s][2] += " " + str(comment)
+    return [(str(uri), *documents[uri]) for uri in sorted(documents)]
+
+def documents_fingerprint(documents):
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update("\x1f".join(document).encode("utf-8") + b"\x1e")
+    return digest.hexdigest()
+
+def build_ngram_index(graph, documents=None):
+    """
+    Builds the TF-IDF character n-gram index for every labelled node of the graph.
+
+    Args:
+        graph (rdflib.Graph): The loaded graph (ABox + TBox union view).
+
+    Returns:
+        NgramIndex: The index.
+    """
+    documents = documents or collect_documents(graph)
+    vocab = {}
+    rows = [] # per document: {term: weighted tf}
+    for _, label, _, comment in documents:
+        counts = {}
+        for gram in char_ngrams(label):
+            counts[gram] = counts.get(gram, 0) + 1.0
+        for gram in char_ngrams(comment):
+            counts[gram] = counts.get(gram, 0) + COMMENT_WEIGHT
+        row = {}
+        for gram, count in counts.items():
+            row[vocab.setdefault(gram, len(vocab))] = count
+        rows.append(row)
+
+    n_docs = len(documents)
+    df = np.zeros(len(vocab), dtype=np.float32)
+    for row in rows:
+        df[list(row)] += 1
+    idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32) # Smoothed IDF
+
+    postings = [[] for _ in range(len(vocab))]
+    for doc_id, row in enumerate(rows):
+        weights = {term: (1 + math.log(tf) if tf >= 1 else tf) * idf[term] for term, tf in row.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        for term, weight in weights.items():
+            postings[term].append((doc_id, weight / norm))
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(p) for p in postings])
+    doc_ids = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(indptr[-1]))
+    weights = np.fromiter((w for p in postings for _, w in p), dtype=np.float32, count=int(indptr[-1]))
+
+    return NgramIndex(
+        uris=[d[0] for d in documents],
+        labels=[d[1] for d in documents],
+        types=np.array([d[2] for d in documents]),
+        terms=list(vocab),
+        idf=idf,
+        indptr=indptr,
+        doc_ids=doc_ids,
+        weights=weights,
+        fingerprint=documents_fingerprint(documents),
+        version=graph_version(graph),
+    )
+
+def similar_labels(question, graph, k=5, min_score=0.3, types=("Concept", "Section")):
+    """
+    Distinct labels of the k nodes most similar to the question (fuzzy candidates).
+    """
+    labels = []
+    for hit in get_ngram_index(graph).search(question, k=k, types=types, min_score=min_score):
+        if hit["label"] not in labels:
+            labels.append(hit["label"])
+    return labels
+
+def get_ngram_index(graph, path=NGRAM_INDEX_PATH, persist=NGRAM_INDEX_PERSIST):
+    """
+    Returns the n-gram index for the graph, memoized on the Graph object
+    together with the graph_version. With `persist`, the index is saved next
+    to the graph snapshots under a file keyed on the graph_version
+    (ngram_index_path) and reused only when the saved version matches.
+    """
+    version = graph_version(graph)
+    memo = getattr(graph, "_ngram_index", None)
+    if memo is not None and memo[0] == version:
+        return memo[1]
+
+    index_path = ngram_index_path(version, path)
+    index = NgramIndex.load(index_path, version=version) if persist else None
+    if index is None:
+        index = build_ngram_index(graph)
+        if persist:
+            try:
+                index.save(index_path)
+            except OSError as e:
+                print(f"[WARN] Could not save n-gram index to {index_path}: {e}")
+    graph._ngram_index = (version, index)
+    return index
@@ -0,0 +1,326 @@
+from graph_engine import get_graph_engine, HIERARCHY_PREDICATES
+
+def iter_bits(bits):
+    """
+    Yields the positions of the set bits of a Python int (lowest first).
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+class PrerequisiteIndex:
+    """
+    Transitive closure of :prerequisiteOf, lifted through the curriculum hierarchy,
+    stored as one bitset (Python int) per node.
+
+    "X needs Y" holds when
+      - Y prerequisiteOf X, or Y prerequisiteOf a Section/Chapter/Subject containing X
+        (a Concept inherits the prerequisites of its Section), or
+      - Y lies inside a unit that X needs (a prerequisite Section brings its Concepts),
+    closed transitively. Containers themselves are never prerequisites of their members.
+
+    Bit positions follow the strongly-connected-component order of the closure
+    (prerequisites get lower positions than their dependents, nodes of one
+    connected curriculum are contiguous), and each bitset is stored shifted
+    down to its lowest set bit, so sets stay as short as their actual span.
+    Iterating a set in position order therefore yields a topological order.
+    Queries are bit operations: is_prerequisite() is O(1), all_prerequisites() /
+    all_dependents() are O(k) in the number of results.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        n = len(engine)
+        self._members = [sorted(engine.descendants(i, HIERARCHY_PREDICATES)) for i in range(n)]
+        self._containers = [sorted(engine.ancestors(i, HIERARCHY_PREDICATES)) for i in range(n)]
+        # Prerequisite edges: self._direct[b] holds every a with a prerequisiteOf b
+        self._direct = [set(engine.neighbors(i, "prerequisiteOf", direction="in")) for i in range(n)]
+        self.rebuild()
+
+    def _expand(self, ids):
+        """
+        Adds every hierarchy member of the given units.
+        """
+        result = set(ids)
+        for i in ids:
+            result.update(self._members[i])
+        return result
+
+    def _lifted(self, i):
+        """
+        IDs of the units node i needs directly (before transitive closure).
+        """
+        ids = set(self._direct[i])
+        for c in self._containers[i]:
+            ids |= self._direct[c]
+        return sorted(self._expand(ids))
+
+    def rebuild(self):
+        """
+        Full (re)computation: strongly connected components of the lifted "needs"
+        graph in reverse topological order, so each closure is the OR of
+        already-finished closures.
+        """
+        n = len(self.engine)
+        self._order_stale = False
+        lifted = [self._lifted(i) for i in range(n)]
+        components = list(_tarjan_sccs(n, lambda v: lifted[v]))
+        # Group positions by connected curriculum (keeps every bitset's span local),
+        # topological order within each group
+        group = _connected_groups(n, lifted)
+        self._order = sorted((v for component in components for v in component), key=lambda v: group[v])
+        self._pos = [0] * n
+        for position, v in enumerate(self._order):
+            self._pos[v] = position
+
+        self._up = [0] * n
+        self._up_shift = [0] * n
+        for component in components:
+            bits = 0
+            for v in component:
+                for w in lifted[v]:
+                    bits |= (1 << self._pos[w]) | self._up_bits(w)
+            for v in component:
+                self._store(self._up, self._up_shift, v, bits)
+
+        # Dependents: the same pass over the reversed edges, dependents first
+        reverse = [[] for _ in range(n)]
+        for v in range(n):
+            for w in lifted[v]:
+                reverse[w].append(v)
+        self._down = [0] * n
+        self._down_shift = [0] * n
+        for component in reversed(components):
+            bits = 0
+            for w in component:
+                for v in reverse[w]:
+                    bits |= (1 << self._pos[v]) | self._down_bits(v)
+            for w in component:
+                self._store(self._down, self._down_shift, w, bits)
+
+    @staticmethod
+    def _store(table, shifts, i, bits):
+        shift = (bits & -bits).bit_length() - 1 if bits else 0
+        table[i] = bits >> shift
+        shifts[i] = shift
+
+    def _up_bits(self, i):
+        return self._up[i] << self._up_shift[i]
+
+    def _down_bits(self, i):
+        return self._down[i] << self._down_shift[i]
+
+    # --- Queries ---
+
+    def all_prerequisites(self, node, known=()):
+        """
+        Node IDs of everything upstream of `node` (Sections and Concepts),
+        deepest prerequisites first. Nodes in `known`, their members and
+        everything upstream of them are left out (masks per known node, not a
+        check per result).
+        """
+        if self._order_stale:
+            self.rebuild()
+        if not known:
+            shift = self._up_shift[node]
+            return [self._order[shift + i] for i in iter_bits(self._up[node])]
+        bits = self._up_bits(node)
+        for k in known:
+            for unit in [k] + self._members[k]:
+                bits &= ~((1 << self._pos[unit]) | self._up_bits(unit))
+        return [self._order[i] for i in iter_bits(bits)]
+
+    def all_dependents(self, node):
+        """
+        Node IDs of everything that (transitively) needs `node`.
+        """
+        shift = self._down_shift[node]
+        return [self._order[shift + i] for i in iter_bits(self._down[node])]
+
+    def is_prerequisite(self, a, b):
+        """
+        True if `a` is needed (directly or transitively) before `b`.
+        """
+        offset = self._pos[a] - self._up_shift[b]
+        return offset >= 0 and bool((self._up[b] >> offset) & 1)
+
+    def containers(self, node):
+        """
+        Section/Chapter/Subject IDs containing the node.
+        """
+        return self._containers[node]
+
+    def direct_dependents(self, node):
+        """
+        Units that need `node` directly (one step of the lifted relation):
+        targets of prerequisiteOf edges leaving the node or one of its
+        containers, plus the members of those targets.
+        """
+        result = []
+        for source in [node] + self._containers[node]:
+            for dependent in self.engine.neighbors(source, "prerequisiteOf"):
+                result.append(dependent)
+                result.extend(self._members[dependent])
+        return result
+
+    def topological_key(self, node):
+        """
+        Sort key placing prerequisites before their dependents.
+        """
+        if self._order_stale:
+            self.rebuild()
+        return self._pos[node]
+
+    # --- Incremental updates ---
+
+    def add_prerequisite(self, a, b):
+        """
+        Records a new edge `a` prerequisiteOf `b`: adds it to the engine's CSR
+        (so direct_dependents() and shortest_chain() see it) and updates the
+        closure in place (only nodes that need `b` are touched). An edge that
+        runs against the current topological order marks the order stale; it is
+        recomputed (one rebuild()) by the next query that depends on it.
+
+        Returns:
+            bool: False if the edge was already implied by the closure.
+        """
+        if a in self._direct[b]:
+            return False
+        self._direct[b].add(a)
+        self.engine.add_edge("prerequisiteOf", a, b)
+        if self.is_prerequisite(a, b):
+            return False
+
+        gain = 0
+        for w in self._expand([a]):
+            gain |= (1 << self._pos[w]) | self._up_bits(w)
+
+        # b, its members (they inherit b's prerequisites) and everything needing them
+        affected = 0
+        for v in [b] + self._members[b]:
+            affected |= (1 << self._pos[v]) | self._down_bits(v)
+
+        # Bit positions double as the topological order, which only holds while
+        # every new prerequisite sits before everything that now needs it
+        if gain.bit_length() >= (affected & -affected).bit_length():
+            self._order_stale = True
+
+        for position in iter_bits(affected):
+            v = self._order[position]
+            self._store(self._up, self._up_shift, v, self._up_bits(v) | gain)
+        for position in iter_bits(gain):
+            w = self._order[position]
+            self._store(self._down, self._down_shift, w, self._down_bits(w) | affected)
+        return True
+
+def _tarjan_sccs(n, successors):
+    """
+    Iterative Tarjan: yields strongly connected components (lists of node IDs)
+    so that every component comes after the components it points to.
+    """
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, iter(successors(root)))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        while work:
+            v, children = work[-1]
+            advanced = False
+            for w in children:
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(successors(w))))
+                    advanced = True
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            if advanced:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[v])
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                yield component
+
+def _connected_groups(n, successors):
+    """
+    Weakly connected component label per node (union-find over the edges).
+    """
+    parent = list(range(n))
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for v in range(n):
+        for w in successors[v]:
+            rv, rw = find(v), find(w)
+            if rv != rw:
+                parent[max(rv, rw)] = min(rv, rw)
+    return [find(v) for v in range(n)]
+
+def get_prerequisite_index(graph):
+    """
+    Returns the PrerequisiteIndex for the graph, built on first use and
+    memoized on the Graph object for the current GraphEngine: it is rebuilt
+    when get_graph_engine recompiles the engine after a graph write.
+    """
+    engine = get_graph_engine(graph)
+    index = getattr(graph, "_prerequisite_index", None)
+    if index is None or index.engine is not engine:
+        index = PrerequisiteIndex(engine)
+        graph._prerequisite_index = index
+    return index
+
+def enrich_prerequisites(rows, index, key="target"):
+    """
+    Post-processing for query results: fills "<key>Prerequisites" with the
+    labels of every Section upstream of the node in the "<key>" column
+    (deepest first), so "what do I need before X" needs no property path.
+    
+    Args:
+        rows (list[dict]): execute_sparql rows.
+        index (PrerequisiteIndex): Index for the graph the rows came from.
+        key (str): Column holding the node URI.
+        
+    Returns:
+        list[dict]: Enriched rows.
+    """
+    engine = index.engine
+    enriched = []
+    for row in rows:
+        row = dict(row)
+        node = engine.node_id(row[key]) if row.get(key) else -1
+        if node >= 0:
+            labels = []
+            for i in index.all_prerequisites(node):
+                if engine.node_type(i) == "Section" and engine.label(i) not in labels:
+                    labels.append(engine.label(i))
+            row[f"{key}Prerequisites"] = ", ".join(labels) or None
+        enriched.append(row)
+    return enriched
@@ -0,0 +1,186 @@
+from collections import OrderedDict
+import threading
+import json
+import os
+
+from llm_provider import estimate_tokens
+
+# Answer Prompt Data Encoding
+#   grouped: rows grouped under "[Subject > Chapter]", one deduplicated line per
+#            concept, cut to ANSWER_DATA_TOKEN_BUDGET in relevance order
+#   json:    json.dumps of every row (previous format, no cap)
+ANSWER_DATA_FORMAT = os.getenv("ANSWER_DATA_FORMAT", "grouped")
+ANSWER_DATA_TOKEN_BUDGET = int(os.getenv("ANSWER_DATA_TOKEN_BUDGET", "1200"))
+
+UNKNOWN = "Unknown"
+LEGEND = "(Grouped as [Subject > Chapter]; one '- Concept (details)' line per concept)"
+
+def _local_name(value):
+    if value.startswith(("http://", "https://")):
+        return value.rstrip("/").split("/")[-1].split("#")[-1]
+    return value
+
+def _find_column(row, suffix, preferred):
+    if row.get(preferred):
+        return preferred
+    for key, value in row.items():
+        if value and key.lower().endswith(suffix):
+            return key
+    return None
+
+def split_row(row):
+    """
+    Splits a result row into (label, subject, chapter, details). Details are the
+    remaining non-empty columns with the "target" prefix dropped; URI values are
+    shortened to their local name, and the URI column behind the label is dropped.
+
+    Returns:
+        tuple: (str | None, str, str, list[(name, value)])
+    """
+    label_col = _find_column(row, "label", "targetLabel")
+    subject_col = _find_column(row, "subject", "targetSubject")
+    chapter_col = _find_column(row, "chapter", "targetChapter")
+    skip = {label_col, subject_col, chapter_col}
+    if label_col:
+        skip.add(label_col[:-len("label")])
+
+    details = []
+    for key, value in row.items():
+        if key in skip or value in (None, ""):
+            continue
+        name = key[len("target"):] if key.startswith("target") and len(key) > len("target") else key
+        details.append((name[:1].lower() + name[1:], _local_name(str(value))))
+    return (
+        row.get(label_col) if label_col else None,
+        row.get(subject_col) or UNKNOWN if subject_col else UNKNOWN,
+        row.get(chapter_col) or UNKNOWN if chapter_col else UNKNOWN,
+        details,
+    )
+
+def _hops(row):
+    try:
+        return int(row.get("hops") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _omitted_note(omitted):
+    return f"(+{omitted} less relevant concepts omitted)"
+
+def encode_rows(rows, question="", token_budget=ANSWER_DATA_TOKEN_BUDGET):
+    """
+    Compact data_summary for the answer prompt.
+
+    Rows describing the same (concept, subject, chapter) are merged; concepts
+    are ranked by relevance (named in the question, then hop distance for
+    retrieval rows, then result order) and added until `token_budget`
+    (estimated tokens) is used up, then printed grouped by subject/chapter.
+    The whole summary, omission note included, stays within the budget
+    (the top-ranked concept is always kept).
+
+    Args:
+        rows (list[dict]): execute_sparql / retrieve_subgraph rows.
+        question (str): The user question (for ranking).
+        token_budget (int): Estimated-token cap for the whole summary (0: no cap).
+
+    Returns:
+        tuple: (summary text, number of concepts kept, number of concepts omitted)
+    """
+    merged = OrderedDict()
+    for position, row in enumerate(rows):
+        label, subject, chapter, details = split_row(row)
+        if label:
+            key = (label, subject, chapter)
+        else:
+            # No label column: the remaining values are the row
+            key = ("; ".join(f"{name}: {value}" for name, value in details) or "(empty row)", subject, chapter)
+            details = []
+        rank = (not (label and label in question), _hops(row), position)
+        entry = merged.setdefault(key, {"rank": rank, "details": OrderedDict()})
+        entry["rank"] = min(entry["rank"], rank)
+        for name, value in details:
+            values = entry["details"].setdefault(name, [])
+            if value not in values:
+                values.append(value)
+
+    ranked = sorted(merged.items(), key=lambda item: item[1]["rank"])
+    groups = OrderedDict()
+    # Costs include the newline after each line; room for the omission note is
+    # kept free while more concepts follow, so the summary stays within budget
+    used = estimate_tokens(LEGEND + "\n")
+    note_cost = estimate_tokens(_omitted_note(len(ranked)))
+    kept = 0
+    for position, ((concept, subject, chapter), entry) in enumerate(ranked):
+        details = "; ".join(f"{name}: {', '.join(values)}" for name, values in entry["details"].items() if name != "hops")
+        line = f"- {concept} ({details})" if details else f"- {concept}"
+        header = f"[{subject} > {chapter}]"
+        cost = estimate_tokens(line + "\n") + (0 if (subject, chapter) in groups else estimate_tokens(header + "\n"))
+        reserve = note_cost if position + 1 < len(ranked) else 0
+        if token_budget and kept and used + cost + reserve > token_budget:
+            break
+        groups.setdefault((subject, chapter), []).append(line)
+        used += cost
+        kept += 1
+
+    lines = [LEGEND]
+    for (subject, chapter), items in groups.items():
+        lines.append(f"[{subject} > {chapter}]")
+        lines.extend(items)
+    omitted = len(ranked) - kept
+    if omitted:
+        lines.append(_omitted_note(omitted))
+    return "\n".join(lines), kept, omitted
+
+class PromptSizeStats:
+    """
+    Answer-prompt size with the previous JSON encoding vs. the encoding used,
+    in estimated tokens (GET /pipeline/stats).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.rows = 0
+        self.concepts_kept = 0
+        self.concepts_omitted = 0
+        self.json_prompt_tokens = 0
+        self.prompt_tokens = 0
+
+    def record(self, rows, kept, omitted, json_prompt_tokens, prompt_tokens):
+        with self._lock:
+            self.prompts += 1
+            self.rows += rows
+            self.concepts_kept += kept
+            self.concepts_omitted += omitted
+            self.json_prompt_tokens += json_prompt_tokens
+            self.prompt_tokens += prompt_tokens
+
+    def stats(self):
+        with self._lock:
+            saved = self.json_prompt_tokens - self.prompt_tokens
+            return {
+                "format": ANSWER_DATA_FORMAT,
+                "token_budget": ANSWER_DATA_TOKEN_BUDGET,
+                "prompts": self.prompts,
+                "rows": self.rows,
+                "concepts_kept": self.concepts_kept,
+                "concepts_omitted": self.concepts_omitted,
+                "json_prompt_tokens": self.json_prompt_tokens,
+                "prompt_tokens": self.prompt_tokens,
+                "saved_tokens": saved,
+                "saved_pct": round(saved * 100 / self.json_prompt_tokens, 1) if self.json_prompt_tokens else 0.0,
+            }
+
+prompt_size_stats = PromptSizeStats()
+
+def format_data_summary(rows, question="", data_format=None, token_budget=ANSWER_DATA_TOKEN_BUDGET):
+    """
+    data_summary text for the answer prompt in the configured format.
+
+    Returns:
+        tuple: (summary, kept concepts, omitted concepts)
+    """
+    if not rows:
+        return "No data found.", 0, 0
+    if (data_format or ANSWER_DATA_FORMAT) == "json":
+        return json.dumps(rows, ensure_ascii=False), len(rows), 0
+    return encode_rows(rows, question, token_budget)
@@ -0,0 +1,227 @@
+from collections import OrderedDict
+import threading
+import time
+import re
+
+from rdflib import Literal, Variable
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue, Expr
+from rdflib.plugins.sparql.sparql import Query
+
+# Quoted literals (long-quote forms first) and IRIs are kept verbatim; whitespace elsewhere is insignificant.
+_PROTECTED_TOKEN = re.compile(
+    r"""('''(?:[^'\\]|\\.|'(?!''))*'''|"""
+    r'''"""(?:[^"\\]|\\.|"(?!""))*"""|'''
+    r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|<[^<>\s]*>)"""
+)
+
+def canonicalize_query(query):
+    """
+    Canonical form of a SPARQL query for cache keys: whitespace runs outside
+    string literals and IRIs collapse to a single space.
+    
+    Args:
+        query (str): SPARQL query text.
+        
+    Returns:
+        str: Canonicalized query text.
+    """
+    parts = _PROTECTED_TOKEN.split(query.strip())
+    # Odd indices are the captured literals / IRIs
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts))
+
+# regex(?var, "pattern" ...) / regex(str(?var), 'pattern' ...): the pattern literal varies per question.
+# The whole literal token is matched (long quotes, @lang, ^^datatype) so no suffix is left behind.
+_REGEX_PATTERN_ARG = re.compile(
+    r"""(regex\s*\(\s*(?:str\s*\(\s*[?$]\w+\s*\)|[?$]\w+)\s*,\s*)"""
+    r"""('''(?:[^'\\]|'(?!''))*'''|"""
+    r'''"""(?:[^"\\]|"(?!""))*"""|'''
+    r"""'[^'\\\n]*'|"[^"\\\n]*")"""
+    r"""(@[a-zA-Z]+(?:-[a-zA-Z0-9]+)*|\^\^(?:<[^<>\s]*>|[\w-]*:[\w-]*))?""",
+    re.IGNORECASE,
+)
+
+def parameterize_query(query):
+    """
+    Splits a query into a reusable template and its literal values.
+    regex() pattern literals become ?__patternN variables whose values are
+    returned as initBindings, so every question with the same query shape
+    shares one parsed/translated template.
+    
+    Returns:
+        tuple: (template text, {Variable: Literal} bindings)
+    """
+    bindings = {}
+    
+    def replace(match):
+        literal, suffix = match.group(2), match.group(3)
+        if suffix:
+            # Tagged / typed patterns are rare; keep them inline instead of resolving the datatype prefix
+            return match.group(0)
+        quote = 3 if literal[:3] in ("'''", '"""') else 1
+        var = Variable(f"__pattern{len(bindings)}")
+        bindings[var] = Literal(literal[quote:-quote])
+        return f"{match.group(1)}?{var}"
+    
+    template = _REGEX_PATTERN_ARG.sub(replace, canonicalize_query(query))
+    return template, bindings
+
+# Instance attributes set by CompValue/Expr themselves (not algebra children)
+_NODE_OWN_ATTRS = ("name", "_evalfn", "ctx")
+
+def copy_algebra(node):
+    """
+    Structural copy of a translated query algebra. rdflib's Expr.eval stores
+    the evaluation context on the node itself, so concurrent executions must
+    not share Expr objects. Terms are immutable and shared.
+    
+    Besides the dict items, instance attributes are copied: the translator
+    stores some results there (e.g. the translated `graph` of
+    Builtin_EXISTS / Builtin_NOTEXISTS shadows the untranslated dict item).
+    """
+    if isinstance(node, Expr):
+        evalfn = node._evalfn.__func__ if node._evalfn else None
+        copy = Expr(node.name, evalfn, **{k: copy_algebra(v) for k, v in dict.items(node)})
+    elif isinstance(node, CompValue):
+        copy = CompValue(node.name, **{k: copy_algebra(v) for k, v in dict.items(node)})
+    elif isinstance(node, list):
+        return [copy_algebra(v) for v in node]
+    else:
+        return node
+    for key, value in vars(node).items():
+        if key not in _NODE_OWN_ATTRS:
+            setattr(copy, key, copy_algebra(value))
+    return copy
+
+class PreparedQueryCache:
+    """
+    LRU cache of rdflib prepareQuery objects keyed by the parameterized query
+    template. Also accumulates parse vs. evaluation time so the savings of
+    skipping the parse/translate step can be reported.
+    """
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.parse_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.executions = 0
+    
+    def prepare(self, query, graph=None):
+        """
+        Returns a private, ready-to-evaluate copy of the prepared query.
+        Default prefixes come from the graph's namespace bindings, as with graph.query.
+        
+        Returns:
+            tuple: (rdflib Query, initBindings dict, parse seconds spent on this call)
+        """
+        template, bindings = parameterize_query(query)
+        with self._lock:
+            prepared = self._entries.get(template)
+            if prepared is not None:
+                self._entries.move_to_end(template)
+                self.hits += 1
+        
+        parse_seconds = 0.0
+        if prepared is None:
+            start = time.perf_counter()
+            init_ns = dict(graph.namespaces()) if graph is not None else None
+            prepared = prepareQuery(template, initNs=init_ns)
+            parse_seconds = time.perf_counter() - start
+            with self._lock:
+                self.misses += 1
+                self.parse_seconds += parse_seconds
+                self._entries[template] = prepared
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        
+        return Query(prepared.prologue, copy_algebra(prepared.algebra)), bindings, parse_seconds
+    
+    def record_eval(self, seconds):
+        with self._lock:
+            self.executions += 1
+            self.eval_seconds += seconds
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "parse_ms_total": round(self.parse_seconds * 1000, 3),
+                "parse_ms_avg_per_miss": round(self.parse_seconds * 1000 / self.misses, 3) if self.misses else 0.0,
+                "eval_ms_total": round(self.eval_seconds * 1000, 3),
+                "eval_ms_avg": round(self.eval_seconds * 1000 / self.executions, 3) if self.executions else 0.0,
+            }
+
+class QueryResultCache:
+    """
+    Thread-safe in-process LRU cache of SPARQL result rows.
+    
+    Entries are keyed by (graph version, canonical query), so results computed
+    against a previous ABox/TBox are never served after a reload. Memory is
+    bounded both by entry count and by the total number of cached rows.
+    """
+    
+    def __init__(self, max_entries=1024, max_rows=200000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, version, query):
+        key = (version, canonicalize_query(query))
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may mutate rows, so hand out copies
+        return [dict(row) for row in rows]
+    
+    def set(self, version, query, rows):
+        if len(rows) > self.max_rows:
+            return
+        key = (version, canonicalize_query(query))
+        rows = [dict(row) for row in rows]
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._rows -= len(previous)
+            self._entries[key] = rows
+            self._rows += len(rows)
+            while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+    
+    def invalidate(self, version=None):
+        """
+        Drops all entries, or only those computed against `version`.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if version is None or k[0] == version]:
+                self._rows -= len(self._entries.pop(key))
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "max_entries": self.max_entries,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -1,29 +1,81 @@
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
 import rdflib
 import json
 import sys
 
-# Load API Key
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+import metrics
+import tracing
 
-if not GOOGLE_API_KEY:
-    # Try to find .env in parent directory
-    parent_env = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-    if os.path.exists(parent_env):
-        load_dotenv(parent_env)
-        GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+from llm_cache import LLMCache, normalize_question, hash_text, make_key
+from llm_provider import get_provider, estimate_tokens
+from prompt_encoder import format_data_summary, prompt_size_stats, ANSWER_DATA_FORMAT, ANSWER_DATA_TOKEN_BUDGET
+from query_cache import QueryResultCache, PreparedQueryCache
+from graph_loader import graph_version, get_label_index, get_hierarchy_table, enrich_hierarchy, fold_text, LabelMatch
+from prerequisite_index import get_prerequisite_index, enrich_prerequisites
+from sparql_guard import QueryRejected
+from sparql_pool import evaluate_query, SparqlTimeout, SPARQL_REWRITE_ENABLED
 
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY is not set in .env file.")
+# LLM backends per stage (llm_provider.py: LLM_PROVIDER / LLM_MODEL, or
+# LLM_SPARQL_* / LLM_ANSWER_*). Created on first call, so importing this module
+# needs no API key; a missing key surfaces as a failed generate_* call.
+SPARQL_STAGE = "sparql"
+ANSWER_STAGE = "answer"
 
-genai.configure(api_key=GOOGLE_API_KEY)
+# Persistent LLM Response Cache (SQLite)
+# Keys include the prompt template, model and schema/data hashes, so
+# custom prompts (e.g. from streamlit_app.py) never share entries with the defaults.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache", "llm_cache.sqlite3"),
+)
+llm_cache = LLMCache(
+    LLM_CACHE_PATH,
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+) if LLM_CACHE_ENABLED else None
 
-# Initialize Gemini Model
-MODEL_NAME = "gemini-3-flash-preview"
-model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+# LLM-free Fast Path
+# Questions that name a known Section/Concept verbatim skip the SPARQL-generation LLM call.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+FAST_PATH_MIN_LABEL_CHARS = int(os.getenv("FAST_PATH_MIN_LABEL_CHARS", "3"))
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+# Particles / endings allowed right after a matched term ("정적분이 뭐야?", "조건부확률이랑")
+# Anything else (e.g. "합성함수의 미분") suggests a longer phrase, so the LLM decides.
+_TRAILING_PARTICLES = {
+    "", "이", "가", "은", "는", "을", "를", "과", "와", "도", "만", "에", "에서", "으로", "로",
+    "이랑", "랑", "하고", "이란", "란", "이야", "야", "이요", "요", "에서의", "이라는", "라는",
+}
+
+# Words a fast-path question may contain besides the matched labels (question
+# words, requests, feelings; particles are stripped first). Any other leftover
+# word - e.g. "미분" in "합성함수 미분이 뭐야?" - means the labels cover only part
+# of what is asked, so the LLM decides.
+_QUESTION_FILLER = {
+    "뭐", "뭐야", "뭐예요", "뭐에요", "뭐지", "뭔가요", "뭔데", "뭘", "무엇", "무엇인가요", "무슨", "어떤", "어떻게", "왜", "언제",
+    "알려줘", "알려주세요", "알려줄래", "설명해줘", "설명해주세요", "설명", "정리해줘", "보여줘", "좀", "다시", "쉽게", "간단히",
+    "궁금해", "궁금해요", "궁금합니다", "헷갈려", "헷갈려요", "어려워", "어려워요", "너무", "잘", "모르겠어", "모르겠어요",
+    "이해가", "안", "돼", "돼요", "돼?", "가요", "거야", "거예요", "건가요", "있어", "있어요", "개념", "뜻", "정의",
+    "대해", "대해서", "대한", "관련", "공부", "공부하고", "싶어", "싶어요", "복습", "복습하고", "차이", "관계", "그리고", "또",
+    "뭔지", "거", "해", "써", "쓰는", "하는", "배우는", "단원",
+}
+
+# Only Concept / Section labels are fast-path targets; a question naming a
+# Chapter or Subject label ("미분", "확률") is broader than one lookup.
+_FAST_PATH_TYPES = {NS.Concept, NS.Section}
+
+# In-process SPARQL Result Cache (keyed by graph version + canonical query)
+sparql_result_cache = QueryResultCache(
+    max_entries=int(os.getenv("SPARQL_CACHE_MAX_ENTRIES", "1024")),
+    max_rows=int(os.getenv("SPARQL_CACHE_MAX_ROWS", "200000")),
+)
+
+# Parsed/translated query templates (regex patterns are passed as initBindings)
+prepared_query_cache = PreparedQueryCache(
+    max_entries=int(os.getenv("PREPARED_QUERY_CACHE_MAX_ENTRIES", "256")),
+)
 
 DEFAULT_SPARQL_PROMPT = """
     You are an expert Math Ontology Engineer.
@@ -119,59 +171,437 @@ DEFAULT_ANSWER_PROMPT = """
     }}
     """
 
-def generate_sparql(question, schema_info, prompt_template=DEFAULT_SPARQL_PROMPT):
+def add_label_hints(prompt, label_hints):
+    """
+    Inserts the closest ontology labels (n-gram index) before the user question,
+    so the regex uses spellings that exist in the graph.
+    """
+    if not label_hints:
+        return prompt
+    block = (
+        "### Closest Ontology Labels (fuzzy match; use these exact spellings in regex if relevant)\n    "
+        + ", ".join(label_hints)
+        + "\n    \n    "
+    )
+    if "### User Question" in prompt:
+        return prompt.replace("### User Question", block + "### User Question", 1)
+    return prompt + "\n" + block
+
+def parse_llm_json(text, stage):
+    """
+    Parses an LLM's JSON reply (markdown fences stripped), timing the parse per stage.
+    """
+    with metrics.llm_json_parse_seconds.time(stage=stage), tracing.span("json_parse", chars=len(text)):
+        return json.loads(text.replace("```json", "").replace("```", "").strip())
+
+@tracing.traced("generate_sparql")
+def generate_sparql(question, schema_info, prompt_template=DEFAULT_SPARQL_PROMPT, label_hints=None, timeout=None):
     try:
         # Check if placeholders exist, if so use format, if not just append (fallback)
         prompt = prompt_template.replace("{schema_info}", str(schema_info)).replace("{question}", question)
+        prompt = add_label_hints(prompt, label_hints)
     except Exception as e:
         return {"query": "", "explanation": f"Prompt Formatting Error: {e}"}
     
     try:
-        response = model.generate_content(prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        result = json.loads(text)
+        llm = get_provider(SPARQL_STAGE)
+    except Exception as e:
+        metrics.record_error("sparql_generation", e)
+        print(f"[ERROR] SPARQL Generation Failed: {e}")
+        return {"query": "", "explanation": f"Error: {e}"}
+    
+    cache_key = make_key("sparql", llm.model_id, hash_text(prompt_template), hash_text(schema_info), normalize_question(question), list(label_hints or []))
+    if llm_cache:
+        cached = llm_cache.get("sparql", cache_key)
+        metrics.record_cache("llm_sparql", cached is not None)
+        tracing.annotate(cache="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+    
+    try:
+        response = llm.generate(prompt, stage=SPARQL_STAGE, timeout=timeout)
+        result = parse_llm_json(response.text, SPARQL_STAGE)
+        if llm_cache and result.get("query"):
+            llm_cache.set("sparql", cache_key, result)
         return result
     except Exception as e:
+        metrics.record_error("sparql_generation", e)
         print(f"[ERROR] SPARQL Generation Failed: {e}")
         return {"query": "", "explanation": f"Error: {e}"}
 
-def execute_sparql(query, graph):
+def _is_filler(word):
+    if word in _QUESTION_FILLER or word in _TRAILING_PARTICLES:
+        return True
+    # "개념이" -> "개념", "차이가" -> "차이"
+    return any(particle and word.endswith(particle) and word[:-len(particle)] in _QUESTION_FILLER
+               for particle in _TRAILING_PARTICLES)
+
+def match_known_concepts(question, label_index):
+    """
+    Scans the question for curriculum labels (Aho-Corasick over all labels).
+    
+    Returns:
+        list[LabelMatch] | None: The matches if every one is a confident hit
+        (a Concept/Section label, long enough, starts a word, followed only by
+        a particle) and the rest of the question holds no other content word,
+        else None.
+    """
+    text = fold_text(question)
+    matches = label_index.scan(text)
+    if not matches:
+        return None
+    
+    for match in matches:
+        if not any(_FAST_PATH_TYPES & entry.types for entry in match.entries):
+            return None
+        if match.end - match.start < FAST_PATH_MIN_LABEL_CHARS:
+            return None
+        if match.start > 0 and not text[match.start - 1].isspace():
+            return None
+        word_end = match.end
+        while word_end < len(text) and not text[word_end].isspace():
+            word_end += 1
+        suffix = text[match.end:word_end].rstrip("?!.,~")
+        if suffix not in _TRAILING_PARTICLES:
+            return None
+    
+    leftover = list(text)
+    for match in matches:
+        leftover[match.start:match.end] = " " * (match.end - match.start)
+    for word in "".join(leftover).split():
+        word = word.strip("?!.,~")
+        if word and not _is_filler(word):
+            return None
+    return [LabelMatch(m.start, m.end, [e for e in m.entries if _FAST_PATH_TYPES & e.types]) for m in matches]
+
+def build_hierarchy_query(uris):
+    """
+    Deterministic target lookup for the fast path: selects only the target
+    nodes; Subject/Chapter are attached afterwards from the HierarchyTable
+    (execute_sparql(..., enrich="target")) instead of an OPTIONAL join.
+    """
+    values = " ".join(f"<{uri}>" for uri in uris)
+    return (
+        "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#> "
+        "SELECT DISTINCT ?target ?targetLabel WHERE { "
+        f"VALUES ?target {{ {values} }} "
+        "?target rdfs:label ?targetLabel . "
+        "}"
+    )
+
+def fast_path_sparql(question, label_index):
+    """
+    LLM-free replacement for generate_sparql when the question directly names
+    known curriculum terms.
+    
+    Returns:
+        dict | None: Same shape as generate_sparql ('query', 'explanation') plus
+        'enrich' (the column to pass to execute_sparql), or None when there is
+        no confident match and the LLM path should be used.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    
+    matches = match_known_concepts(question, label_index)
+    if not matches:
+        return None
+    
+    uris = []
+    labels = []
+    for match in matches:
+        for entry in match.entries:
+            if entry.uri not in uris:
+                uris.append(entry.uri)
+        if match.entries[0].label not in labels:
+            labels.append(match.entries[0].label)
+    
+    quoted = ", ".join(f"'{label}'" for label in labels)
+    return {
+        "query": build_hierarchy_query(uris),
+        "explanation": f"{quoted}은(는) 고교 과정에 있으므로 직접 검색합니다.",
+        "enrich": "target",
+    }
+
+@tracing.traced("execute_sparql")
+def execute_sparql(query, graph, use_cache=True, enrich=None, pool=None, timeout=None):
     """
     Executes the SPARQL query on the given graph.
+    Results are memoized per graph version, so a reloaded graph never sees stale rows.
+    Every query passes the static cost guard and gets a row LIMIT (sparql_pool.py);
+    rejected or timed-out queries return no rows.
+    
+    With a SparqlWorkerPool (`pool`, holding the same sources as `graph`) the
+    query runs in a worker process and is killed after `timeout` seconds;
+    otherwise it is evaluated in the calling thread.
+    
+    If `enrich` names a column holding node URIs (e.g. "target"), rows get
+    "<enrich>Subject"/"<enrich>Chapter" from the precomputed HierarchyTable,
+    "<enrich>Prerequisites" from the prerequisite closure, and the URI column
+    is dropped.
     """
+    if use_cache:
+        version = graph_version(graph)
+        cached = sparql_result_cache.get(version, query)
+        metrics.record_cache("sparql_result", cached is not None)
+        tracing.annotate(cache="hit" if cached is not None else "miss", rows=len(cached) if cached is not None else None)
+        if cached is not None:
+            return enrich_rows(cached, graph, enrich) if enrich else cached
+    
+    executor = "worker" if pool is not None else "inline"
     try:
-        results = graph.query(query)
-        data = []
-        for row in results:
-            item = {}
-            for var in results.vars:
-                val = row[var]
-                item[str(var)] = str(val) if val is not None else None
-            data.append(item)
+        if pool is not None:
+            data, eval_seconds, parse_seconds = pool.execute(query, timeout=timeout)
+        else:
+            label_index = get_label_index(graph) if SPARQL_REWRITE_ENABLED else None
+            data, eval_seconds, parse_seconds = evaluate_query(graph, query, prepared_query_cache, label_index)
+        prepared_query_cache.record_eval(eval_seconds)
+        metrics.sparql_parse_seconds.observe(parse_seconds, executor=executor)
+        metrics.sparql_eval_seconds.observe(eval_seconds, executor=executor)
+        metrics.sparql_rows.observe(len(data))
+        tracing.annotate(executor=executor, parse_ms=round(parse_seconds * 1000, 2), eval_ms=round(eval_seconds * 1000, 2), rows=len(data))
+        if use_cache:
+            sparql_result_cache.set(version, query, data)
+        if enrich:
+            data = enrich_rows(data, graph, enrich)
         return data
+    except QueryRejected as e:
+        metrics.record_error("sparql_execution", e)
+        tracing.annotate(error=type(e).__name__)
+        print(f"[WARN] SPARQL rejected by cost guard: {e}")
+        return []
+    except SparqlTimeout as e:
+        metrics.record_error("sparql_execution", e)
+        tracing.annotate(error=type(e).__name__)
+        print(f"[WARN] SPARQL timed out: {e}")
+        return []
     except Exception as e:
+        metrics.record_error("sparql_execution", e)
+        tracing.annotate(error=type(e).__name__)
         print(f"[ERROR] SPARQL Execution Failed: {e}")
         return []
 
-def generate_answer(question, raw_data, sparql_explanation, prompt_template=DEFAULT_ANSWER_PROMPT):
+def enrich_rows(rows, graph, key):
     """
-    Generates a structured JSON answer with 'answer' and 'evidence'.
+    Applies the precomputed-index enrichments for execute_sparql(..., enrich=key).
     """
+    rows = enrich_prerequisites(rows, get_prerequisite_index(graph), key=key)
+    return enrich_hierarchy(rows, get_hierarchy_table(graph), key=key)
+
+def fill_answer_prompt(question, data_summary, sparql_explanation, prompt_template=DEFAULT_ANSWER_PROMPT):
+    return prompt_template.replace("{question}", question)\
+                          .replace("{data_summary}", data_summary)\
+                          .replace("{sparql_explanation}", str(sparql_explanation))
+
+def build_answer_prompt(question, raw_data, sparql_explanation, prompt_template=DEFAULT_ANSWER_PROMPT):
+    """
+    Fills the answer prompt template with the question and retrieved rows
+    (compact, token-budgeted encoding from prompt_encoder.py). The prompt size
+    is recorded next to the size the plain JSON rows would have had.
+    """
+    data_summary, kept, omitted = format_data_summary(raw_data, question)
+    prompt = fill_answer_prompt(question, data_summary, sparql_explanation, prompt_template)
     
-    data_summary = json.dumps(raw_data, ensure_ascii=False) if raw_data else "No data found."
-    
-    prompt = prompt_template.replace("{question}", question)\
-                            .replace("{data_summary}", data_summary)\
-                            .replace("{sparql_explanation}", str(sparql_explanation))
+    json_summary = json.dumps(raw_data, ensure_ascii=False) if raw_data else "No data found."
+    json_prompt = fill_answer_prompt(question, json_summary, sparql_explanation, prompt_template)
+    prompt_tokens = estimate_tokens(prompt)
+    prompt_size_stats.record(len(raw_data or []), kept, omitted, estimate_tokens(json_prompt), prompt_tokens)
+    tracing.annotate(rows=len(raw_data or []), concepts_kept=kept, concepts_omitted=omitted, prompt_tokens_est=prompt_tokens)
+    return prompt
+
+def answer_cache_key(question, raw_data, sparql_explanation, prompt_template=DEFAULT_ANSWER_PROMPT, model_id=None):
+    """
+    Cache key for generate_answer: the answer depends on the retrieved rows and
+    the SPARQL explanation as well as the question.
+    """
+    data_hash = hash_text(json.dumps(raw_data, ensure_ascii=False, sort_keys=True))
+    encoding = f"{ANSWER_DATA_FORMAT}:{ANSWER_DATA_TOKEN_BUDGET}"
+    model_id = model_id or get_provider(ANSWER_STAGE).model_id
+    return make_key("answer", model_id, hash_text(prompt_template), data_hash, encoding, str(sparql_explanation), normalize_question(question))
+
+@tracing.traced("generate_answer")
+def generate_answer(question, raw_data, sparql_explanation, prompt_template=DEFAULT_ANSWER_PROMPT, timeout=None):
+    """
+    Generates a structured JSON answer with 'answer' and 'evidence'.
+    `timeout` caps the LLM call (seconds).
+    """
     
     try:
-        response = model.generate_content(prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        result = json.loads(text)
+        llm = get_provider(ANSWER_STAGE)
+        cache_key = answer_cache_key(question, raw_data, sparql_explanation, prompt_template, llm.model_id)
+        if llm_cache:
+            cached = llm_cache.get("answer", cache_key)
+            metrics.record_cache("llm_answer", cached is not None)
+            tracing.annotate(cache="hit" if cached is not None else "miss")
+            if cached is not None:
+                return cached
+        
+        prompt = build_answer_prompt(question, raw_data, sparql_explanation, prompt_template)
+        response = llm.generate(prompt, stage=ANSWER_STAGE, timeout=timeout)
+        result = parse_llm_json(response.text, ANSWER_STAGE)
+        if llm_cache:
+            llm_cache.set("answer", cache_key, result)
         return result
     except Exception as e:
+        metrics.record_error("answer_generation", e)
+        tracing.annotate(error=type(e).__name__)
         print(f"[ERROR] Answer Generation Failed: {e}")
         return {
             "answer": f"답변 생성 중 오류가 발생했습니다. ({e})",
-            "evidence": []
+            "evidence": [],
+            "error": str(e),
         }
+
+# Graph-only answers (no LLM) when the answer stage misses its deadline or fails
+GRAPH_ONLY_MAX_CONCEPTS = int(os.getenv("GRAPH_ONLY_MAX_CONCEPTS", "8"))
+
+def _column(row, suffix):
+    """
+    Value of the row's first column ending in `suffix` ("targetLabel", "label", ...).
+    """
+    for key, value in row.items():
+        if key.lower().endswith(suffix.lower()) and value:
+            return value
+    return None
+
+def build_graph_only_answer(raw_data, sparql_explanation=""):
+    """
+    Templated Korean answer built purely from the retrieved rows, in the
+    generate_answer shape plus "degraded": True. Used when the answer LLM
+    misses its deadline, so the user still gets the related concepts.
+    
+    Args:
+        raw_data (list[dict]): execute_sparql / retrieve_subgraph rows.
+        sparql_explanation (str): Retrieval explanation (OUT_OF_CURRICULUM is honored).
+    
+    Returns:
+        dict: {"answer", "evidence", "degraded"}
+    """
+    evidence = []
+    prerequisites = []
+    for row in raw_data or []:
+        concept = _column(row, "Label")
+        if not concept or any(item["concept"] == concept for item in evidence):
+            continue
+        evidence.append({
+            "subject": _column(row, "Subject") or "Unknown",
+            "chapter": _column(row, "Chapter") or "Unknown",
+            "concept": concept,
+            "desc": row.get("relation") or "검색된 관련 개념",
+        })
+        for label in (_column(row, "Prerequisites") or "").split(", "):
+            if label and label not in prerequisites:
+                prerequisites.append(label)
+    evidence = evidence[:GRAPH_ONLY_MAX_CONCEPTS]
+    
+    lines = ["지금은 답변 생성이 지연되어, 지식 그래프에서 찾은 내용을 먼저 안내해 드립니다."]
+    if "OUT_OF_CURRICULUM" in str(sparql_explanation):
+        lines.append("질문하신 내용은 교육과정 외의 내용이며, 아래의 고등학교 개념이 기초가 됩니다.")
+    if evidence:
+        concepts = ", ".join(
+            f"{item['concept']}({item['subject']} > {item['chapter']})" if item["subject"] != "Unknown" else item["concept"]
+            for item in evidence
+        )
+        lines.append(f"관련 개념: {concepts}")
+        if prerequisites:
+            lines.append(f"먼저 복습하면 좋은 선수 학습: {', '.join(prerequisites[:GRAPH_ONLY_MAX_CONCEPTS])}")
+        lines.append("자세한 설명이 필요하면 잠시 후 다시 질문해 주세요.")
+    else:
+        lines.append("관련 개념을 찾지 못했습니다. 잠시 후 다시 시도해 주세요.")
+    return {"answer": "\n".join(lines), "evidence": evidence, "degraded": True}
+
+def extract_partial_answer(text):
+    """
+    Decodes as much of the "answer" string value as is available in a
+    partially streamed JSON response. Stops before an incomplete or invalid
+    escape and before a surrogate pair whose low half has not arrived yet.
+    
+    Returns:
+        str: The decoded answer prefix ("" if the field has not started yet).
+    """
+    key_pos = text.find('"answer"')
+    if key_pos == -1:
+        return ""
+    colon = text.find(':', key_pos + len('"answer"'))
+    if colon == -1:
+        return ""
+    start = text.find('"', colon + 1)
+    if start == -1:
+        return ""
+    
+    # Close the string ourselves; a real closing quote ends the scan earlier
+    body = text[start:]
+    while True:
+        try:
+            value, _ = json.decoder.scanstring(body + '"', 1, False)
+            break
+        except json.JSONDecodeError as e:
+            # Error at the opening quote: a trailing backslash escaped our quote
+            body = body[:e.pos] if e.pos > 0 else body[:-1]
+    if value and "\ud800" <= value[-1] <= "\udbff":
+        value = value[:-1]
+    return value
+
+def generate_answer_stream(question, raw_data, sparql_explanation, prompt_template=DEFAULT_ANSWER_PROMPT, timeout=None):
+    """
+    Streaming variant of generate_answer. `timeout` (seconds) caps the LLM
+    call; closing the generator closes the LLM stream.
+    
+    Yields:
+        tuple: ("token", str) for each new piece of the answer text as it arrives,
+               then exactly one ("result", dict) with the parsed 'answer'/'evidence'.
+    """
+    buffer = ""
+    emitted = 0
+    stream = None
+    # The body runs in the context of each next() call, so the span is kept open by hand
+    trace_span = tracing.open_span("generate_answer_stream")
+    try:
+        llm = get_provider(ANSWER_STAGE)
+        cache_key = answer_cache_key(question, raw_data, sparql_explanation, prompt_template, llm.model_id)
+        if llm_cache:
+            cached = llm_cache.get("answer", cache_key)
+            metrics.record_cache("llm_answer", cached is not None)
+            if trace_span:
+                trace_span.set(cache="hit" if cached is not None else "miss")
+            if cached is not None:
+                if cached.get("answer"):
+                    yield ("token", cached["answer"])
+                yield ("result", cached)
+                return
+        
+        with tracing.activate(trace_span):
+            prompt = build_answer_prompt(question, raw_data, sparql_explanation, prompt_template)
+        chunks = 0
+        stream = llm.stream(prompt, stage=ANSWER_STAGE, timeout=timeout)
+        for chunk in stream:
+            if trace_span and not chunks:
+                trace_span.set(first_chunk_ms=round(trace_span.duration * 1000, 2))
+            chunks += 1
+            buffer += chunk
+            partial = extract_partial_answer(buffer)
+            if len(partial) > emitted:
+                yield ("token", partial[emitted:])
+                emitted = len(partial)
+        
+        with tracing.activate(trace_span):
+            result = parse_llm_json(buffer, ANSWER_STAGE)
+        if trace_span:
+            trace_span.set(chunks=chunks, output_chars=len(buffer))
+        if llm_cache:
+            llm_cache.set("answer", cache_key, result)
+        yield ("result", result)
+    except Exception as e:
+        metrics.record_error("answer_generation", e)
+        if trace_span:
+            trace_span.set(error=type(e).__name__)
+        print(f"[ERROR] Answer Streaming Failed: {e}")
+        yield ("result", {
+            "answer": f"답변 생성 중 오류가 발생했습니다. ({e})",
+            "evidence": [],
+            "error": str(e),
+        })
+    finally:
+        if stream is not None:
+            stream.close()
+        if trace_span:
+            trace_span.finish()
@@ -0,0 +1,109 @@
+import rdflib
+import os
+
+from graph_loader import get_label_index, get_hierarchy_table
+from graph_engine import get_graph_engine, HIERARCHY_PREDICATES
+from prerequisite_index import get_prerequisite_index
+from ngram_index import get_ngram_index
+import tracing
+
+# Retrieval-first settings (single LLM call: local subgraph -> generate_answer)
+RETRIEVAL_HOPS = int(os.getenv("RETRIEVAL_HOPS", "2"))
+RETRIEVAL_MAX_NODES = int(os.getenv("RETRIEVAL_MAX_NODES", "25"))
+RETRIEVAL_MIN_LABEL_CHARS = int(os.getenv("RETRIEVAL_MIN_LABEL_CHARS", "2"))
+# Fallback when no label occurs verbatim: n-gram TF-IDF matches above this cosine similarity
+RETRIEVAL_FUZZY_MIN_SCORE = float(os.getenv("RETRIEVAL_FUZZY_MIN_SCORE", "0.5"))
+RETRIEVAL_FUZZY_TOP_K = int(os.getenv("RETRIEVAL_FUZZY_TOP_K", "3"))
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+# Relation of a candidate to the matched concepts, in ranking order
+RELATIONS = ("질문 개념", "선수 학습", "상위 단원", "후속 학습", "포함 개념", "관련 개념")
+
+def find_seed_nodes(question, graph):
+    """
+    Engine node IDs of the Section/Concept labels mentioned in the question
+    (leftmost-longest label matches; looser than the fast path's checks).
+    Misspelled or differently spaced terms fall back to the n-gram index.
+    """
+    engine = get_graph_engine(graph)
+    matches = get_label_index(graph).scan(question, types=[NS.Concept, NS.Section], min_length=RETRIEVAL_MIN_LABEL_CHARS)
+    uris = [entry.uri for match in matches for entry in match.entries]
+    if not uris:
+        hits = get_ngram_index(graph).search(question, k=RETRIEVAL_FUZZY_TOP_K, types=("Concept", "Section"), min_score=RETRIEVAL_FUZZY_MIN_SCORE)
+        uris = [hit["uri"] for hit in hits]
+    
+    seeds = []
+    for uri in uris:
+        node = engine.node_id(uri)
+        if node >= 0 and node not in seeds:
+            seeds.append(node)
+    return seeds
+
+def classify(index, seeds, node):
+    """
+    Relation of `node` to the nearest seed (one of RELATIONS).
+    """
+    if node in seeds:
+        return RELATIONS[0]
+    for seed in seeds:
+        if index.is_prerequisite(node, seed):
+            return RELATIONS[1]
+    for seed in seeds:
+        if node in index.containers(seed):
+            return RELATIONS[2]
+    for seed in seeds:
+        if index.is_prerequisite(seed, node):
+            return RELATIONS[3]
+    for seed in seeds:
+        if seed in index.containers(node):
+            return RELATIONS[4]
+    return RELATIONS[5]
+
+@tracing.traced("retrieve_subgraph")
+def retrieve_subgraph(question, graph, hops=RETRIEVAL_HOPS, max_nodes=RETRIEVAL_MAX_NODES):
+    """
+    Retrieval-first replacement for generate_sparql + execute_sparql: matches the
+    question against concept labels, expands `hops` steps along prerequisiteOf
+    and the hierarchy, ranks the candidates and returns them as rows.
+
+    Ranking: hop distance, then relation (question concept, prerequisite,
+    containing unit, dependent, member, other), then graph order.
+
+    Returns:
+        dict | None: {"rows": [...], "explanation": str} with rows shaped like
+        enriched execute_sparql rows (targetLabel/targetSubject/targetChapter +
+        relation, hops), or None when the question names no known label.
+    """
+    seeds = find_seed_nodes(question, graph)
+    tracing.annotate(seeds=len(seeds))
+    if not seeds:
+        return None
+
+    engine = get_graph_engine(graph)
+    index = get_prerequisite_index(graph)
+    table = get_hierarchy_table(graph)
+
+    distances = engine.k_hop(seeds, predicates=("prerequisiteOf",) + HIERARCHY_PREDICATES, k=hops, direction="both")
+    relations = {node: classify(index, seeds, node) for node in distances if engine.node_type(node) != "Other"}
+    ranked = sorted(relations, key=lambda node: (distances[node], RELATIONS.index(relations[node]), index.topological_key(node)))
+
+    rows = []
+    for node in ranked[:max_nodes]:
+        info = table.lookup(engine.uri(node)) or {}
+        rows.append({
+            "targetLabel": engine.label(node),
+            "targetType": engine.node_type(node),
+            "targetSubject": info.get("Subject"),
+            "targetChapter": info.get("Chapter"),
+            "relation": relations[node],
+            "hops": distances[node],
+        })
+
+    tracing.annotate(candidates=len(ranked), rows=len(rows))
+    labels = ", ".join(f"'{engine.label(seed)}'" for seed in seeds)
+    explanation = (
+        f"질문에서 찾은 {labels}을(를) 중심으로 지식 그래프의 선수/후속 학습 관계와 "
+        f"단원 계층을 {hops}단계까지 탐색한 결과입니다."
+    )
+    return {"rows": rows, "explanation": explanation}
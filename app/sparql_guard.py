@@ -0,0 +1,133 @@
+from rdflib import Variable
+from rdflib.paths import Path, MulPath, SequencePath, AlternativePath, InvPath, ZeroOrMore, OneOrMore
+from rdflib.plugins.sparql.parserutils import CompValue
+
+class QueryRejected(ValueError):
+    """
+    Raised for queries the static cost check considers too expensive to run.
+    """
+
+def _unbounded_paths(path):
+    """
+    Yields the `*` / `+` sub-paths of a property path.
+    """
+    if isinstance(path, MulPath):
+        if path.mod in (ZeroOrMore, OneOrMore):
+            yield path
+        yield from _unbounded_paths(path.path)
+    elif isinstance(path, (SequencePath, AlternativePath)):
+        for arg in path.args:
+            yield from _unbounded_paths(arg)
+    elif isinstance(path, InvPath):
+        yield from _unbounded_paths(path.arg)
+
+def _components(triples):
+    """
+    Groups triple patterns that share variables. Patterns without
+    variables match at most once and are left out.
+
+    Returns:
+        list[set[Variable]]: Variables of each connected group.
+    """
+    groups = []
+    for triple in triples:
+        variables = {t for t in triple if isinstance(t, Variable)}
+        if not variables:
+            continue
+        merged = [g for g in groups if g & variables]
+        for g in merged:
+            groups.remove(g)
+            variables |= g
+        groups.append(variables)
+    return groups
+
+def _walk(node):
+    if isinstance(node, CompValue):
+        yield node
+        for child in dict.values(node):
+            yield from _walk(child)
+    elif isinstance(node, list):
+        for child in node:
+            yield from _walk(child)
+
+def analyze_query(query):
+    """
+    Static cost report for a translated query (no evaluation).
+
+    - unbounded_paths: `*` / `+` property paths whose subject and object are
+      both variables that no other triple pattern binds (rdflib then walks
+      the path from every node in the graph)
+    - cross_products: disconnected triple-pattern groups inside a BGP, plus
+      Join / OPTIONAL operands that share no variable
+    - limit: the query's LIMIT (None when missing)
+
+    Args:
+        query (rdflib.plugins.sparql.sparql.Query): e.g. from PreparedQueryCache.prepare.
+
+    Returns:
+        dict: {"unbounded_paths": list[str], "cross_products": int, "limit": int | None}
+    """
+    triples = []
+    cross_products = 0
+    for node in _walk(query.algebra):
+        if node.name == "BGP":
+            triples.extend(node.triples)
+            cross_products += max(len(_components(node.triples)) - 1, 0)
+        elif node.name in ("Join", "LeftJoin"):
+            left = set(getattr(node.p1, "_vars", None) or ())
+            right = set(getattr(node.p2, "_vars", None) or ())
+            if left and right and not left & right:
+                cross_products += 1
+
+    unbounded = []
+    for i, (s, p, o) in enumerate(triples):
+        if not isinstance(p, Path) or not any(True for _ in _unbounded_paths(p)):
+            continue
+        others = [t for j, triple in enumerate(triples) if j != i for t in triple]
+        anchored = [not isinstance(end, Variable) or end in others for end in (s, o)]
+        if not any(anchored):
+            unbounded.append(f"{s.n3()} {p.n3()} {o.n3()}")
+
+    limit = None
+    top = query.algebra.get("p")
+    if isinstance(top, CompValue) and top.name == "Slice":
+        limit = top.length
+    return {"unbounded_paths": unbounded, "cross_products": cross_products, "limit": limit}
+
+def check_query_cost(query, max_cross_products=2):
+    """
+    Rejects queries that are expensive by construction: an unanchored `*` / `+`
+    path, or more than `max_cross_products` cartesian joins.
+
+    Returns:
+        dict: The analyze_query report (for logging).
+
+    Raises:
+        QueryRejected: With the reason.
+    """
+    report = analyze_query(query)
+    if report["unbounded_paths"]:
+        raise QueryRejected(f"unbounded property path with no bound end: {report['unbounded_paths'][0]}")
+    if report["cross_products"] > max_cross_products:
+        raise QueryRejected(f"{report['cross_products']} cross products (max {max_cross_products})")
+    return report
+
+def apply_row_limit(query, max_rows):
+    """
+    Injects LIMIT `max_rows` into a SELECT query without one and lowers larger
+    limits, in place on the (private) translated query.
+
+    Returns:
+        bool: True if the query was changed.
+    """
+    algebra = query.algebra
+    if algebra.name != "SelectQuery" or not max_rows:
+        return False
+    top = algebra.p
+    if top.name == "Slice":
+        if top.length is not None and top.length <= max_rows:
+            return False
+        top["length"] = max_rows
+        return True
+    algebra["p"] = CompValue("Slice", p=top, start=0, length=max_rows, _vars=top.get("_vars"))
+    return True
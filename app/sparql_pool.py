@@ -0,0 +1,287 @@
+from collections import namedtuple
+from multiprocessing.connection import Connection
+import subprocess
+import threading
+import signal
+import socket
+import queue
+import time
+import sys
+import os
+
+from query_cache import PreparedQueryCache
+from sparql_guard import QueryRejected, check_query_cost, apply_row_limit
+from sparql_rewriter import rewrite_label_filters
+
+# SPARQL Execution Settings
+# LLM-written queries run in worker processes (own GIL, killable on timeout).
+# 0 workers: evaluate in the calling thread (no deadline enforcement).
+SPARQL_WORKERS = int(os.getenv("SPARQL_WORKERS", "2"))
+SPARQL_TIMEOUT_SECONDS = float(os.getenv("SPARQL_TIMEOUT_SECONDS", "5"))
+SPARQL_WORKER_STARTUP_SECONDS = float(os.getenv("SPARQL_WORKER_STARTUP_SECONDS", "60"))
+# Injected as LIMIT when a SELECT has none (larger limits are lowered to it)
+SPARQL_MAX_ROWS = int(os.getenv("SPARQL_MAX_ROWS", "500"))
+SPARQL_COST_GUARD = os.getenv("SPARQL_COST_GUARD", "1") == "1"
+SPARQL_MAX_CROSS_PRODUCTS = int(os.getenv("SPARQL_MAX_CROSS_PRODUCTS", "2"))
+# Rewrite regex(?label, ...) filters into VALUES over index-resolved URIs before evaluation
+SPARQL_REWRITE_ENABLED = os.getenv("SPARQL_REWRITE_ENABLED", "1") == "1"
+
+class SparqlTimeout(Exception):
+    """
+    Raised when a query misses its deadline (the worker running it is killed).
+    """
+
+def evaluate_query(graph, query, prepared_cache, label_index=None, max_rows=SPARQL_MAX_ROWS):
+    """
+    Parses (cached), cost-checks, limits, rewrites and evaluates one query.
+    Shared by the worker processes and the in-thread fallback.
+
+    Args:
+        graph (rdflib.Graph): Graph to query.
+        query (str): SPARQL text.
+        prepared_cache (PreparedQueryCache): Parsed query templates.
+        label_index (LabelIndex): Enables the regex -> VALUES rewrite when given.
+        max_rows (int): LIMIT to inject / enforce (0: none).
+
+    Returns:
+        tuple: (rows as list of {var: str | None}, evaluation seconds,
+        parse seconds (template parse/translate or copy of a cached one))
+
+    Raises:
+        QueryRejected: If the static cost check fails.
+    """
+    start = time.perf_counter()
+    prepared, bindings, _ = prepared_cache.prepare(query, graph)
+    parse_seconds = time.perf_counter() - start
+    if SPARQL_COST_GUARD:
+        check_query_cost(prepared, SPARQL_MAX_CROSS_PRODUCTS)
+    apply_row_limit(prepared, max_rows)
+    if label_index is not None:
+        try:
+            # The prepared query is a private copy, so it can be rewritten in place
+            rewrite_label_filters(prepared, label_index, bindings)
+        except Exception as e:
+            print(f"[WARN] SPARQL rewrite skipped: {e}")
+
+    start = time.perf_counter()
+    results = graph.query(prepared, initBindings=bindings)
+    # ?__patternN template parameters are bound variables, so SELECT * would return them
+    columns = [var for var in results.vars if var not in bindings]
+    data = []
+    for row in results:
+        item = {}
+        for var in columns:
+            val = row[var]
+            item[str(var)] = str(val) if val is not None else None
+        data.append(item)
+    return data, time.perf_counter() - start, parse_seconds
+
+_Worker = namedtuple("_Worker", ["process", "conn"])
+
+class SparqlWorkerPool:
+    """
+    Fixed set of worker processes, each holding its own read-only copy of the
+    graph (loaded from the same sources, snapshots first). A query is sent to
+    an idle worker and must answer before its deadline; otherwise the worker is
+    killed (the only way to stop an rdflib evaluation) and replaced in the
+    background.
+
+    Workers are plain subprocesses talking over a socketpair, not
+    multiprocessing children, so they never re-import the server's __main__.
+    POSIX only (pass_fds).
+    """
+
+    def __init__(self, sources, workers=SPARQL_WORKERS, timeout=SPARQL_TIMEOUT_SECONDS, max_rows=SPARQL_MAX_ROWS):
+        self.sources = [os.path.abspath(source) for source in sources]
+        self.size = workers
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._live = set()
+        self._closed = False
+        self.executed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.restarts = 0
+
+        started = [self._start_worker() for _ in range(workers)] # Load in parallel
+        for worker in started:
+            self._await_ready(worker)
+            self._idle.put(worker)
+
+    def _start_worker(self):
+        parent_sock, child_sock = socket.socketpair()
+        with child_sock:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), str(child_sock.fileno()), *self.sources],
+                pass_fds=(child_sock.fileno(),),
+            )
+        worker = _Worker(process, Connection(parent_sock.detach()))
+        with self._lock:
+            self._live.add(worker)
+        return worker
+
+    def _await_ready(self, worker):
+        if not worker.conn.poll(SPARQL_WORKER_STARTUP_SECONDS):
+            self._kill(worker)
+            raise RuntimeError(f"SPARQL worker did not start within {SPARQL_WORKER_STARTUP_SECONDS}s")
+        status, triples = worker.conn.recv()
+        print(f"[INFO] SPARQL worker {worker.process.pid} ready ({triples} triples)")
+
+    def _kill(self, worker):
+        with self._lock:
+            self._live.discard(worker)
+        worker.process.kill()
+        worker.process.wait()
+        worker.conn.close()
+
+    def _replace(self, worker):
+        """
+        Kills a worker and starts its replacement without blocking the caller.
+        """
+        self._kill(worker)
+
+        def restart():
+            if self._closed:
+                return
+            try:
+                new_worker = self._start_worker()
+                self._await_ready(new_worker)
+            except Exception as e:
+                print(f"[ERROR] SPARQL worker restart failed: {e}")
+                return
+            with self._lock:
+                self.restarts += 1
+            self._idle.put(new_worker)
+
+        threading.Thread(target=restart, name="sparql-worker-restart", daemon=True).start()
+
+    def execute(self, query, timeout=None, max_rows=None):
+        """
+        Runs a query on an idle worker. Waiting for a free worker counts
+        toward the deadline.
+
+        Args:
+            query (str): SPARQL text.
+            timeout (float): Seconds until the deadline (default: pool timeout).
+            max_rows (int): LIMIT to inject / enforce (default: pool max_rows).
+
+        Returns:
+            tuple: (rows, evaluation seconds, parse seconds), as evaluate_query.
+
+        Raises:
+            SparqlTimeout: Deadline missed (no idle worker, or evaluation too slow).
+            QueryRejected: Static cost check failed.
+            RuntimeError: The worker crashed or the query failed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        max_rows = self.max_rows if max_rows is None else max_rows
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise SparqlTimeout(f"no idle SPARQL worker within {timeout}s")
+
+        try:
+            worker.conn.send((query, max_rows))
+            answered = worker.conn.poll(max(deadline - time.monotonic(), 0))
+            reply = worker.conn.recv() if answered else None
+        except (EOFError, OSError) as e:
+            self._replace(worker)
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError(f"SPARQL worker {worker.process.pid} died: {e}")
+
+        if reply is None:
+            self._replace(worker)
+            with self._lock:
+                self.timeouts += 1
+            raise SparqlTimeout(f"query exceeded {timeout}s (worker {worker.process.pid} restarted)")
+
+        self._idle.put(worker)
+        status = reply[0]
+        with self._lock:
+            self.executed += 1
+            if status == "rejected":
+                self.rejected += 1
+            elif status == "error":
+                self.failures += 1
+        if status == "rejected":
+            raise QueryRejected(reply[1])
+        if status == "error":
+            raise RuntimeError(reply[1])
+        return reply[1], reply[2], reply[3]
+
+    def close(self):
+        """
+        Stops every worker (called at interpreter exit).
+        """
+        self._closed = True
+        with self._lock:
+            workers = list(self._live)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            try:
+                worker.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+            self._kill(worker)
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": True,
+                "workers": len(self._live),
+                "idle": self._idle.qsize(),
+                "executed": self.executed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "restarts": self.restarts,
+                "timeout_s": self.timeout,
+                "max_rows": self.max_rows,
+            }
+
+def serve(fd, sources):
+    """
+    Worker process loop: loads the graph once, then answers (query, max_rows)
+    messages until the connection closes or None arrives.
+    """
+    from graph_loader import load_graph, union_view, get_label_index
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C is handled by the server
+    conn = Connection(fd)
+    graph = union_view(*[load_graph(source) for source in sources])
+    label_index = get_label_index(graph) if SPARQL_REWRITE_ENABLED else None
+    prepared_cache = PreparedQueryCache()
+    conn.send(("ready", len(graph)))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        query, max_rows = message
+        try:
+            rows, seconds, parse_seconds = evaluate_query(graph, query, prepared_cache, label_index, max_rows)
+            reply = ("ok", rows, seconds, parse_seconds)
+        except QueryRejected as e:
+            reply = ("rejected", str(e))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+if __name__ == "__main__":
+    # Usage (started by SparqlWorkerPool): python sparql_pool.py <fd> <source.ttl> ...
+    serve(int(sys.argv[1]), sys.argv[2:])
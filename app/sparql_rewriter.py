@@ -0,0 +1,173 @@
+import re
+from functools import reduce
+
+from rdflib import Literal, URIRef, Variable, RDFS, XSD
+from rdflib.plugins.sparql.parser import parseQuery
+from rdflib.plugins.sparql.algebra import translateQuery, Join, ToMultiSet, Values
+from rdflib.plugins.sparql.parserutils import CompValue, Expr
+from rdflib.plugins.sparql.operators import ConditionalAndExpression
+
+# Same flag mapping as rdflib's Builtin_REGEX, so candidates are verified identically
+_REGEX_FLAGS = {"i": re.IGNORECASE, "s": re.DOTALL, "m": re.MULTILINE}
+
+# Algebra edges along which a FILTER may be pushed down to a BGP without
+# changing results (never into OPTIONAL right-hand sides, UNION, MINUS, ...)
+_PUSHDOWN_EDGES = {
+    "Filter": ("p",),
+    "LeftJoin": ("p1",),
+    "Join": ("p1", "p2"),
+    "Extend": ("p",),
+}
+
+def _regex_target(expr, bindings):
+    """
+    Returns (label variable, wrapped_in_str, pattern, flags) for an expression
+    of the form regex(?label, "...", "flags") or regex(str(?label), ...), else None.
+    Pattern/flags may also be variables pre-bound in `bindings` (prepared queries).
+    """
+    if not isinstance(expr, CompValue) or expr.name != "Builtin_REGEX":
+        return None
+    pattern = bindings.get(expr.pattern, expr.pattern)
+    flags = bindings.get(expr.flags, expr.flags) if expr.flags is not None else None
+    if not isinstance(pattern, Literal):
+        return None
+    if flags is not None and not isinstance(flags, Literal):
+        return None
+
+    text = expr.text
+    wrapped = False
+    if isinstance(text, CompValue) and text.name == "Builtin_STR":
+        text = text.arg
+        wrapped = True
+    if not isinstance(text, Variable):
+        return None
+    return text, wrapped, str(pattern), str(flags or "")
+
+def _conjuncts(expr):
+    if isinstance(expr, CompValue) and expr.name == "ConditionalAndExpression":
+        return [expr.expr] + list(expr.other or [])
+    return [expr]
+
+def _and(conjuncts):
+    if len(conjuncts) == 1:
+        return conjuncts[0]
+    return Expr(
+        "ConditionalAndExpression",
+        ConditionalAndExpression,
+        expr=conjuncts[0],
+        other=conjuncts[1:],
+        _vars=reduce(set.union, (set(getattr(c, "_vars", None) or ()) for c in conjuncts), set()),
+    )
+
+def _find_label_bgp(node, label_var):
+    """
+    Finds (parent, key, subject) for a BGP reachable through push-down-safe
+    edges that contains the triple (subject rdfs:label ?label).
+    """
+    if not isinstance(node, CompValue):
+        return None
+    for key in _PUSHDOWN_EDGES.get(node.name, ()):
+        child = node.get(key)
+        if not isinstance(child, CompValue):
+            continue
+        if child.name == "BGP":
+            for s, p, o in child.triples:
+                if p == RDFS.label and o == label_var and isinstance(s, (Variable, URIRef)):
+                    return node, key, s
+        found = _find_label_bgp(child, label_var)
+        if found:
+            return found
+    return None
+
+def _resolve_rows(label_index, subject, label_var, wrapped, pattern, flags):
+    """
+    VALUES rows for every (subject, label) pair that regex(...) would accept.
+    Candidates come from the label index and are re-checked with Python's
+    re exactly as rdflib evaluates REGEX.
+    """
+    compiled = re.compile(pattern, reduce(lambda a, f: a | _REGEX_FLAGS.get(f, 0), flags, 0))
+    rows = []
+    for entry in label_index.match_regex(pattern, flags):
+        term = entry.term
+        if wrapped:
+            text = str(term)
+        else:
+            # rdflib raises (-> filter false) for non-string literals
+            if not isinstance(term, Literal) or (term.datatype and term.datatype != XSD.string):
+                continue
+            text = str(term)
+        if not compiled.search(text):
+            continue
+        if isinstance(subject, URIRef):
+            if entry.uri == subject:
+                rows.append({label_var: term})
+        else:
+            rows.append({subject: entry.uri, label_var: term})
+    return rows
+
+def _rewrite(node, label_index, bindings):
+    changed = False
+    if not isinstance(node, CompValue):
+        return node, changed
+
+    for key, child in list(dict.items(node)):
+        if isinstance(child, CompValue):
+            new_child, child_changed = _rewrite(child, label_index, bindings)
+            if child_changed:
+                node[key] = new_child
+                changed = True
+
+    if node.name != "Filter":
+        return node, changed
+
+    remaining = []
+    for conjunct in _conjuncts(node.expr):
+        target = _regex_target(conjunct, bindings)
+        found = _find_label_bgp(node, target[0]) if target else None
+        if not found:
+            remaining.append(conjunct)
+            continue
+
+        label_var, wrapped, pattern, flags = target
+        parent, key, subject = found
+        bgp = parent[key]
+        rows = _resolve_rows(label_index, subject, label_var, wrapped, pattern, flags)
+
+        values = ToMultiSet(Values(rows))
+        values["_vars"] = {v for v in (subject, label_var) if isinstance(v, Variable)}
+        join = Join(values, bgp)
+        # Lazy join: the BGP is evaluated once per VALUES row with the subject bound
+        join["lazy"] = True
+        join["_vars"] = set(bgp._vars or ()) | values["_vars"]
+        parent[key] = join
+        changed = True
+
+    if len(remaining) == len(_conjuncts(node.expr)):
+        return node, changed
+    if not remaining:
+        return node.p, True
+    node["expr"] = _and(remaining)
+    return node, True
+
+def rewrite_label_filters(query, label_index, bindings=None):
+    """
+    Rewrites regex(?label, "A|B|C", "i") filters over rdfs:label into
+    VALUES bindings of pre-resolved (subject, label) pairs, so rdflib joins
+    by direct lookup instead of scanning every label and running the regex.
+
+    Args:
+        query (str | Query): SPARQL text, or a translated Query that the caller
+            owns (e.g. a copy from PreparedQueryCache); it is modified in place.
+        label_index (LabelIndex): Index built from the graph the query runs on.
+        bindings (dict): initBindings the query will be evaluated with.
+
+    Returns:
+        rdflib.plugins.sparql.sparql.Query | None: The rewritten, already
+        translated query (pass to graph.query), or None if nothing was rewritten.
+    """
+    parsed = translateQuery(parseQuery(query)) if isinstance(query, str) else query
+    algebra, changed = _rewrite(parsed.algebra, label_index, bindings or {})
+    if not changed:
+        return None
+    parsed.algebra = algebra
+    return parsed
@@ -0,0 +1,248 @@
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+import contextvars
+import functools
+import threading
+import logging
+import random
+import json
+import time
+import uuid
+import os
+
+# Request Tracing
+# A sampled request records a span tree (stage timings + sizes). Traces are
+# returned with ?debug=1 / X-Debug-Trace: 1 (always sampled) and as a
+# Server-Timing header, and appended to TRACE_LOG_PATH when set.
+# Unsampled requests only pay one context-variable lookup per span.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """
+    One timed stage of a request. `attrs` holds sizes and outcomes
+    (rows, prompt tokens, cache hits, ...).
+    """
+
+    __slots__ = ("name", "attrs", "children", "start", "end", "trace")
+
+    def __init__(self, name, trace, attrs=None):
+        self.name = name
+        self.trace = trace
+        self.attrs = dict(attrs or {})
+        self.children = []
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin):
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round(self.duration * 1000, 2),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            **({"children": [child.to_dict(origin) for child in self.children]} if self.children else {}),
+        }
+
+class Trace:
+    """
+    Span tree of one request. Spans may be opened from several threads at
+    once (hedged LLM calls), so children are added under a lock.
+    """
+
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.timestamp = time.time()
+        self._lock = threading.Lock()
+        self.root = Span(name, self, attrs)
+
+    def add_child(self, parent, span):
+        with self._lock:
+            parent.children.append(span)
+
+    def finish(self):
+        self.root.finish()
+
+    def spans(self):
+        """
+        Depth-first (span, depth) pairs.
+        """
+        with self._lock:
+            stack = [(self.root, 0)]
+            result = []
+            while stack:
+                span, depth = stack.pop()
+                result.append((span, depth))
+                stack.extend((child, depth + 1) for child in reversed(span.children))
+        return result
+
+    def to_dict(self):
+        with self._lock:
+            tree = self.root.to_dict(self.root.start)
+        return {"trace_id": self.trace_id, "timestamp": round(self.timestamp, 3), **tree}
+
+    def server_timing(self, max_depth=2):
+        """
+        Server-Timing header value: one entry per span down to `max_depth`
+        (browser dev tools show these next to the request).
+        """
+        entries = []
+        for span, depth in self.spans():
+            if depth > max_depth:
+                continue
+            name = span.name if depth else "total"
+            entries.append(f'{name};dur={span.duration * 1000:.1f}')
+        return ", ".join(entries)
+
+def should_sample(force=False):
+    return force or (TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE)
+
+@contextmanager
+def start_trace(name, sampled=None, **attrs):
+    """
+    Opens the root span of a request in the current context.
+
+    Args:
+        name (str): Root span name (e.g. "chat").
+        sampled (bool): Force sampling on/off (default: TRACE_SAMPLE_RATE).
+
+    Yields:
+        Trace | None: The trace, or None when the request is not sampled.
+    """
+    if not (should_sample() if sampled is None else sampled):
+        yield None
+        return
+    trace = Trace(name, **attrs)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _reset(token)
+        write_trace(trace)
+
+def _reset(token):
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Closed from another context (e.g. an abandoned streaming generator)
+        pass
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Child span of the current span; a no-op (yields None) outside a sampled trace.
+    Context is per thread / task: run_in_pool copies it into executor threads.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace, attrs)
+    parent.trace.add_child(parent, child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set(error=type(e).__name__)
+        raise
+    finally:
+        child.finish()
+        _reset(token)
+
+def open_span(name, **attrs):
+    """
+    Child span of the current span that does not become current and must be
+    closed with Span.finish(). For generators, whose body runs in whatever
+    context calls next(). Returns None outside a sampled trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    child = Span(name, parent.trace, attrs)
+    parent.trace.add_child(parent, child)
+    return child
+
+@contextmanager
+def activate(span):
+    """
+    Makes an open_span() span current for a block that does not yield
+    (no-op for None).
+    """
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _reset(token)
+
+def traced(name):
+    """
+    Decorator running the function inside span(name); use annotate() in the
+    body to attach sizes and outcomes.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_span():
+    return _current_span.get()
+
+def annotate(**attrs):
+    """
+    Adds attributes to the current span (no-op when not tracing).
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+_trace_logger = None
+_trace_logger_lock = threading.Lock()
+
+def _get_trace_logger():
+    global _trace_logger
+    with _trace_logger_lock:
+        if _trace_logger is None:
+            os.makedirs(os.path.dirname(os.path.abspath(TRACE_LOG_PATH)), exist_ok=True)
+            handler = RotatingFileHandler(TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("math_bot.trace")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            _trace_logger = logger
+        return _trace_logger
+
+def write_trace(trace):
+    """
+    Appends a finished trace as one JSON line to TRACE_LOG_PATH (rotated at
+    TRACE_LOG_MAX_BYTES, TRACE_LOG_BACKUPS old files kept).
+    """
+    if not TRACE_LOG_PATH:
+        return
+    try:
+        _get_trace_logger().info(json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+    except Exception as e:
+        print(f"[WARN] Trace log write failed: {e}")
@@ -0,0 +1,383 @@
+from contextlib import redirect_stdout
+import importlib.util
+import statistics
+import platform
+import argparse
+import tempfile
+import shutil
+import runpy
+import json
+import time
+import sys
+import os
+import io
+import re
+
+import rdflib
+from rdflib import RDF, RDFS, Literal
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add 'app' directory (graph_loader & co.) and the project root (visualize_graph) to path
+sys.path.append(os.path.join(PROJECT_ROOT, 'app'))
+sys.path.append(PROJECT_ROOT)
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+ABOX_PATH = os.path.join(PROJECT_ROOT, "data", "knowledge_graph", "math_abox.ttl")
+TBOX_PATH = os.path.join(PROJECT_ROOT, "data", "ontology", "math_tbox.ttl")
+CURRICULUM_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "curr.md")
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baselines", "graph_layer.json")
+
+# Maintenance scripts run inside a scratch copy of the data/ layout (they use relative paths)
+WORKSPACE_FILES = [
+    "data/raw/curr.md",
+    "data/raw/properties.md",
+    "data/report/proposed_additions.md",
+    "data/ontology/math_tbox.ttl",
+]
+MAINTENANCE_SCRIPTS = [
+    # (script, function; None runs the file as __main__)
+    ("import_curriculum.py", "generate_skeleton"),
+    ("enrich_ontology.py", "enrich_ontology"),
+    ("connect_prerequisites.py", "connect_prerequisites"),
+    ("import_proposed_additions.py", "import_additions"),
+    ("export_ontology_report.py", "export_reports"),
+    ("import_hierarchy_report.py", "import_hierarchy"),
+    ("verify_connections.py", None),
+    ("build_snapshot.py", None),
+]
+
+# --- Synthetic curriculum ---
+
+def _suffix(label, copy):
+    return label if copy == 0 else f"{label} {copy}"
+
+def synthetic_curriculum(scale, source=CURRICULUM_PATH):
+    """
+    curr.md repeated `scale` times; copy k > 0 suffixes every subject, chapter,
+    section and concept name with " k" so labels stay unique.
+    """
+    with open(source, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    out = []
+    for copy in range(scale):
+        for line in lines:
+            stripped = line.strip()
+            if copy == 0 or not stripped or stripped.startswith("-") or stripped.lower() == "contents":
+                out.append(line)
+            elif "#" in stripped:
+                section, *concepts = stripped.split("#")
+                out.append(" #".join([_suffix(section.strip(), copy)] + [_suffix(c.strip(), copy) for c in concepts if c.strip()]))
+            elif re.search(r"\(\d+단원\)", stripped):
+                out.append(re.sub(r"\s*(\(\d+단원\))", lambda m: f" {copy} {m.group(1)}", stripped, count=1))
+            else:
+                out.append(_suffix(stripped, copy))
+    return "\n".join(out) + "\n"
+
+def synthetic_abox(scale, source=ABOX_PATH):
+    """
+    math_abox.ttl repeated `scale` times: copy k > 0 renames every instance
+    node (Con_0001 -> Con_0001_x3) and suffixes its labels, keeping the
+    hierarchy, prerequisiteOf links and properties of the original.
+    """
+    base = rdflib.Graph()
+    base.parse(source, format="turtle")
+    instances = set(base.subjects(RDF.type, None))
+
+    g = rdflib.Graph()
+    g.bind("", NS)
+    for copy in range(scale):
+        if copy == 0:
+            for triple in base:
+                g.add(triple)
+            continue
+        rename = {node: rdflib.URIRef(f"{node}_x{copy}") for node in instances}
+        for s, p, o in base:
+            if p == RDFS.label and s in rename:
+                o = Literal(f"{o} {copy}", lang=o.language, datatype=o.datatype)
+            g.add((rename.get(s, s), p, rename.get(o, o)))
+    return g
+
+# --- Timing ---
+
+def timed(func, repeat=1):
+    """
+    Runs func `repeat` times (stdout silenced). Each run's result is dropped
+    before the next one starts, so at most one copy of a large graph is alive.
+
+    Returns:
+        tuple: (last return value, list of seconds)
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        result = None
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            samples.append(time.perf_counter() - start)
+    return result, samples
+
+def summarize(name, scale, triples, samples, **extra):
+    return {
+        "name": name,
+        "scale": scale,
+        "triples": triples,
+        "runs": len(samples),
+        "first_s": round(samples[0], 6),
+        "median_s": round(statistics.median(samples), 6),
+        "min_s": round(min(samples), 6),
+        **extra,
+    }
+
+def prompt_example_queries():
+    """
+    The example SPARQL queries embedded in DEFAULT_SPARQL_PROMPT (the shapes
+    the LLM is taught to write).
+    """
+    from reasoning_engine import DEFAULT_SPARQL_PROMPT
+    queries = re.findall(r'"query": "(.*?)",\n', DEFAULT_SPARQL_PROMPT)
+    return [query.replace("{{", "{").replace("}}", "}") for query in queries]
+
+def run_script(path):
+    argv = sys.argv
+    sys.argv = [path] # Scripts read their own arguments (build_snapshot.py)
+    try:
+        return runpy.run_path(path, run_name="__main__")
+    finally:
+        sys.argv = argv
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# --- Benchmarks per scale ---
+
+def bench_graph_layer(scale, workspace, repeat):
+    from graph_loader import load_graph, union_view, generate_schema_info, get_label_index, get_hierarchy_table
+    from graph_engine import get_graph_engine
+    from prerequisite_index import get_prerequisite_index
+    from graph_snapshot import write_snapshot, load_snapshot
+    from reasoning_engine import execute_sparql, build_hierarchy_query
+    from retrieval import retrieve_subgraph
+
+    abox_path = os.path.join(workspace, "data", "knowledge_graph", "math_abox.ttl")
+    results = []
+
+    abox, samples = timed(lambda: load_graph(abox_path, use_snapshot=False), repeat)
+    tbox, _ = timed(lambda: load_graph(TBOX_PATH, use_snapshot=False))
+    triples = len(abox)
+    results.append(summarize("load_graph.turtle", scale, triples, samples))
+
+    snapshot_path = os.path.join(workspace, "math_abox.ttl.snap")
+    with redirect_stdout(io.StringIO()):
+        write_snapshot(abox, abox_path, snapshot_path)
+    samples = timed(lambda: load_snapshot(abox_path, snapshot_path), repeat)[1]
+    results.append(summarize("load_graph.snapshot", scale, triples, samples))
+
+    full_graph = union_view(abox, tbox)
+    _, samples = timed(lambda: generate_schema_info(full_graph), repeat)
+    results.append(summarize("generate_schema_info", scale, triples, samples))
+
+    def build_indexes():
+        fresh = union_view(abox, tbox) # Indexes are memoized per graph object
+        get_label_index(fresh)
+        get_hierarchy_table(fresh)
+        get_graph_engine(fresh)
+        get_prerequisite_index(fresh)
+        return fresh
+    samples = timed(build_indexes, repeat)[1]
+    results.append(summarize("build_indexes", scale, triples, samples))
+    # Build full_graph's own indexes outside the query timings
+    for build in (get_label_index, get_hierarchy_table, get_graph_engine, get_prerequisite_index):
+        build(full_graph)
+
+    for i, query in enumerate(prompt_example_queries(), 1):
+        rows, samples = timed(lambda: execute_sparql(query, full_graph, use_cache=False), repeat)
+        results.append(summarize(f"execute_sparql.prompt_example_{i}", scale, triples, samples, rows=len(rows)))
+
+    uris = [str(uri) for uri in list(full_graph.subjects(RDF.type, NS.Section))[:3]]
+    query = build_hierarchy_query(uris)
+    rows, samples = timed(lambda: execute_sparql(query, full_graph, use_cache=False, enrich="target"), repeat)
+    results.append(summarize("execute_sparql.fast_path", scale, triples, samples, rows=len(rows)))
+
+    retrieved, samples = timed(lambda: retrieve_subgraph("테일러 급수와 합성함수의 미분", full_graph), repeat)
+    results.append(summarize("retrieve_subgraph", scale, triples, samples, rows=len(retrieved["rows"]) if retrieved else 0))
+    return results, full_graph
+
+def bench_visualization(scale, full_graph, workspace):
+    from visualize_graph import visualize_ontology # Availability checked up front (check_requirements)
+
+    triples = len(full_graph)
+    output_file = os.path.join(workspace, "graph.html")
+    highlights = ["합성함수의 미분", "미분", "미적분1"]
+    results = []
+    _, samples = timed(lambda: visualize_ontology(graph=full_graph, output_file=output_file, return_html_str=True))
+    results.append(summarize("visualize_ontology.plain", scale, triples, samples))
+    _, samples = timed(lambda: visualize_ontology(graph=full_graph, highlight_labels=highlights, output_file=output_file, return_html_str=True))
+    results.append(summarize("visualize_ontology.highlight", scale, triples, samples))
+    return results
+
+def bench_maintenance(scale, workspace, abox_text, triples):
+    """
+    Times each maintenance script on the scaled data. The ABox (and the
+    hierarchy report, produced by export_ontology_report.py) is restored
+    before every script, so each one sees the same input.
+    """
+    abox_path = os.path.join(workspace, "data", "knowledge_graph", "math_abox.ttl")
+    results = []
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        for script, function in MAINTENANCE_SCRIPTS:
+            with open(abox_path, "w", encoding="utf-8") as f:
+                f.write(abox_text)
+            path = os.path.join(PROJECT_ROOT, script)
+            if function:
+                module = load_module(path)
+                call = getattr(module, function)
+            else:
+                call = lambda: run_script(path)
+            try:
+                _, samples = timed(call)
+            except Exception as e:
+                results.append({"name": f"script.{script}", "scale": scale, "skipped": f"{type(e).__name__}: {e}"})
+                continue
+            results.append(summarize(f"script.{script}", scale, triples, samples))
+            if script == "export_ontology_report.py":
+                shutil.copy("data/report/hierarchy_report.md", "data/report/hierarchy_report_v2.md")
+    finally:
+        os.chdir(cwd)
+    return results
+
+def prepare_workspace(root, scale):
+    workspace = os.path.join(root, f"x{scale}")
+    for rel in WORKSPACE_FILES:
+        os.makedirs(os.path.join(workspace, os.path.dirname(rel)), exist_ok=True)
+        shutil.copy(os.path.join(PROJECT_ROOT, rel), os.path.join(workspace, rel))
+    os.makedirs(os.path.join(workspace, "data", "knowledge_graph"), exist_ok=True)
+    with open(os.path.join(workspace, "data", "raw", "curr.md"), "w", encoding="utf-8") as f:
+        f.write(synthetic_curriculum(scale))
+    abox_text = synthetic_abox(scale).serialize(format="turtle")
+    with open(os.path.join(workspace, "data", "knowledge_graph", "math_abox.ttl"), "w", encoding="utf-8") as f:
+        f.write(abox_text)
+    return workspace, abox_text
+
+def run_suite(scales, repeat=3, max_slow_scale=100, skip=()):
+    root = tempfile.mkdtemp(prefix="graph-bench-")
+    # Snapshot / n-gram writers (build_snapshot.py) must not touch data/snapshot/
+    os.environ["GRAPH_SNAPSHOT_DIR"] = os.path.join(root, "snapshot")
+    os.environ["NGRAM_INDEX_PATH"] = os.path.join(root, "snapshot", "ngram_index.npz")
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["SPARQL_WORKERS"] = "0"
+    results = []
+    try:
+        for scale in scales:
+            print(f"[BENCH] scale x{scale}...", file=sys.stderr)
+            workspace, abox_text = prepare_workspace(root, scale)
+            graph_results, full_graph = bench_graph_layer(scale, workspace, repeat)
+            results.extend(graph_results)
+            triples = graph_results[0]["triples"]
+            if scale <= max_slow_scale and "visualize" not in skip:
+                results.extend(bench_visualization(scale, full_graph, workspace))
+            if scale <= max_slow_scale and "scripts" not in skip:
+                results.extend(bench_maintenance(scale, workspace, abox_text, triples))
+            del full_graph
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+# --- Baseline comparison ---
+
+def compare(results, baseline, threshold=0.25, min_delta=0.005):
+    """
+    Flags benchmarks whose median grew by more than `threshold` (relative)
+    and `min_delta` seconds (absolute, filters timer noise on tiny timings).
+
+    Returns:
+        dict: {"regressions": [...], "improvements": [...], "missing": [...]}
+    """
+    base = {(r["name"], r["scale"]): r for r in baseline.get("results", []) if "median_s" in r}
+    report = {"threshold": threshold, "min_delta_s": min_delta, "regressions": [], "improvements": [], "missing": []}
+    for r in results:
+        if "median_s" not in r:
+            continue
+        old = base.get((r["name"], r["scale"]))
+        if old is None:
+            report["missing"].append(f"{r['name']}@x{r['scale']}")
+            continue
+        delta = r["median_s"] - old["median_s"]
+        entry = {"name": r["name"], "scale": r["scale"], "baseline_s": old["median_s"], "current_s": r["median_s"],
+                 "change_pct": round(delta * 100 / old["median_s"], 1) if old["median_s"] else None}
+        if delta > min_delta and r["median_s"] > old["median_s"] * (1 + threshold):
+            report["regressions"].append(entry)
+        elif -delta > min_delta and r["median_s"] < old["median_s"] * (1 - threshold):
+            report["improvements"].append(entry)
+    return report
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "rdflib": rdflib.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def check_requirements(skip):
+    """
+    Fails early when a benchmark group cannot run, so a report or baseline
+    never silently lacks it (use --skip to leave a group out on purpose).
+    """
+    if "visualize" not in skip:
+        try:
+            from visualize_graph import visualize_ontology
+        except ImportError as e:
+            sys.exit(f"[ERROR] visualize_ontology unavailable ({e}); install requirements.txt (pyvis) or pass --skip visualize")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Graph-layer micro-benchmarks on synthetic curricula (1x = current data).")
+    parser.add_argument("--scales", default="1,10,100,1000", help="Comma-separated multiples of the current curriculum (1000 takes ~10 min; 1,10,100 for a quick run)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per in-process benchmark (median is compared)")
+    parser.add_argument("--max-slow-scale", type=int, default=100, help="Largest scale for visualize_ontology and the maintenance scripts")
+    parser.add_argument("--skip", action="append", default=[], choices=["visualize", "scripts"])
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative slowdown counted as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Absolute slowdown (s) below which changes are ignored")
+    args = parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    check_requirements(args.skip)
+    results = run_suite(scales, args.repeat, args.max_slow_scale, args.skip)
+    report = {"benchmark": "graph_layer", "environment": environment(), "results": results}
+
+    regressions = []
+    skipped = [r for r in results if "skipped" in r]
+    if args.save_baseline and skipped:
+        for r in skipped:
+            print(f"[ERROR] {r['name']} x{r['scale']} did not run: {r['skipped']}", file=sys.stderr)
+        sys.exit("[ERROR] Baseline not saved: every benchmark must run")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"[BENCH] Baseline saved to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(results, baseline, args.threshold, args.min_delta)
+        report["comparison"]["baseline"] = os.path.relpath(args.baseline, PROJECT_ROOT)
+        regressions = report["comparison"]["regressions"]
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for r in regressions:
+        print(f"[REGRESSION] {r['name']} x{r['scale']}: {r['baseline_s']:.4f}s -> {r['current_s']:.4f}s ({r['change_pct']:+.1f}%)", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
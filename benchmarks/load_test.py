@@ -0,0 +1,465 @@
+from collections import Counter
+import threading
+import subprocess
+import argparse
+import asyncio
+import random
+import signal
+import socket
+import json
+import time
+import sys
+import os
+
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(PROJECT_ROOT, "app")
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions_ko.txt")
+
+# Answers main.py returns (HTTP 200) when the pipeline timed out or failed
+FAILURE_ANSWERS = ("죄송합니다. 응답 시간이 초과되었습니다", "죄송합니다. 시스템 오류가 발생했습니다")
+# Outcomes of requests the pipeline served; admission-control sheds (graph-only
+# answer or 429) are counted separately and never as served throughput
+SERVED = ("ok", "degraded")
+SHED = ("shed", "rejected")
+
+def load_corpus(path=DEFAULT_CORPUS):
+    """
+    Questions, one per line; blank lines and '#' comments are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    if not questions:
+        raise ValueError(f"No questions in {path}")
+    return questions
+
+def percentile(values, pct):
+    """
+    pct-th percentile (0-100) of `values`, as in LatencyStats (None when empty).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# --- Server-side CPU profile ---
+
+class CpuSampler(threading.Thread):
+    """
+    Statistical CPU profiler for every thread of this process: every
+    `interval` seconds it records the Python stack of each thread whose CPU
+    clock advanced since the last sample, weighted by that CPU time. Threads
+    blocked on I/O, locks or the stub LLM's sleep do not show up; CPU of a
+    thread already back in an idle wait (event-loop select, executor queue)
+    is counted as "idle" since its stack no longer shows where it went.
+    (cProfile only sees the thread that enabled it; the pipeline runs on
+    executor threads.) Falls back to wall-clock samples where per-thread
+    CPU clocks are unavailable.
+    """
+
+    IDLE_LEAVES = ("select", "poll", "wait", "_worker", "get", "sleep", "accept")
+
+    def __init__(self, interval=0.005):
+        super().__init__(name="cpu-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter() # (frame, ...) root first -> CPU seconds (or samples)
+        self.samples = 0
+        self.idle = 0
+        self.cpu_clock = hasattr(time, "pthread_getcpuclockid")
+        self._last_cpu = {}
+        self._stop_event = threading.Event()
+
+    def thread_cpu(self, ident):
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (OSError, OverflowError):
+            return None
+
+    def sample(self):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            weight = 1
+            if self.cpu_clock:
+                cpu = self.thread_cpu(ident)
+                last = self._last_cpu.get(ident)
+                self._last_cpu[ident] = cpu
+                if cpu is None or last is None or cpu <= last:
+                    continue
+                weight = cpu - last
+            if frame.f_code.co_name in self.IDLE_LEAVES:
+                self.idle += weight
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += weight
+        self.samples += 1
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self, top=20):
+        """
+        Top functions by self and inclusive CPU share.
+        """
+        total = sum(self.stacks.values()) or 1
+        self_time, inclusive = Counter(), Counter()
+        for stack, weight in self.stacks.items():
+            self_time[stack[-1]] += weight
+            for frame in set(stack):
+                inclusive[frame] += weight
+        unit = "cpu_s" if self.cpu_clock else "samples"
+        def table(counter):
+            return [{"function": name, unit: round(value, 4), "share_pct": round(100 * value / total, 1)} for name, value in counter.most_common(top)]
+        return {
+            "mode": "cpu" if self.cpu_clock else "wall",
+            "interval_s": self.interval,
+            "samples": self.samples,
+            f"total_{unit}": round(total, 4),
+            f"idle_{unit}": round(self.idle, 4),
+            "top_self": table(self_time),
+            "top_inclusive": table(inclusive),
+        }
+
+    def write_collapsed(self, path):
+        """
+        Folded stacks ("a;b;c <microseconds>") for flamegraph.pl / speedscope.
+        """
+        scale = 1_000_000 if self.cpu_clock else 1
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, weight in self.stacks.most_common():
+                f.write(f"{';'.join(frame.replace(';', ':') for frame in stack)} {max(1, int(weight * scale))}\n")
+
+def serve(port, profile_path=None, interval=0.005):
+    """
+    Runs app/main.py's server in this process (internal --serve mode), with
+    the CPU sampler active while it serves. The profile is written when the
+    server shuts down (SIGINT / SIGTERM).
+    """
+    import uvicorn
+    sys.path.insert(0, APP_DIR)
+    import main
+
+    sampler = CpuSampler(interval) if profile_path else None
+    if sampler:
+        sampler.start()
+    try:
+        uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    finally:
+        if sampler:
+            sampler.stop()
+            sampler.write_collapsed(profile_path + ".collapsed")
+            with open(profile_path, "w", encoding="utf-8") as f:
+                json.dump(sampler.summary(), f, indent=2, ensure_ascii=False)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args, port, profile_path):
+    """
+    Spawns the server with the stub LLM (no API key, injected latency) and
+    waits until it answers.
+    """
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_SECONDS": str(args.llm_latency),
+        "LLM_STUB_JITTER_SECONDS": str(args.llm_jitter),
+        "LLM_STUB_SECONDS_PER_1K_PROMPT_TOKENS": str(args.llm_seconds_per_1k),
+        "TRACE_SAMPLE_RATE": "0",
+    })
+    env.pop("LLM_SPARQL_PROVIDER", None)
+    env.pop("LLM_ANSWER_PROVIDER", None)
+    if not args.keep_llm_cache:
+        # Replayed questions would otherwise be answered from the cache after the first pass
+        env["LLM_CACHE_ENABLED"] = "0"
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)]
+    if profile_path:
+        command += ["--profile-out", profile_path, "--profile-interval", str(args.profile_interval)]
+    log = open(args.server_log, "w", encoding="utf-8") if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup (code {process.returncode}); rerun with --server-log")
+        try:
+            if httpx.get(f"{url}/pipeline/stats", timeout=2).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f"Server did not start within {args.startup_timeout}s")
+
+def stop_server(process, timeout=30):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+# --- Load generation ---
+
+def parse_metrics(text):
+    """
+    Sample values of GET /metrics keyed by the full sample name with labels.
+    """
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            try:
+                values[name] = float(value)
+            except ValueError:
+                pass
+    return values
+
+async def scrape(client, url):
+    try:
+        response = await client.get(f"{url}/metrics", timeout=5)
+        return parse_metrics(response.text)
+    except httpx.HTTPError:
+        return {}
+
+async def send_chat(client, url, question, mode, timeout, scheduled, results):
+    """
+    One /chat request. Latency is measured from its scheduled arrival time,
+    so a server that falls behind is not hidden (no coordinated omission).
+    """
+    outcome, route = "ok", None
+    try:
+        response = await client.post(f"{url}/chat", json={"message": question, **({"mode": mode} if mode else {})}, timeout=timeout)
+        if response.status_code == 429:
+            outcome = "rejected"
+        elif response.status_code != 200:
+            outcome = f"http_{response.status_code}"
+        else:
+            body = response.json()
+            route = body.get("route")
+            if str(body.get("answer", "")).startswith(FAILURE_ANSWERS):
+                outcome = "failed"
+            elif body.get("shed"):
+                outcome = "shed"
+            elif body.get("degraded"):
+                outcome = "degraded"
+    except httpx.TimeoutException:
+        outcome = "client_timeout"
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    results.append({"scheduled": scheduled, "latency": time.perf_counter() - scheduled, "outcome": outcome, "route": route})
+
+async def run_step(client, url, questions, rate, duration, concurrency, mode, timeout, rng):
+    """
+    Open-loop Poisson arrivals at `rate` req/s for `duration` seconds. An
+    arrival that finds `concurrency` requests already in flight is dropped
+    (counted as "dropped") instead of waiting, so the offered load stays fixed.
+    """
+    results, tasks = [], set()
+    dropped = 0
+    before = await scrape(client, url)
+    start = time.perf_counter()
+    next_arrival = start
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival - start > duration:
+            break
+        await asyncio.sleep(max(0, next_arrival - time.perf_counter()))
+        if len(tasks) >= concurrency:
+            dropped += 1
+            continue
+        task = asyncio.ensure_future(send_chat(client, url, rng.choice(questions), mode, timeout, next_arrival, results))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    sent_window = time.perf_counter() - start
+    if tasks:
+        await asyncio.wait(list(tasks))
+    elapsed = time.perf_counter() - start
+    after = await scrape(client, url)
+    return summarize_step(rate, duration, sent_window, elapsed, results, dropped, before, after)
+
+def latency_growth(results):
+    """
+    Median latency of the last third of arrivals over the first third. Near
+    1 when the server keeps up; growing when a queue builds during the step.
+    """
+    ordered = [r["latency"] for r in sorted(results, key=lambda r: r["scheduled"]) if r["outcome"] in SERVED]
+    third = len(ordered) // 3
+    if third < 3:
+        return None
+    first = percentile(ordered[:third], 50)
+    return round(percentile(ordered[-third:], 50) / first, 3) if first > 0 else None
+
+def summarize_step(rate, duration, sent_window, elapsed, results, dropped, before, after):
+    outcomes = Counter(r["outcome"] for r in results)
+    offered = len(results) + dropped
+    succeeded = [r["latency"] for r in results if r["outcome"] in SERVED]
+    shed = sum(outcomes[outcome] for outcome in SHED)
+    errors = offered - len(succeeded) - shed
+    cpu_key = "process_cpu_seconds_total"
+    step = {
+        "rate_rps": rate,
+        "duration_s": duration,
+        "offered": offered,
+        "offered_rps": round(offered / max(sent_window, 1e-9), 3),
+        "served": len(succeeded),
+        "throughput_rps": round(len(succeeded) / max(elapsed, 1e-9), 3),
+        "shed_rate": round(shed / offered, 4) if offered else 0.0,
+        "error_rate": round(errors / offered, 4) if offered else 0.0,
+        "outcomes": {**dict(outcomes), **({"dropped": dropped} if dropped else {})},
+        "routes": dict(Counter(r["route"] for r in results if r["route"])),
+        "latency_s": {
+            f"p{p}": round(percentile(succeeded, p), 4) if succeeded else None for p in (50, 95, 99)
+        },
+        "max_latency_s": round(max(succeeded), 4) if succeeded else None,
+        "latency_growth": latency_growth(results),
+        "drain_s": round(elapsed - sent_window, 3),
+    }
+    if cpu_key in before and cpu_key in after:
+        step["server_cpu_utilization"] = round((after[cpu_key] - before[cpu_key]) / elapsed, 3)
+    return step
+
+def is_saturated(step, slo_p95, max_error_rate, max_growth=2.0, max_shed_rate=0.01):
+    """
+    Reasons the step counts as past saturation: latency still growing at the
+    end of the step (the server falls behind the offered rate), p95 of served
+    requests above the SLO, too many errors, or admission control shedding
+    more than `max_shed_rate` of the requests (empty when healthy).
+    """
+    reasons = []
+    if step["latency_growth"] is not None and step["latency_growth"] > max_growth:
+        reasons.append("queue_growth")
+    p95 = step["latency_s"]["p95"]
+    if p95 is None or p95 > slo_p95:
+        reasons.append("p95")
+    if step["error_rate"] > max_error_rate:
+        reasons.append("errors")
+    if step["shed_rate"] > max_shed_rate:
+        reasons.append("shed")
+    return reasons
+
+async def run_load(args, url, questions):
+    rng = random.Random(args.seed)
+    steps = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        for question in questions[:args.warmup]:
+            await send_chat(client, url, question, args.mode, args.timeout, time.perf_counter(), [])
+        for rate in args.rates:
+            print(f"[LOAD] {rate} req/s for {args.duration}s...", file=sys.stderr)
+            step = await run_step(client, url, questions, rate, args.duration, args.concurrency, args.mode, args.timeout, rng)
+            step["saturated"] = is_saturated(step, args.slo_p95, args.max_error_rate, args.max_latency_growth, args.max_shed_rate)
+            steps.append(step)
+            latency = step["latency_s"]
+            print(f"[LOAD]   {step['offered_rps']} req/s offered, {step['throughput_rps']} req/s served, p50 {latency['p50']}s p95 {latency['p95']}s p99 {latency['p99']}s, "
+                  f"shed {step['shed_rate']:.1%}, errors {step['error_rate']:.1%}, cpu {step.get('server_cpu_utilization', '-')}"
+                  + (f" -> saturated ({', '.join(step['saturated'])})" if step["saturated"] else ""), file=sys.stderr)
+            if step["saturated"] and not args.no_stop:
+                break
+    return steps
+
+def saturation_point(steps):
+    """
+    The first saturated offered rate and the highest healthy rate before it.
+    """
+    capacity = None
+    for step in steps:
+        if step["saturated"]:
+            return {"saturated_at_rps": step["rate_rps"], "reasons": step["saturated"], "sustained_rps": capacity}
+        capacity = step["rate_rps"]
+    return {"saturated_at_rps": None, "reasons": [], "sustained_rps": capacity}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays Korean math questions against /chat at stepped arrival rates with a stub LLM.")
+    parser.add_argument("--url", help="Target a running server instead of spawning one (no CPU profile; its LLM settings apply)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Question file, one per line")
+    parser.add_argument("--rates", default="1,2,4,8,12,16,24,32", help="Comma-separated arrival rates (req/s), run in order")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per rate step")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max requests in flight; further arrivals are dropped")
+    parser.add_argument("--mode", choices=["two_call", "retrieval"], help="Pipeline mode per request (default: server's PIPELINE_MODE)")
+    parser.add_argument("--timeout", type=float, default=90, help="Client timeout per request (s)")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential requests before the first step")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo-p95", type=float, default=5.0, help="p95 latency (s) above which a step is saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate above which a step is saturated")
+    parser.add_argument("--max-shed-rate", type=float, default=0.01, help="Share of requests shed by admission control (graph-only or 429) above which a step is saturated")
+    parser.add_argument("--max-latency-growth", type=float, default=2.0, help="Last-third / first-third median latency above which a step is saturated")
+    parser.add_argument("--no-stop", action="store_true", help="Run every rate even after saturation")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Stub LLM base latency per call (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="Stub LLM latency jitter (+- s)")
+    parser.add_argument("--llm-seconds-per-1k", type=float, default=0.1, help="Stub LLM extra latency per 1k prompt tokens (s)")
+    parser.add_argument("--keep-llm-cache", action="store_true", help="Leave the LLM response cache on")
+    parser.add_argument("--profile", default=os.path.join(PROJECT_ROOT, "data", "profiles", "load_test_cpu.json"),
+                        help="Server CPU profile JSON (folded stacks next to it as .collapsed); '' disables")
+    parser.add_argument("--profile-interval", type=float, default=0.005, help="CPU sampling interval (s)")
+    parser.add_argument("--server-log", help="Write the spawned server's output here")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    # Internal: run the server in this process (spawned by the load generator)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--profile-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.profile_out, args.profile_interval)
+        return
+
+    args.rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    questions = load_corpus(args.corpus)
+    process, profile_path = None, None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        if args.profile:
+            profile_path = os.path.abspath(args.profile)
+            os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+        print("[LOAD] Starting server with the stub LLM...", file=sys.stderr)
+        process, url = start_server(args, free_port(), profile_path)
+
+    try:
+        steps = asyncio.run(run_load(args, url, questions))
+    finally:
+        if process:
+            stop_server(process)
+
+    report = {
+        "benchmark": "load_test",
+        "target": args.url or "spawned (stub LLM)",
+        "settings": {
+            "questions": len(questions), "duration_s": args.duration, "concurrency": args.concurrency, "mode": args.mode,
+            "slo_p95_s": args.slo_p95, "max_error_rate": args.max_error_rate, "max_shed_rate": args.max_shed_rate, "max_latency_growth": args.max_latency_growth,
+            **({} if args.url else {"llm_latency_s": args.llm_latency, "llm_jitter_s": args.llm_jitter,
+                                    "llm_seconds_per_1k_prompt_tokens": args.llm_seconds_per_1k})
+        },
+        "steps": steps,
+        "saturation": saturation_point(steps),
+    }
+    if profile_path and os.path.exists(profile_path):
+        with open(profile_path, encoding="utf-8") as f:
+            report["cpu_profile"] = {**json.load(f), "file": profile_path, "collapsed": profile_path + ".collapsed"}
+        print(f"[LOAD] CPU profile: {profile_path} (+ .collapsed for flame graphs)", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import subprocess
+import argparse
+import json
+import sys
+import os
+import gc
+
+import rdflib
+from rdflib import RDF, RDFS, Literal
+
+# Add 'app' directory to path to import graph_loader
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+TBOX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ontology", "math_tbox.ttl")
+
+def rss_mb():
+    """
+    Current resident set size in MB (Linux /proc, falling back to peak RSS).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def synthetic_abox(n_triples):
+    """
+    ABox in the math_abox.ttl shape: Subject > Chapter > Section > Concept with
+    labels, hierarchy edges and prerequisiteOf links (~5 triples per Concept).
+    """
+    g = rdflib.Graph()
+    i = 0
+    while len(g) < n_triples:
+        sub, chap, sec, con = NS[f"Sub_{i // 1000}"], NS[f"Chap_{i // 100}"], NS[f"Sec_{i // 10}"], NS[f"Con_{i}"]
+        if i % 1000 == 0:
+            g.add((sub, RDF.type, NS.Subject))
+            g.add((sub, RDFS.label, Literal(f"교과목 {i // 1000}")))
+        if i % 100 == 0:
+            g.add((chap, RDF.type, NS.Chapter))
+            g.add((chap, RDFS.label, Literal(f"대단원 {i // 100}")))
+            g.add((sub, NS.hasChapter, chap))
+        if i % 10 == 0:
+            g.add((sec, RDF.type, NS.Section))
+            g.add((sec, RDFS.label, Literal(f"소단원 {i // 10}")))
+            g.add((chap, NS.hasSection, sec))
+        g.add((con, RDF.type, NS.Concept))
+        g.add((con, RDFS.label, Literal(f"개념 {i}")))
+        g.add((sec, NS.hasConcept, con))
+        if i:
+            g.add((NS[f"Con_{i - 1}"], NS.prerequisiteOf, con))
+        i += 1
+    return g
+
+def measure(mode, n_triples):
+    """
+    Builds ABox + TBox, then merges them with `g + tbox` ("copy") or
+    union_view ("view") and reports RSS at each step.
+    """
+    from graph_loader import union_view
+
+    baseline = rss_mb()
+    abox = synthetic_abox(n_triples)
+    tbox = rdflib.Graph()
+    tbox.parse(TBOX_PATH, format="turtle")
+    gc.collect()
+    loaded = rss_mb()
+
+    merged = abox + tbox if mode == "copy" else union_view(abox, tbox)
+    gc.collect()
+    after = rss_mb()
+
+    return {
+        "mode": mode,
+        "triples": len(merged),
+        "rss_loaded_mb": round(loaded - baseline, 1),
+        "rss_merged_mb": round(after - baseline, 1),
+        "merge_overhead_mb": round(after - loaded, 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident memory of g + tbox vs. union_view on a synthetic ABox.")
+    parser.add_argument("--triples", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=["copy", "view"], help="Measure one mode in this process (internal)")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.triples)))
+    else:
+        # Each mode runs in a fresh interpreter so RSS numbers do not interfere
+        results = []
+        for mode in ("copy", "view"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--triples", str(args.triples)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        print(json.dumps({"benchmark": "union_memory", "results": results}, indent=2, ensure_ascii=False))
@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+import rdflib
+
+# Add 'app' directory to path to import graph_snapshot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from graph_snapshot import write_snapshot, read_snapshot_header
+from graph_loader import load_graph, union_view
+from ngram_index import build_ngram_index, ngram_index_path, NGRAM_INDEX_PATH
+
+# Configuration
+SOURCES = [
+    "data/knowledge_graph/math_abox.ttl",
+    "data/ontology/math_tbox.ttl",
+]
+
+def build_snapshots(sources=SOURCES):
+    for source in sources:
+        print(f"[INFO] Parsing {source}...")
+        start = time.perf_counter()
+        g = rdflib.Graph()
+        g.parse(source, format="turtle")
+        parse_time = time.perf_counter() - start
+        
+        snapshot = write_snapshot(g, source)
+        header = read_snapshot_header(snapshot)
+        size_kb = os.path.getsize(snapshot) / 1024
+        print(f"[SUCCESS] {snapshot}: {header['triples']} triples, {size_kb:.1f} KB "
+              f"(sha256 {header['source_sha256'][:12]}, Turtle parse {parse_time:.2f}s)")
+
+def build_search_index(sources=SOURCES, path=NGRAM_INDEX_PATH):
+    """
+    Prebuilds the character n-gram index (fuzzy concept search) over all sources,
+    so the server loads it from disk instead of building it at startup.
+    """
+    graph = union_view(*[load_graph(source) for source in sources])
+    start = time.perf_counter()
+    index = build_ngram_index(graph)
+    build_time = time.perf_counter() - start
+    path = ngram_index_path(index.version, path)
+    index.save(path)
+    size_kb = os.path.getsize(path) / 1024
+    print(f"[SUCCESS] {path}: {len(index)} documents, {len(index.terms)} n-grams, "
+          f"{size_kb:.1f} KB (build {build_time:.2f}s)")
+
+if __name__ == "__main__":
+    # Usage: python build_snapshot.py [file.ttl ...]
+    build_snapshots(sys.argv[1:] or SOURCES)
+    build_search_index(sys.argv[1:] or SOURCES)
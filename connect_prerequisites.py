@@ -1,5 +1,12 @@
 import rdflib
 from rdflib import Namespace, RDF, RDFS, Literal
+import os
+import sys
+
+# Add 'app' directory to path to import graph_engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from graph_engine import compile_graph
+from prerequisite_index import PrerequisiteIndex
 
 # Configuration
 FILE_PATH = "data/knowledge_graph/math_abox.ttl"
@@ -12,13 +19,16 @@ def connect_prerequisites():
     g = rdflib.Graph()
     g.parse(FILE_PATH, format="turtle")
     
+    # Label/type lookups go through the compiled engine instead of scanning every Section
+    engine = compile_graph(g)
+    # Transitive closure, updated incrementally as links are added
+    closure = PrerequisiteIndex(engine)
+
     # Helper to find URI by Label (Prioritize Section -> Concept -> others)
     def find_node(label_name):
         # Strict Section Search as requested
-        for s, p, o in g.triples((None, RDF.type, NS.Section)):
-            if str(g.value(s, RDFS.label)) == label_name:
-                return s
-        return None
+        ids = engine.find(label_name, node_type="Section")
+        return engine.uri(ids[0]) if ids else None
 
     # Helper to connect
     def connect(parent_label, child_label):
@@ -36,7 +46,10 @@ def connect_prerequisites():
             return
 
         g.add((parent_uri, NS.prerequisiteOf, child_uri))
-        print(f"[LINK] {parent_label} -> {child_label}")
+        if closure.add_prerequisite(engine.node_id(parent_uri), engine.node_id(child_uri)):
+            print(f"[LINK] {parent_label} -> {child_label}")
+        else:
+            print(f"[LINK] {parent_label} -> {child_label} (already implied transitively)")
 
     print("\n[INFO] Linking Full Curriculum (Section Only)...")
 
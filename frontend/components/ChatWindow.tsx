@@ -28,24 +28,79 @@ export default function ChatWindow() {
         setInput('');
         setIsLoading(true);
 
+        // Placeholder bubble that is filled in as answer tokens stream in
+        const aiId = (Date.now() + 1).toString();
+        const updateAiMsg = (patch: Partial<Message>) => {
+            setMessages(prev => prev.map(m => (m.id === aiId ? { ...m, ...patch } : m)));
+        };
+        let aiStarted = false;
+        let answerText = '';
+
         try {
-            const res = await fetch('http://localhost:8000/chat', {
+            const res = await fetch('http://localhost:8000/chat/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ message: userMsg.content }),
             });
 
-            if (!res.ok) throw new Error('Network response was not ok');
+            // Server busy (admission queue full): show its retry message instead of an error
+            if (res.status === 429) {
+                const payload = await res.json();
+                setMessages(prev => [...prev, { id: aiId, role: 'assistant', content: payload.answer }]);
+                return;
+            }
+            if (!res.ok || !res.body) throw new Error('Network response was not ok');
 
-            const data = await res.json();
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
 
-            const aiMsg: Message = {
-                id: (Date.now() + 1).toString(),
-                role: 'assistant',
-                content: data.answer,
-                evidence: data.evidence
+            // Server-Sent Events: frames are separated by a blank line
+            const handleFrame = (frame: string) => {
+                let event = 'message';
+                let data = '';
+                for (const line of frame.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (!data) return;
+                const payload = JSON.parse(data);
+
+                if (event === 'token') {
+                    answerText += payload.text;
+                    if (!aiStarted) {
+                        aiStarted = true;
+                        setIsLoading(false);
+                        setMessages(prev => [...prev, { id: aiId, role: 'assistant', content: answerText }]);
+                    } else {
+                        updateAiMsg({ content: answerText });
+                    }
+                } else if (event === 'evidence' || event === 'error') {
+                    const finalMsg: Message = {
+                        id: aiId,
+                        role: 'assistant',
+                        content: payload.answer,
+                        evidence: payload.evidence
+                    };
+                    if (!aiStarted) {
+                        aiStarted = true;
+                        setMessages(prev => [...prev, finalMsg]);
+                    } else {
+                        updateAiMsg(finalMsg);
+                    }
+                }
             };
-            setMessages(prev => [...prev, aiMsg]);
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let sep: number;
+                while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                    handleFrame(buffer.slice(0, sep));
+                    buffer = buffer.slice(sep + 2);
+                }
+            }
         } catch (error) {
             console.error(error);
             const errorMsg: Message = {
@@ -53,7 +108,11 @@ export default function ChatWindow() {
                 role: 'assistant',
                 content: "죄송합니다. 서버 연결에 실패했습니다.",
             };
-            setMessages(prev => [...prev, errorMsg]);
+            if (aiStarted) {
+                updateAiMsg({ content: errorMsg.content });
+            } else {
+                setMessages(prev => [...prev, errorMsg]);
+            }
         } finally {
             setIsLoading(false);
         }
@@ -1,6 +1,12 @@
 import rdflib
 from rdflib import Namespace, RDF, RDFS, Literal
 import re
+import os
+import sys
+
+# Add 'app' directory to path to import graph_engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from graph_engine import compile_graph
 
 # Configuration
 INPUT_FILE = "data/report/proposed_additions.md"
@@ -14,14 +20,13 @@ def import_additions():
     g = rdflib.Graph()
     g.parse(GRAPH_FILE, format="turtle")
     
+    # Label/type lookups go through the compiled engine instead of scanning every Concept
+    engine = compile_graph(g)
+
     # Helper to find URI by Label
     def find_concept(label_name):
-        label_name = label_name.strip()
-        for s, p, o in g.triples((None, RDF.type, NS.Concept)):
-            label = g.value(s, RDFS.label)
-            if label and str(label) == label_name:
-                return s
-        return None
+        ids = engine.find(label_name.strip(), node_type="Concept")
+        return engine.uri(ids[0]) if ids else None
 
     print(f"[INFO] Reading {INPUT_FILE}...")
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
@@ -20,14 +20,21 @@ if "GOOGLE_API_KEY" not in os.environ and "GOOGLE_API_KEY" not in st.secrets:
     pass
 
 try:
-    from reasoning_engine import generate_sparql, execute_sparql, generate_answer, DEFAULT_SPARQL_PROMPT, DEFAULT_ANSWER_PROMPT
+    from reasoning_engine import generate_sparql, execute_sparql, generate_answer, DEFAULT_SPARQL_PROMPT, DEFAULT_ANSWER_PROMPT, SPARQL_STAGE, ANSWER_STAGE
+    from llm_provider import get_provider
+    import tracing
+    # Providers are created lazily; create them now so a missing key is reported up front
+    for stage in (SPARQL_STAGE, ANSWER_STAGE):
+        get_provider(stage)
 except ValueError as e:
     st.error("🚨 **Deployment Error: Google API Key Missing**")
     st.warning("Please configure your Secrets in Streamlit Cloud Settings.")
     st.stop()
 
-from graph_loader import load_graph, generate_schema_info
-from visualize_graph import visualize_ontology
+from graph_loader import load_graph, generate_schema_info, get_label_index, get_hierarchy_table, union_view
+from visualize_graph import visualize_ontology, get_parent_engine
+from graph_engine import get_graph_engine
+from ngram_index import get_ngram_index, similar_labels
 
 # Page Config
 st.set_page_config(page_title="Math Ontology Prompt Playground", layout="wide")
@@ -66,6 +73,8 @@ with st.expander("⚙️  Configure Prompts", expanded=True):
             height=300,
             key="answer_prompt"
         )
+    use_label_hints = st.checkbox("Add fuzzy label hints (n-gram index) to the SPARQL prompt", value=True)
+    show_trace = st.checkbox("Show per-stage trace (timings and sizes) for each answer", value=False)
 
 st.markdown("---")
 
@@ -93,8 +102,13 @@ with st.sidebar:
 def get_graph_data():
     g = load_graph(DATA_PATH)
     t = load_graph(TBOX_PATH)
-    full_g = g + t
+    full_g = union_view(g, t) # Zero-copy merged view
     schema = generate_schema_info(full_g)
+    get_label_index(full_g) # Build label lookup once per cached graph
+    get_hierarchy_table(full_g)
+    get_graph_engine(full_g) # Node labels and groups in visualize_ontology
+    get_parent_engine(full_g) # Used by visualize_ontology for highlight expansion
+    get_ngram_index(full_g) # Fuzzy label hints for the SPARQL prompt
     return full_g, schema
 
 try:
@@ -111,10 +125,17 @@ st.subheader("💬 Chat Interface")
 # Chat History
 for msg in st.session_state.chat_history:
     with st.chat_message(msg["role"]):
+        if msg.get("label_hints"):
+            st.caption(f"🔎 Label hints: {', '.join(msg['label_hints'])}")
         st.markdown(msg["content"])
+        if msg.get("viz_error"):
+            st.warning(f"Graph highlighting failed: {msg['viz_error']}")
         if "evidence" in msg and msg["evidence"]:
             with st.expander("🔍 Evidence"):
                 st.table(msg["evidence"])
+        if msg.get("trace"):
+            with st.expander("⏱️ Trace"):
+                st.json(msg["trace"])
 
 # Chat Input (Pinned to bottom)
 if prompt := st.chat_input("Ask a math question..."):
@@ -122,39 +143,48 @@ if prompt := st.chat_input("Ask a math question..."):
     st.session_state.chat_history.append({"role": "user", "content": prompt})
     
     with st.spinner("Analyzing Ontology with YOUR prompts..."):
-        # 1. Reasoning (Pass Custom Prompt)
-        sparql_res = generate_sparql(prompt, schema_info, prompt_template=sparql_prompt_template)
+        with tracing.start_trace("streamlit_chat", sampled=True if show_trace else None) as trace:
+            # 1. Reasoning (Pass Custom Prompt)
+            # Shown with the answer: anything rendered here is cleared by st.rerun()
+            label_hints = similar_labels(prompt, full_graph) if use_label_hints else None
+            sparql_res = generate_sparql(prompt, schema_info, prompt_template=sparql_prompt_template, label_hints=label_hints)
         
-        # 2. Execution
-        db_data = []
-        if sparql_res and "query" in sparql_res and sparql_res["query"]:
-             db_data = execute_sparql(sparql_res["query"], full_graph)
+            # 2. Execution
+            db_data = []
+            if sparql_res and "query" in sparql_res and sparql_res["query"]:
+                 db_data = execute_sparql(sparql_res["query"], full_graph)
         
-        # 3. Answer Generation (Pass Custom Prompt)
-        final_res = generate_answer(prompt, db_data, sparql_res.get("explanation", ""), prompt_template=answer_prompt_template)
+            # 3. Answer Generation (Pass Custom Prompt)
+            final_res = generate_answer(prompt, db_data, sparql_res.get("explanation", ""), prompt_template=answer_prompt_template)
         
-        answer_text = final_res.get("answer", "No answer generated.")
-        evidence_data = final_res.get("evidence", [])
+            answer_text = final_res.get("answer", "No answer generated.")
+            evidence_data = final_res.get("evidence", [])
         
-        # 4. Update Visualization (Highlighting)
-        if evidence_data:
-            highlight_nodes = []
-            for item in evidence_data:
-                if item.get("concept"): highlight_nodes.append(item["concept"])
-                if item.get("chapter"): highlight_nodes.append(item["chapter"])
-                if item.get("subject"): highlight_nodes.append(item["subject"])
+            # 4. Update Visualization (Highlighting)
+            viz_error = None
+            if evidence_data:
+                highlight_nodes = []
+                for item in evidence_data:
+                    if item.get("concept"): highlight_nodes.append(item["concept"])
+                    if item.get("chapter"): highlight_nodes.append(item["chapter"])
+                    if item.get("subject"): highlight_nodes.append(item["subject"])
             
-            try:
-                new_html = visualize_ontology(graph=full_graph, highlight_labels=highlight_nodes, return_html_str=True)
-                st.session_state.viz_html = new_html
-            except Exception as e:
-                print(f"Visualization Error: {e}")
+                try:
+                    with tracing.span("visualize_ontology", highlights=len(highlight_nodes)):
+                        new_html = visualize_ontology(graph=full_graph, highlight_labels=highlight_nodes, return_html_str=True)
+                    st.session_state.viz_html = new_html
+                except Exception as e:
+                    print(f"[WARN] Visualization failed: {e}")
+                    viz_error = str(e)
 
     # Assistant Message
     st.session_state.chat_history.append({
         "role": "assistant", 
         "content": answer_text,
-        "evidence": evidence_data
+        "evidence": evidence_data,
+        "label_hints": label_hints,
+        "viz_error": viz_error,
+        "trace": trace.to_dict() if trace and show_trace else None,
     })
     
     st.rerun()
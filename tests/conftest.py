@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ABOX_PATH = os.path.join(PROJECT_ROOT, "data", "knowledge_graph", "math_abox.ttl")
+TBOX_PATH = os.path.join(PROJECT_ROOT, "data", "ontology", "math_tbox.ttl")
+
+# No persistent caches, worker processes or network LLM while testing; app/ modules are flat imports
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("SPARQL_WORKERS", "0")
+os.environ.setdefault("LLM_PROVIDER", "stub")
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+MATH_PREFIXES = """PREFIX : <http://snu.ac.kr/math/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+"""
+
+@pytest.fixture(scope="session")
+def full_graph():
+    """
+    Current ABox + TBox as the server sees it (union view).
+    """
+    from graph_loader import load_graph, union_view
+    return union_view(load_graph(ABOX_PATH), load_graph(TBOX_PATH))
+
+@pytest.fixture(scope="session")
+def plain_graph():
+    """
+    The same triples in a plain rdflib Graph, queried without any of the app's caches.
+    """
+    import rdflib
+    graph = rdflib.Graph()
+    graph.parse(ABOX_PATH, format="turtle")
+    graph.parse(TBOX_PATH, format="turtle")
+    return graph
+
+def plain_rows(graph, query):
+    """
+    Rows of rdflib's own prepareQuery + query, as sorted tuples of (var, str) pairs.
+    """
+    from rdflib.plugins.sparql import prepareQuery
+    results = graph.query(prepareQuery(query))
+    return sorted((tuple(sorted((str(var), str(row[var]) if row[var] is not None else None) for var in results.vars)) for row in results), key=repr)
+
+def app_rows(rows):
+    return sorted((tuple(sorted(row.items())) for row in rows), key=repr)
@@ -0,0 +1,175 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import admission
+import main
+from admission import AdmissionController, Overloaded
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Only the admission module's clock (asyncio keeps the real one)
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+async def _queued(controller, count):
+    """
+    Starts `count` acquire() tasks and lets them reach the queue.
+    """
+    tasks = [asyncio.create_task(controller.acquire()) for _ in range(count)]
+    await asyncio.sleep(0)
+    return tasks
+
+def test_queue_full_is_shed(clock):
+    async def run():
+        controller = AdmissionController(1, 1, 10.0, initial_hold_seconds=0.1)
+        held = await controller.acquire()
+        waiting, = await _queued(controller, 1)
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        held.release()
+        (await waiting).release()
+        return controller, shed.value
+
+    controller, shed = asyncio.run(run())
+    assert shed.reason == "queue_full"
+    assert shed.retry_after >= 1
+    assert controller.active == 0
+    assert controller.stats()["counts"] == {"admitted": 2, "queue_full": 1}
+
+def test_predicted_wait_follows_the_observed_hold_time(clock):
+    async def run():
+        controller = AdmissionController(1, 10, 5.0, initial_hold_seconds=1.0)
+        held = await controller.acquire()
+        waiting, = await _queued(controller, 1) # Predicted 1 x 1.0s: queued
+        clock.now += 31.0 # Slot held for 31s: EWMA 1.0 + 0.2 x 30 = 7.0
+        held.release()
+        assert controller.hold_seconds == pytest.approx(7.0)
+        second = await waiting
+        with pytest.raises(Overloaded) as shed: # Predicted 1 x 7.0s > 5s
+            await controller.acquire()
+        second.release()
+        return controller, shed.value
+
+    controller, shed = asyncio.run(run())
+    assert shed.reason == "predicted_wait"
+    assert shed.retry_after == 7
+    assert controller.queued == 0 and controller.active == 0
+
+def test_wait_timeout_leaves_the_queue(clock):
+    async def run():
+        controller = AdmissionController(1, 10, 0.05, initial_hold_seconds=0.01)
+        held = await controller.acquire()
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        assert controller.queued == 0
+        held.release()
+        return controller, shed.value
+
+    controller, shed = asyncio.run(run())
+    assert shed.reason == "wait_timeout"
+    assert controller.active == 0
+
+def test_slot_goes_to_the_oldest_live_waiter(clock):
+    async def run():
+        controller = AdmissionController(1, 10, 10.0, initial_hold_seconds=0.01)
+        held = await controller.acquire()
+        first, second, third = await _queued(controller, 3)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert controller.queued == 2
+        held.release()
+        handed = await asyncio.wait_for(second, 1.0)
+        assert not third.done()
+        assert controller.active == 1 # Handed over, not released
+        handed.release()
+        (await third).release()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.active == 0 and controller.queued == 0
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on(clock):
+    async def run():
+        controller = AdmissionController(1, 10, 10.0, initial_hold_seconds=0.01)
+        held = await controller.acquire()
+        first, second = await _queued(controller, 2)
+        held.release() # Resolves first's future ...
+        first.cancel() # ... but first is cancelled before it runs
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        (await second).release()
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.active == 0 and controller.queued == 0
+
+def test_release_is_idempotent(clock):
+    async def run():
+        controller = AdmissionController(2, 10, 10.0)
+        first = await controller.acquire()
+        second = await controller.acquire()
+        first.release()
+        first.release()
+        assert controller.active == 1
+        second.release()
+        return controller
+
+    assert asyncio.run(run()).active == 0
+
+def test_disabled_controller_admits_everything():
+    async def run():
+        controller = AdmissionController(0, 0, 0.0)
+        slots = [await controller.acquire() for _ in range(5)]
+        for slot in slots:
+            slot.release()
+        return controller
+
+    assert asyncio.run(run()).active == 0
+
+def test_busy_response_is_429_with_retry_after():
+    response = main.busy_response(Overloaded("queue_full", 3))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert json.loads(response.body)["retry_after"] == 3
+
+@pytest.fixture
+def saturated(monkeypatch):
+    """
+    main.admission with its only slot taken and no queue; shed requests get 429s.
+    """
+    controller = AdmissionController(1, 0, 1.0, initial_hold_seconds=2.0)
+    held = asyncio.run(controller.acquire())
+    monkeypatch.setattr(main, "admission", controller)
+    monkeypatch.setattr(main, "ADMISSION_SHED_MODE", "reject")
+    yield controller
+    held.release()
+
+@pytest.mark.parametrize("path", ["/chat", "/chat/stream"])
+def test_shed_request_gets_429_with_retry_after(saturated, path):
+    response = TestClient(main.app).post(path, json={"message": "정적분이 뭐야?"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert saturated.active == 1
+
+def test_stream_releases_its_slot_when_it_ends(monkeypatch):
+    controller = AdmissionController(1, 0, 1.0)
+    monkeypatch.setattr(main, "admission", controller)
+    response = TestClient(main.app).post("/chat/stream", json={"message": "정적분이 뭐야?"})
+    assert response.status_code == 200
+    assert "event: evidence" in response.text
+    assert controller.active == 0
+    assert controller.stats()["counts"] == {"admitted": 1}
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import main
+from llm_provider import StubProvider, get_provider
+from reasoning_engine import ANSWER_STAGE, extract_partial_answer
+
+def _frames(raw):
+    """
+    (event, payload) pairs of SSE frames.
+    """
+    frames = []
+    for frame in raw:
+        event, data = frame.strip().split("\n", 1)
+        frames.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return frames
+
+def _wait_until(condition, timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"answer"', ""),
+    ('{"answer": "극한', "극한"),
+    ('{"answer": "a\\', "a"),
+    ('{"answer": "a\\u00', "a"),
+    ('{"answer": "a\\uZZZZ b"', "a"),
+    ('{"answer": "a\\x b"', "a"),
+    ('{"answer": "a\\ud83d', "a"),
+    ('{"answer": "a\\ud83d\\ude0', "a"),
+    ('{"answer": "a\\ud83d\\ude00 b', "a\U0001F600 b"),
+    ('{"answer": "a\\"b\\\\", "evidence": []}', 'a"b\\'),
+])
+def test_partial_answer_stops_before_incomplete_escapes(text, expected):
+    assert extract_partial_answer(text) == expected
+
+def test_partial_answers_grow_monotonically():
+    answer = "극한 \"lim\" \\ 😀\n끝"
+    text = json.dumps({"answer": answer, "evidence": []})
+    previous = ""
+    for end in range(len(text) + 1):
+        partial = extract_partial_answer(text[:end])
+        assert partial.startswith(previous) and answer.startswith(partial)
+        previous = partial
+    assert previous == answer
+
+def test_close_after_closes_the_stream_once_the_pending_chunk_arrives():
+    released = threading.Event()
+
+    def slow_stream():
+        try:
+            time.sleep(0.3)
+            yield "first"
+            yield "second"
+        finally:
+            released.set()
+
+    stream = slow_stream()
+
+    async def run():
+        job = main.llm_executor.submit(next, stream, None)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.wrap_future(job), timeout=0.05)
+        main.close_after(job, stream)
+        return job
+
+    job = asyncio.run(run())
+    assert not released.is_set()
+    assert job.result(timeout=2) == "first"
+    assert released.wait(2)
+    assert stream.gi_frame is None
+
+def test_stub_stream_honours_its_timeout():
+    provider = StubProvider(latency=2.0)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(provider.stream("### User Question\n정적분", stage="answer", timeout=0.2))
+    assert time.monotonic() - start < 1.0
+    assert provider._slots.acquire(blocking=False)
+
+def test_stream_deadline_caps_the_orphaned_llm_call(monkeypatch):
+    provider = get_provider(ANSWER_STAGE)
+    monkeypatch.setattr(provider, "latency", 4.0) # First chunk only after 2s
+    monkeypatch.setattr(main, "CHAT_BUDGET_SECONDS", 0.3)
+    inflight = provider._slots._value
+
+    async def collect():
+        return [frame async for frame in main._stream_chat_events("정적분이 뭐야?", "two_call", None)]
+
+    start = time.monotonic()
+    frames = _frames(asyncio.run(collect()))
+    assert [event for event, _ in frames] == ["sparql", "rows", "evidence"]
+    assert frames[-1][1].get("degraded")
+    assert time.monotonic() - start < 1.5
+    # The orphaned next() ends at the deadline and the stream is closed, freeing its provider slot
+    assert _wait_until(lambda: provider._slots._value == inflight, timeout=1.0)
+
+def _slot_response(spec_version, send):
+    from admission import AdmissionController
+    from starlette.requests import ClientDisconnect
+    controller = AdmissionController(1, 0, 1.0)
+    started = []
+
+    async def events():
+        started.append(True)
+        yield "event: token\ndata: {}\n\n"
+
+    async def receive():
+        await asyncio.sleep(10)
+        return {"type": "http.disconnect"}
+
+    async def run():
+        slot = await controller.acquire()
+        response = main.SlotStreamingResponse(events(), slot, media_type="text/event-stream")
+        scope = {"type": "http", "asgi": {"spec_version": spec_version}}
+        try:
+            await response(scope, receive, send)
+        except (OSError, ClientDisconnect): # Starlette >= ASGI 2.4 re-raises the OSError as ClientDisconnect
+            pass
+
+    asyncio.run(run())
+    return controller, started
+
+@pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+def test_slot_is_released_when_the_client_disconnects_before_the_stream_starts(spec_version):
+    async def send(message):
+        raise OSError("client went away")
+
+    controller, started = _slot_response(spec_version, send)
+    assert not started
+    assert controller.active == 0
+
+def test_slot_is_released_after_a_completed_stream():
+    sent = []
+
+    async def send(message):
+        sent.append(message["type"])
+
+    controller, started = _slot_response("2.4", send)
+    assert started and sent[-1] == "http.response.body"
+    assert controller.active == 0
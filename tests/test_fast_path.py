@@ -0,0 +1,53 @@
+import pytest
+
+from reasoning_engine import fast_path_sparql, match_known_concepts
+from graph_loader import get_label_index
+
+@pytest.fixture(scope="module")
+def label_index(full_graph):
+    return get_label_index(full_graph)
+
+@pytest.mark.parametrize("question, labels", [
+    ("정적분이 뭐야?", ["정적분"]),
+    ("합성함수의 미분법이 뭐야?", ["합성함수의 미분법"]),
+    ("합성함수의 미분법 좀 알려줘", ["합성함수의 미분법"]),
+    ("벡터의 내적이 뭐예요?", ["벡터의 내적"]),
+    ("조건부확률이랑 독립시행의 확률이 헷갈려요", ["조건부확률", "독립시행의 확률"]),
+    ("중복조합이랑 중복순열 차이가 뭐야?", ["중복조합", "중복순열"]),
+])
+def test_confident_questions_take_the_fast_path(question, labels, label_index):
+    matches = match_known_concepts(question, label_index)
+    assert [match.entries[0].label for match in matches] == labels
+    assert fast_path_sparql(question, label_index)["enrich"] == "target"
+
+@pytest.mark.parametrize("question", [
+    # Prompt Example 1: asks about 합성함수의 미분법, not 합성함수 ("미분" is a Chapter label)
+    "합성함수 미분이 뭐야?",
+    # Only a Chapter label
+    "미분이 뭐야?",
+    "확률 단원이 제일 싫어요",
+    # Leftover content words the label does not cover
+    "정적분 넓이 구하는 법",
+    "등비급수는 언제 수렴해?",
+    "구분구적법이 정적분이랑 무슨 상관이야?",
+    # University topics around a curriculum label
+    "테일러 급수가 너무 어려워.",
+    "편미분이 그냥 미분이랑 어떻게 달라?",
+    # Label inside a longer word
+    "다변수함수가 뭐야?",
+])
+def test_partial_or_ambiguous_questions_use_the_llm(question, label_index):
+    assert match_known_concepts(question, label_index) is None
+    assert fast_path_sparql(question, label_index) is None
+
+def test_fast_path_rows_name_the_asked_concept(full_graph, label_index):
+    from reasoning_engine import execute_sparql
+    sparql_res = fast_path_sparql("합성함수의 미분법이 뭐야?", label_index)
+    rows = execute_sparql(sparql_res["query"], full_graph, enrich=sparql_res["enrich"], use_cache=False)
+    assert [row["targetLabel"] for row in rows] == ["합성함수의 미분법"]
+
+def test_decomposed_hangul_question_takes_the_fast_path(label_index):
+    import unicodedata
+    question = unicodedata.normalize("NFD", "합성함수의 미분법 좀 알려줘")
+    matches = match_known_concepts(question, label_index)
+    assert [match.entries[0].label for match in matches] == ["합성함수의 미분법"]
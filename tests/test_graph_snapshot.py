@@ -0,0 +1,53 @@
+import pytest
+
+import graph_snapshot
+from graph_loader import load_graph
+from graph_snapshot import SNAPSHOT_MAGIC, load_snapshot, write_snapshot
+
+TURTLE = """@prefix : <http://snu.ac.kr/math/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+
+:정적분 a :Concept ; rdfs:label "정적분" .
+:미분 a :Concept ; rdfs:label "미분" ; :prerequisiteOf :정적분 .
+"""
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    path = tmp_path / "mini.ttl"
+    path.write_text(TURTLE, encoding="utf-8")
+    return str(path)
+
+def _snapshot_bytes(source):
+    import rdflib
+    graph = rdflib.Graph()
+    graph.parse(source, format="turtle")
+    with open(write_snapshot(graph, source), "rb") as f:
+        return f.read()
+
+def test_fresh_snapshot_loads(source):
+    _snapshot_bytes(source)
+    graph = load_snapshot(source)
+    assert graph is not None and len(graph) == 5
+
+CORRUPTIONS = {
+    "truncated_payload": lambda data: data[:-20],
+    "payload_only_header": lambda data: data[:data.index(b"\n", len(SNAPSHOT_MAGIC)) + 1],
+    "header_without_newline": lambda data: data[:len(SNAPSHOT_MAGIC) + 10],
+    "header_not_json": lambda data: SNAPSHOT_MAGIC + b"{not json\n" + data[data.index(b"\n", len(SNAPSHOT_MAGIC)) + 1:],
+    "header_not_utf8": lambda data: SNAPSHOT_MAGIC + b"\xff\xfe\n" + data[data.index(b"\n", len(SNAPSHOT_MAGIC)) + 1:],
+    "header_not_object": lambda data: SNAPSHOT_MAGIC + b"[1, 2]\n" + data[data.index(b"\n", len(SNAPSHOT_MAGIC)) + 1:],
+    "payload_garbage": lambda data: data[:data.index(b"\n", len(SNAPSHOT_MAGIC)) + 1] + b"\x80\x05garbage",
+    "magic_only": lambda data: SNAPSHOT_MAGIC,
+    "empty": lambda data: b"",
+}
+
+@pytest.mark.parametrize("corruption", sorted(CORRUPTIONS))
+def test_corrupt_snapshot_falls_back_to_turtle(source, corruption):
+    data = CORRUPTIONS[corruption](_snapshot_bytes(source))
+    with open(graph_snapshot.snapshot_path_for(source), "wb") as f:
+        f.write(data)
+
+    assert load_snapshot(source) is None
+    graph = load_graph(source)
+    assert graph is not None and len(graph) == 5
@@ -0,0 +1,110 @@
+import subprocess
+import sys
+
+import rdflib
+import pytest
+
+from conftest import ABOX_PATH, TBOX_PATH, MATH_PREFIXES, PROJECT_ROOT
+
+from graph_loader import graph_version, load_graph, union_view, get_label_index, get_hierarchy_table
+from reasoning_engine import execute_sparql, sparql_result_cache
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+CONCEPT_QUERY = MATH_PREFIXES + """
+    SELECT ?label WHERE { ?c a :Concept ; rdfs:label ?label . FILTER(regex(?label, '^테스트')) }"""
+
+@pytest.fixture
+def graphs():
+    """
+    Fresh ABox/TBox per test (these tests write to them).
+    """
+    abox, tbox = load_graph(ABOX_PATH, use_snapshot=False), load_graph(TBOX_PATH, use_snapshot=False)
+    return abox, tbox, union_view(abox, tbox)
+
+def test_version_is_stable_across_processes(graphs):
+    abox, _, _ = graphs
+    script = (
+        "import sys; sys.path.insert(0, 'app'); "
+        "from graph_loader import load_graph, graph_version; "
+        f"print(graph_version(load_graph({ABOX_PATH!r}, use_snapshot=False)))"
+    )
+    output = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == graph_version(abox)
+
+@pytest.mark.parametrize("write", ["add", "remove", "set", "iadd", "parse", "update"])
+def test_every_write_path_changes_the_version(graphs, write):
+    abox, _, view = graphs
+    before, view_before = graph_version(abox), graph_version(view)
+    concept = next(abox.subjects(rdflib.RDF.type, NS.Concept))
+
+    if write == "add":
+        abox.add((NS.테스트개념, rdflib.RDFS.label, rdflib.Literal("테스트개념")))
+    elif write == "remove":
+        abox.remove((concept, rdflib.RDFS.label, None))
+    elif write == "set":
+        abox.set((concept, rdflib.RDFS.label, rdflib.Literal("바뀐 이름")))
+    elif write == "iadd":
+        extra = rdflib.Graph()
+        extra.add((NS.테스트개념, rdflib.RDF.type, NS.Concept))
+        abox += extra
+    elif write == "parse":
+        abox.parse(data="<http://snu.ac.kr/math/테스트개념> a <http://snu.ac.kr/math/Concept> .", format="turtle")
+    else:
+        abox.update("INSERT DATA { <http://snu.ac.kr/math/테스트개념> a <http://snu.ac.kr/math/Concept> }")
+
+    assert graph_version(abox) != before
+    assert graph_version(view) != view_before
+
+def test_mutation_makes_next_query_miss_the_cache(graphs):
+    abox, _, view = graphs
+    assert execute_sparql(CONCEPT_QUERY, view) == []
+    hits = sparql_result_cache.hits
+    assert execute_sparql(CONCEPT_QUERY, view) == []
+    assert sparql_result_cache.hits == hits + 1
+
+    abox.add((NS.테스트개념, rdflib.RDF.type, NS.Concept))
+    abox.add((NS.테스트개념, rdflib.RDFS.label, rdflib.Literal("테스트개념")))
+    misses = sparql_result_cache.misses
+    assert execute_sparql(CONCEPT_QUERY, view) == [{"label": "테스트개념"}]
+    assert sparql_result_cache.misses == misses + 1
+
+def test_label_index_follows_mutations(graphs):
+    abox, _, view = graphs
+    assert not get_label_index(view).exact("테스트개념")
+    abox.add((NS.테스트개념, rdflib.RDFS.label, rdflib.Literal("테스트개념")))
+    assert get_label_index(view).exact("테스트개념")
+
+def test_hierarchy_table_follows_mutations(graphs):
+    abox, _, view = graphs
+    section = next(abox.subjects(rdflib.RDF.type, NS.Section))
+    assert get_hierarchy_table(view).lookup(NS.테스트개념) is None
+    abox.add((NS.테스트개념, rdflib.RDF.type, NS.Concept))
+    abox.add((NS.테스트개념, rdflib.RDFS.label, rdflib.Literal("테스트개념")))
+    abox.add((section, NS.hasConcept, NS.테스트개념))
+    hierarchy = get_hierarchy_table(view).lookup(NS.테스트개념)
+    assert hierarchy["Concept"] == "테스트개념"
+    assert hierarchy["Section"] == get_hierarchy_table(view).ancestor_label(section, "Section")
+
+def test_graph_engine_and_prerequisite_index_follow_mutations(graphs):
+    from graph_engine import get_graph_engine
+    from prerequisite_index import get_prerequisite_index
+    abox, _, view = graphs
+    engine, index = get_graph_engine(view), get_prerequisite_index(view)
+    sections = [uri for uri in engine.uris if engine.node_type(engine.node_id(uri)) == "Section"]
+    a, b = next(
+        (a, b) for a in sections for b in sections
+        if a != b and not index.is_prerequisite(engine.node_id(a), engine.node_id(b))
+        and not index.is_prerequisite(engine.node_id(b), engine.node_id(a))
+    )
+
+    # In-memory edges do not write triples: the memoized engine and index stay
+    index.add_prerequisite(engine.node_id(a), engine.node_id(b))
+    assert get_graph_engine(view) is engine and get_prerequisite_index(view) is index
+
+    abox.add((NS.테스트개념, rdflib.RDF.type, NS.Concept))
+    abox.add((b, NS.prerequisiteOf, a))
+    engine, index = get_graph_engine(view), get_prerequisite_index(view)
+    assert engine.node_id(NS.테스트개념) >= 0
+    assert index.engine is engine
+    assert index.is_prerequisite(engine.node_id(b), engine.node_id(a))
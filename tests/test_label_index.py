@@ -0,0 +1,83 @@
+import random
+import unicodedata
+
+import pytest
+from rdflib import URIRef
+
+from graph_loader import AhoCorasick, LabelIndex, LabelEntry
+
+CONCEPT = URIRef("http://snu.ac.kr/math/Concept")
+SECTION = URIRef("http://snu.ac.kr/math/Section")
+
+def _index(*labels, types=(CONCEPT,)):
+    return LabelIndex([LabelEntry(label, URIRef(f"http://snu.ac.kr/math/L{i}"), frozenset(types), label) for i, label in enumerate(labels)])
+
+def _scan(index, text, **kwargs):
+    folded = unicodedata.normalize("NFC", text).casefold()
+    return [folded[m.start:m.end] for m in index.scan(text, **kwargs)]
+
+def _naive(patterns, text):
+    return sorted((i, i + len(p), p) for p in patterns for i in range(len(text)) if text.startswith(p, i))
+
+@pytest.mark.parametrize("patterns, text", [
+    (["he", "she", "his", "hers"], "ushers"),
+    (["a", "aa", "aaa"], "aaaa"),
+    (["미분", "분법", "미분법", "합성함수의 미분법", "함수"], "합성함수의 미분법과 미분"),
+    (["수열", "열의", "수열의 극한", "극한"], "수열의 극한과 급수의 극한"),
+])
+def test_aho_corasick_finds_every_occurrence(patterns, text):
+    assert sorted(AhoCorasick(patterns).find_all(text)) == _naive(patterns, text)
+
+def test_aho_corasick_matches_naive_search_on_random_hangul():
+    rng = random.Random(7)
+    alphabet = "미분적함수의 "
+    for _ in range(200):
+        patterns = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(8)}
+        text = "".join(rng.choice(alphabet) for _ in range(30))
+        assert sorted(AhoCorasick(patterns).find_all(text)) == _naive(patterns, text)
+
+def test_scan_prefers_longest_match():
+    index = _index("합성함수", "미분", "합성함수의 미분")
+    assert _scan(index, "합성함수의 미분이 뭐야?") == ["합성함수의 미분"]
+
+def test_scan_prefers_leftmost_match_over_longer_overlap():
+    index = _index("함수의 극한", "극한과 연속", "연속")
+    assert _scan(index, "함수의 극한과 연속") == ["함수의 극한", "연속"]
+
+def test_scan_returns_non_overlapping_matches_in_text_order():
+    index = _index("정적분", "적분", "부정적분", "넓이")
+    matches = index.scan("부정적분과 정적분으로 넓이 구하기")
+    assert [(m.start, m.end) for m in matches] == [(0, 4), (6, 9), (12, 14)]
+
+def test_scan_skips_matches_of_other_types_for_shorter_ones():
+    index = LabelIndex([
+        LabelEntry("미분법", URIRef("http://snu.ac.kr/math/Chap"), frozenset([URIRef("http://snu.ac.kr/math/Chapter")]), "미분법"),
+        LabelEntry("미분", URIRef("http://snu.ac.kr/math/Con"), frozenset([CONCEPT]), "미분"),
+    ])
+    assert _scan(index, "미분법", types=[CONCEPT]) == ["미분"]
+    assert _scan(index, "미분법") == ["미분법"]
+
+def test_scan_min_length():
+    index = _index("수", "수열")
+    assert _scan(index, "수 수열", min_length=2) == ["수열"]
+
+def test_scan_is_case_insensitive():
+    index = _index("Taylor 급수")
+    assert _scan(index, "taylor 급수가 뭐야") == ["taylor 급수"]
+
+def test_scan_matches_whole_hangul_syllables_only():
+    # "수" must not match the first part of "숫" (or "부" inside "분")
+    index = _index("수", "부")
+    assert _scan(index, "숫자 분수") == ["수"]
+
+@pytest.mark.parametrize("form", ["NFD", "NFKD"])
+def test_scan_decomposed_hangul_input(form):
+    # macOS and some IMEs deliver decomposed jamo (NFD)
+    index = _index("정적분", "분수")
+    question = unicodedata.normalize(form, "정적분이랑 분수")
+    assert _scan(index, question) == ["정적분", "분수"]
+    assert _scan(_index(unicodedata.normalize("NFD", "정적분")), "정적분") == ["정적분"]
+
+def test_scan_decomposed_input_keeps_syllable_boundaries():
+    index = _index("수")
+    assert _scan(index, unicodedata.normalize("NFD", "숫자")) == []
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import latency_stats
+import main
+from latency_stats import LatencyBudget, LatencyStats
+from llm_provider import StubProvider, get_provider
+from reasoning_engine import ANSWER_STAGE, SPARQL_STAGE, build_graph_only_answer
+
+# Misses the fast path (names no concept exactly) but has a local subgraph
+FALLBACK_QUESTION = "극한값 계산하는 법"
+
+def test_budget_shares_and_remaining_time(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(latency_stats, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    budget = LatencyBudget(10.0, {"sparql_llm": 0.4})
+    assert budget.stage("sparql_llm") == pytest.approx(4.0)
+    assert budget.stage("answer") == pytest.approx(10.0) # No share: whatever is left
+    clock.now += 8.0
+    assert budget.stage("sparql_llm") == pytest.approx(2.0) # Capped by the time left
+    clock.now += 5.0
+    assert budget.remaining() == 0.0 and budget.stage("answer") == 0.0
+
+class SlowFirstStub(StubProvider):
+    """
+    Stub whose first call takes `first_latency` seconds and later calls `latency`.
+    """
+
+    def __init__(self, first_latency, latency):
+        super().__init__(latency=latency, jitter=0.0, responses_path="")
+        self.first_latency = first_latency
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def delay(self, prompt):
+        with self._calls_lock:
+            self.calls += 1
+            return self.first_latency if self.calls == 1 else self.latency
+
+def _hedged_call(monkeypatch, provider, hedge_after, timeout=5.0):
+    monkeypatch.setattr(main, "hedge_delay", lambda stage: hedge_after)
+    timeouts = []
+
+    def call(prompt, timeout=None):
+        timeouts.append(timeout)
+        return provider.generate(prompt, stage="test", timeout=timeout).text
+
+    before = dict(main.pipeline_events)
+    start = time.monotonic()
+    result = asyncio.run(main.call_llm("test", timeout, call, "### User Question\n정적분"))
+    events = {key: main.pipeline_events[key] - before.get(key, 0) for key in ("hedged.test", "hedge_won.test")}
+    return result, time.monotonic() - start, events, timeouts
+
+def test_hedge_fires_and_the_faster_call_wins(monkeypatch):
+    provider = SlowFirstStub(first_latency=1.5, latency=0.05)
+    result, elapsed, events, timeouts = _hedged_call(monkeypatch, provider, hedge_after=0.1)
+    assert elapsed < 1.0
+    assert provider.calls == 2
+    assert events == {"hedged.test": 1, "hedge_won.test": 1}
+    grace = main.LLM_TIMEOUT_GRACE_SECONDS
+    assert timeouts[0] == 5.0 + grace and timeouts[1] == pytest.approx(4.9 + grace)
+    assert result == provider.respond("### User Question\n정적분")
+
+def test_first_call_wins_when_it_finishes_before_the_hedge(monkeypatch):
+    provider = SlowFirstStub(first_latency=0.2, latency=1.5)
+    _, elapsed, events, _ = _hedged_call(monkeypatch, provider, hedge_after=0.1)
+    assert elapsed < 1.0
+    assert events == {"hedged.test": 1, "hedge_won.test": 0}
+
+def test_no_hedge_before_the_delay(monkeypatch):
+    provider = SlowFirstStub(first_latency=0.05, latency=0.05)
+    _, _, events, _ = _hedged_call(monkeypatch, provider, hedge_after=0.5)
+    assert provider.calls == 1
+    assert events == {"hedged.test": 0, "hedge_won.test": 0}
+
+def test_hedge_delay_uses_the_stage_percentile(monkeypatch):
+    monkeypatch.setattr(main, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(main, "LLM_HEDGE_MIN_SAMPLES", 20)
+    monkeypatch.setattr(main, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.5)
+    monkeypatch.setattr(main, "llm_latency", LatencyStats())
+    for i in range(19):
+        main.llm_latency.record("answer", 1.0 + i * 0.1)
+    assert main.hedge_delay("answer") is None # Not enough samples yet
+    main.llm_latency.record("answer", 3.0)
+    assert main.hedge_delay("answer") == pytest.approx(3.0)
+    for _ in range(100):
+        main.llm_latency.record("fast", 0.1)
+    assert main.hedge_delay("fast") == 0.5 # Never earlier than the minimum delay
+
+def test_call_llm_times_out_at_the_budget(monkeypatch):
+    provider = StubProvider(latency=2.0, jitter=0.0, responses_path="")
+    monkeypatch.setattr(main, "hedge_delay", lambda stage: None)
+
+    def call(prompt, timeout=None):
+        return provider.generate(prompt, stage="test", timeout=timeout)
+
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main.call_llm("test", 0.2, call, "### User Question\n정적분"))
+    assert time.monotonic() - start < 1.0
+
+def test_slow_llm_falls_back_to_graph_only_within_the_budget(monkeypatch):
+    for stage in (SPARQL_STAGE, ANSWER_STAGE):
+        monkeypatch.setattr(get_provider(stage), "latency", 2.0)
+    monkeypatch.setattr(main, "CHAT_BUDGET_SECONDS", 0.6)
+    monkeypatch.setattr(main, "hedge_delay", lambda stage: None)
+    provider = get_provider(ANSWER_STAGE)
+    inflight = provider._slots._value
+
+    start = time.monotonic()
+    response = asyncio.run(main.run_chat_pipeline(FALLBACK_QUESTION, "two_call"))
+    assert time.monotonic() - start < 1.5
+    assert response["route"] == "retrieval_fallback"
+    assert response["degraded"] is True
+    assert response["evidence"]
+    assert response["answer"].startswith("지금은 답변 생성이 지연되어")
+
+    # The abandoned LLM calls end at their deadline (+ grace) instead of the stub's 2s latency
+    end = time.monotonic() + 1.0
+    while provider._slots._value != inflight and time.monotonic() < end:
+        time.sleep(0.02)
+    assert provider._slots._value == inflight
+
+def test_graph_only_answer_lists_concepts_and_prerequisites():
+    rows = [
+        {"Label": "정적분", "Subject": "수학II", "Chapter": "적분", "Prerequisites": "부정적분, 극한"},
+        {"Label": "정적분", "Subject": "수학II", "Chapter": "적분"},
+        {"Label": "넓이", "relation": "정적분의 활용"},
+    ]
+    answer = build_graph_only_answer(rows, "OUT_OF_CURRICULUM")
+    assert answer["degraded"] is True
+    assert [item["concept"] for item in answer["evidence"]] == ["정적분", "넓이"]
+    assert answer["evidence"][1] == {"subject": "Unknown", "chapter": "Unknown", "concept": "넓이", "desc": "정적분의 활용"}
+    assert "정적분(수학II > 적분)" in answer["answer"]
+    assert "부정적분, 극한" in answer["answer"]
+    assert "교육과정 외" in answer["answer"]
@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from graph_engine import get_graph_engine
+from learning_path import resolve_unit
+from prerequisite_index import get_prerequisite_index
+
+TARGET = "합성함수의 미분법"
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+def _node_ids(labels):
+    engine = get_graph_engine(main.full_graph)
+    return [resolve_unit(engine, label) for label in labels]
+
+def _concepts(response):
+    assert response.status_code == 200
+    return [item["concept"] for item in response.json()["evidence"]]
+
+@pytest.mark.parametrize("body", [
+    {"target": "없는개념"},
+    {"target": TARGET, "source": "없는개념"},
+    {"target": TARGET, "known": ["없는개념"]},
+])
+def test_unknown_unit_is_a_404(client, body):
+    response = client.post("/path", json=body)
+    assert response.status_code == 404
+    assert "없는개념" in response.json()["detail"]
+
+def test_plan_lists_prerequisites_before_their_dependents(client):
+    response = client.post("/path", json={"target": TARGET})
+    concepts = _concepts(response)
+    assert response.json()["mode"] == "plan"
+    assert concepts[-1] == TARGET and len(concepts) > 2
+    index = get_prerequisite_index(main.full_graph)
+    nodes = _node_ids(concepts)
+    for i, later in enumerate(nodes):
+        for earlier in nodes[i + 1:]:
+            assert not index.is_prerequisite(earlier, later)
+
+def test_plan_skips_known_units_and_their_prerequisites(client):
+    full = _concepts(client.post("/path", json={"target": TARGET}))
+    known = full[len(full) // 2]
+    plan = _concepts(client.post("/path", json={"target": TARGET, "known": [known]}))
+    assert plan[-1] == TARGET
+    assert known not in plan
+    index = get_prerequisite_index(main.full_graph)
+    known_id = _node_ids([known])[0]
+    assert not any(index.is_prerequisite(node, known_id) for node in _node_ids(plan))
+
+def test_chain_runs_from_source_to_target_along_direct_prerequisites(client):
+    response = client.post("/path", json={"target": TARGET, "source": "함수의 극한"})
+    concepts = _concepts(response)
+    assert response.json()["mode"] == "chain"
+    assert concepts == ["함수의 극한", "함수의 연속", "미분계수와 도함수", TARGET]
+    assert [item["desc"] for item in response.json()["evidence"]] == ["출발", "1단계", "2단계", "3단계"]
+    index = get_prerequisite_index(main.full_graph)
+    nodes = _node_ids(concepts)
+    for a, b in zip(nodes, nodes[1:]):
+        assert b in index.direct_dependents(a)
+
+def test_chain_against_the_prerequisite_order_is_empty(client):
+    response = client.post("/path", json={"target": "함수의 극한", "source": TARGET})
+    assert response.json()["mode"] == "chain"
+    assert _concepts(response) == []
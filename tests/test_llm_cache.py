@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache as llm_cache_module
+import reasoning_engine
+from llm_cache import LLMCache, normalize_question
+from llm_provider import get_provider
+from reasoning_engine import ANSWER_STAGE, SPARQL_STAGE, answer_cache_key, generate_answer, generate_sparql
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache_module, "time", SimpleNamespace(time=clock))
+    return clock
+
+def test_values_survive_a_reopen(tmp_path, clock):
+    path = str(tmp_path / "cache" / "llm.sqlite3")
+    LLMCache(path).set("sparql", "k", {"query": "SELECT ?s WHERE { ?s ?p ?o }", "explanation": "설명"})
+    cache = LLMCache(path)
+    assert cache.get("sparql", "k") == {"query": "SELECT ?s WHERE { ?s ?p ?o }", "explanation": "설명"}
+    assert cache.get("sparql", "other") is None
+    assert cache.stats()["namespaces"]["sparql"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=60)
+    cache.set("answer", "old", {"answer": "a"})
+    clock.now += 59
+    assert cache.get("answer", "old") == {"answer": "a"}
+    clock.now += 2 # Expiry counts from creation, not from the last hit
+    assert cache.get("answer", "old") is None
+    assert cache.stats()["entries"] == 0
+
+def test_set_purges_expired_entries(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=60)
+    cache.set("answer", "old", 1)
+    clock.now += 61
+    cache.set("answer", "new", 2)
+    assert cache.stats()["entries"] == 1
+
+def test_zero_ttl_never_expires(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=0)
+    cache.set("answer", "k", 1)
+    clock.now += 10 * 365 * 24 * 3600
+    assert cache.get("answer", "k") == 1
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), max_entries=2)
+    cache.set("sparql", "a", 1)
+    clock.now += 1
+    cache.set("sparql", "b", 2)
+    clock.now += 1
+    assert cache.get("sparql", "a") == 1 # "a" is now more recent than "b"
+    clock.now += 1
+    cache.set("sparql", "c", 3)
+    assert cache.get("sparql", "b") is None
+    assert cache.get("sparql", "a") == 1 and cache.get("sparql", "c") == 3
+    assert cache.stats()["entries"] == 2
+
+def test_question_normalization():
+    assert normalize_question("  정적분이   뭐야?! ") == normalize_question("정적분이 뭐야")
+    assert normalize_question("ＴＡＹＬＯＲ 급수") == "taylor 급수" # NFKC + lower-case
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    monkeypatch.setattr(reasoning_engine, "llm_cache", cache)
+    return cache
+
+def _llm_calls(stage):
+    return get_provider(stage).usage_stats()["calls"]
+
+def test_generate_sparql_is_keyed_on_the_prompt_template(cache):
+    first = "### Schema\n{schema_info}\n### User Question\n{question}"
+    second = "Schema: {schema_info}\n### User Question\n{question}"
+    calls = _llm_calls(SPARQL_STAGE)
+
+    result = generate_sparql("정적분이 뭐야?", "schema", prompt_template=first)
+    assert generate_sparql("정적분이  뭐야", "schema", prompt_template=first) == result
+    assert _llm_calls(SPARQL_STAGE) == calls + 1
+    generate_sparql("정적분이 뭐야?", "schema", prompt_template=second)
+    generate_sparql("정적분이 뭐야?", "other schema", prompt_template=first)
+    assert _llm_calls(SPARQL_STAGE) == calls + 3
+    assert cache.stats()["namespaces"]["sparql"] == {"hits": 1, "misses": 3, "hit_rate": 0.25}
+
+def test_generate_answer_is_keyed_on_the_prompt_template_and_rows(cache):
+    template = "### User Question\n{question}\n### Retrieved Knowledge\n{data_summary}\n{sparql_explanation}"
+    rows = [{"Label": "정적분"}]
+    calls = _llm_calls(ANSWER_STAGE)
+
+    result = generate_answer("정적분이 뭐야?", rows, "", prompt_template=template)
+    assert generate_answer("정적분이 뭐야", rows, "", prompt_template=template) == result
+    assert _llm_calls(ANSWER_STAGE) == calls + 1
+    generate_answer("정적분이 뭐야?", rows, "", prompt_template=template + "\n")
+    generate_answer("정적분이 뭐야?", [{"Label": "부정적분"}], "", prompt_template=template)
+    assert _llm_calls(ANSWER_STAGE) == calls + 3
+
+    key = answer_cache_key("q", rows, "", template, "stub")
+    assert key != answer_cache_key("q", rows, "", template + "\n", "stub")
+    assert key != answer_cache_key("q", rows, "", template, "other-model")
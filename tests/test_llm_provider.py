@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import llm_provider
+from llm_provider import GeminiProvider
+
+class FakeGeminiClient:
+    """
+    generate_content_async stand-in that records how many calls overlap.
+    """
+
+    def __init__(self):
+        self.inflight = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt):
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.inflight -= 1
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.request_options = request_options
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+@pytest.fixture
+def gemini(monkeypatch):
+    pytest.importorskip("google.generativeai")
+    monkeypatch.setattr(llm_provider, "load_google_api_key", lambda: "test-key")
+    provider = GeminiProvider("gemini-test", max_inflight=2)
+    provider._client = FakeGeminiClient()
+    return provider
+
+def test_agenerate_holds_a_provider_slot(gemini):
+    async def run():
+        return await asyncio.gather(*(gemini.agenerate("prompt", stage="test") for _ in range(6)))
+
+    responses = asyncio.run(run())
+    assert [r.text for r in responses] == ["{}"] * 6
+    assert gemini._client.peak == 2
+    assert gemini._slots._value == 2
+
+def test_cancelled_agenerate_gives_its_slot_back(gemini):
+    async def run():
+        first = asyncio.gather(*(gemini.agenerate("prompt") for _ in range(2)))
+        await asyncio.sleep(0.01)
+        waiting = asyncio.create_task(gemini.agenerate("prompt"))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await first
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert gemini._slots._value == 2
+
+@pytest.mark.parametrize("timeout, options", [(2.5, {"timeout": 2.5}), (None, None)])
+def test_generate_passes_the_request_timeout(gemini, timeout, options):
+    assert gemini.generate("prompt", stage="test", timeout=timeout).text == "{}"
+    assert gemini._client.request_options == options
+
+def test_provider_interface_is_abstract():
+    from llm_provider import LLMProvider
+
+    class NoBackend(LLMProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        LLMProvider("model")
+    with pytest.raises(TypeError):
+        NoBackend("model")
+
+def _stub(latency):
+    """
+    Stub with one slot whose sync streams stay referenced (so only an explicit
+    close, not garbage collection, releases the slot).
+    """
+    from llm_provider import StubProvider
+    provider = StubProvider(latency=latency, jitter=0.0, responses_path="", max_inflight=1)
+    stream, provider.streams = provider.stream, []
+
+    def kept_stream(*args, **kwargs):
+        provider.streams.append(stream(*args, **kwargs))
+        return provider.streams[-1]
+
+    provider.stream = kept_stream
+    return provider
+
+ANSWER_PROMPT = "### User Question\n정적분\n    ### Retrieved Knowledge\n정적분"
+
+def test_astream_closed_early_frees_its_slot():
+    from contextlib import aclosing
+    provider = _stub(1.0)
+
+    async def run():
+        async with aclosing(provider.astream(ANSWER_PROMPT, stage="test")) as chunks:
+            async for _ in chunks:
+                break
+        return provider._slots._value
+
+    assert asyncio.run(run()) == 1
+
+def test_cancelled_astream_closes_after_the_pending_chunk():
+    import time
+    provider = _stub(2.0) # First chunk after 1s, the whole stream 2s
+
+    async def consume():
+        async for _ in provider.astream(ANSWER_PROMPT, stage="test"):
+            pass
+
+    async def run():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    asyncio.run(run())
+    while provider._slots._value != 1 and time.monotonic() - start < 3:
+        time.sleep(0.02)
+    assert provider._slots._value == 1
+    assert time.monotonic() - start < 1.5
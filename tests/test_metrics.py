@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+from metrics import Registry
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+def _family(text, name):
+    """
+    Lines of one metric family: its HELP and TYPE lines and the samples after them.
+    """
+    lines = text.splitlines()
+    start = lines.index(next(line for line in lines if line.startswith(f"# HELP {name} ")))
+    end = next((i for i in range(start + 2, len(lines)) if lines[i].startswith("# HELP ")), len(lines))
+    return lines[start:end]
+
+def test_counter_exposition(registry):
+    counter = registry.counter("app_cache_lookups", "Lookups per cache and result.", ("cache", "result"))
+    counter.inc(cache="llm", result="miss")
+    counter.inc(2, cache="llm", result="hit")
+    text = registry.render()
+    assert text.endswith("\n")
+    assert _family(text, "app_cache_lookups") == [
+        "# HELP app_cache_lookups Lookups per cache and result.",
+        "# TYPE app_cache_lookups counter",
+        'app_cache_lookups_total{cache="llm",result="hit"} 2',
+        'app_cache_lookups_total{cache="llm",result="miss"} 1',
+    ]
+
+def test_label_values_are_escaped(registry):
+    counter = registry.counter("app_errors", "Errors.", ("error",))
+    counter.inc(error='bad "quote" \\ and\nnewline')
+    assert _family(registry.render(), "app_errors")[-1] == 'app_errors_total{error="bad \\"quote\\" \\\\ and\\nnewline"} 1'
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = registry.histogram("app_latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1, 0.5))
+    for value in (0.05, 0.1, 0.7, 3.0):
+        histogram.observe(value, stage="answer")
+    assert _family(registry.render(), "app_latency_seconds")[1:] == [
+        "# TYPE app_latency_seconds histogram",
+        'app_latency_seconds_bucket{stage="answer",le="0.1"} 2',
+        'app_latency_seconds_bucket{stage="answer",le="0.5"} 2',
+        'app_latency_seconds_bucket{stage="answer",le="1"} 3',
+        'app_latency_seconds_bucket{stage="answer",le="+Inf"} 4',
+        'app_latency_seconds_sum{stage="answer"} 3.85',
+        'app_latency_seconds_count{stage="answer"} 4',
+    ]
+
+def test_label_mismatch_and_duplicate_names_are_rejected(registry):
+    counter = registry.counter("app_requests", "Requests.", ("endpoint",))
+    with pytest.raises(ValueError):
+        counter.inc(route="llm")
+    with pytest.raises(ValueError):
+        registry.counter("app_requests", "Again.")
+
+def test_collectors_render_at_scrape_time_and_failures_are_skipped(registry):
+    pool = {"size": 2}
+
+    def broken():
+        raise RuntimeError("collector down")
+
+    registry.add_collector(broken)
+    registry.add_collector(lambda: [
+        ("app_pool_workers", "gauge", "Pool workers.", [({}, pool["size"])]),
+        ("app_pool_restarts", "counter", "Worker restarts.", [({"reason": "timeout"}, 1)]),
+    ])
+    pool["size"] = 3
+    text = registry.render()
+    assert _family(text, "app_pool_workers")[-1] == "app_pool_workers 3"
+    assert _family(text, "app_pool_restarts")[-1] == 'app_pool_restarts_total{reason="timeout"} 1'
+
+def test_metrics_endpoint():
+    response = TestClient(main.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    assert "# TYPE chatbot_stage_seconds histogram" in response.text
+    assert "# TYPE process_threads gauge" in response.text
@@ -0,0 +1,59 @@
+import os
+
+import rdflib
+import pytest
+
+import ngram_index
+from graph_loader import VersionedGraph, graph_version
+from ngram_index import NgramIndex, get_ngram_index, ngram_index_path
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+def _graph(*labels):
+    graph = VersionedGraph()
+    for label in labels:
+        node = NS[label]
+        graph.add((node, rdflib.RDF.type, NS.Concept))
+        graph.add((node, rdflib.RDFS.label, rdflib.Literal(label)))
+    return graph
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "ngram_index.npz")
+
+def _top_label(graph, question, path):
+    return get_ngram_index(graph, path=path, persist=True).search(question, k=1, min_score=0.0)[0]["label"]
+
+def test_index_file_is_keyed_on_the_graph_version(index_path):
+    first, second = _graph("정적분", "미분계수"), _graph("등비수열", "등차수열")
+    assert _top_label(first, "정적분", index_path) == "정적분"
+    # Same base path, different graph: its own file, not the first graph's index
+    assert _top_label(second, "등비수열", index_path) == "등비수열"
+    assert ngram_index_path(graph_version(first), index_path) != ngram_index_path(graph_version(second), index_path)
+    assert os.path.exists(ngram_index_path(graph_version(first), index_path))
+    assert os.path.exists(ngram_index_path(graph_version(second), index_path))
+    assert not os.path.exists(index_path)
+
+def test_saved_index_is_reused_for_the_same_graph(index_path, monkeypatch):
+    get_ngram_index(_graph("정적분", "미분계수"), path=index_path, persist=True)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("index rebuilt")
+
+    monkeypatch.setattr(ngram_index, "build_ngram_index", fail)
+    assert _top_label(_graph("정적분", "미분계수"), "미분계수", index_path) == "미분계수"
+
+def test_load_rejects_a_file_of_another_graph_version(index_path):
+    graph = _graph("정적분")
+    version = graph_version(graph)
+    get_ngram_index(graph, path=index_path, persist=True)
+    path = ngram_index_path(version, index_path)
+    assert NgramIndex.load(path, version=version).version == version
+    assert NgramIndex.load(path, version="0-0000000000000000") is None
+
+def test_graph_write_rebuilds_the_memoized_index(index_path):
+    graph = _graph("정적분")
+    assert get_ngram_index(graph, path=index_path, persist=False).labels == ["정적분"]
+    graph.add((NS["정적분"], rdflib.RDFS.label, rdflib.Literal("적분")))
+    graph.add((NS["급수"], rdflib.RDFS.label, rdflib.Literal("급수")))
+    assert sorted(get_ngram_index(graph, path=index_path, persist=False).labels) == ["급수", "정적분"]
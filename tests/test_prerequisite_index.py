@@ -0,0 +1,95 @@
+import rdflib
+import pytest
+
+from conftest import ABOX_PATH
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+@pytest.fixture(scope="module")
+def abox():
+    graph = rdflib.Graph()
+    graph.parse(ABOX_PATH, format="turtle")
+    return graph
+
+def _index(graph):
+    from graph_engine import compile_graph
+    from prerequisite_index import PrerequisiteIndex
+    return PrerequisiteIndex(compile_graph(graph))
+
+def _new_edges(abox):
+    """
+    Section pairs to link: one along the current topological order, one against
+    it, one already implied transitively and one closing a cycle.
+    """
+    index = _index(abox)
+    engine = index.engine
+    sections = [i for i in range(len(engine)) if engine.node_type(i) == "Section"]
+    linked = set(abox.subject_objects(NS.prerequisiteOf))
+
+    def pick(condition):
+        for a in sections:
+            for b in sections:
+                if a != b and (engine.uri(a), engine.uri(b)) not in linked and condition(a, b):
+                    return engine.uri(a), engine.uri(b)
+        pytest.skip("no such pair in the curriculum")
+
+    def unrelated(a, b):
+        return not index.is_prerequisite(a, b) and not index.is_prerequisite(b, a) and not set(index.containers(a)) & set(index.containers(b))
+
+    return {
+        "along_order": pick(lambda a, b: unrelated(a, b) and index.topological_key(a) < index.topological_key(b)),
+        "against_order": pick(lambda a, b: unrelated(a, b) and index.topological_key(a) > index.topological_key(b)),
+        "implied": pick(lambda a, b: index.is_prerequisite(a, b)),
+        "cycle": pick(lambda a, b: index.is_prerequisite(b, a)),
+    }
+
+def _assert_topological(index, plan):
+    position = {node: i for i, node in enumerate(plan)}
+    for node in plan:
+        for prerequisite in index.all_prerequisites(node):
+            if prerequisite in position and not index.is_prerequisite(node, prerequisite):
+                assert position[prerequisite] < position[node]
+
+@pytest.mark.parametrize("case", ["along_order", "against_order", "implied", "cycle"])
+def test_add_prerequisite_matches_rebuild(abox, case):
+    from learning_path import study_plan, shortest_chain
+
+    source, target = _new_edges(abox)[case]
+    incremental = _index(abox)
+    engine = incremental.engine
+    incremental.add_prerequisite(engine.node_id(source), engine.node_id(target))
+
+    updated = rdflib.Graph()
+    for triple in abox:
+        updated.add(triple)
+    updated.add((source, NS.prerequisiteOf, target))
+    rebuilt = _index(updated)
+
+    def uris(index, nodes):
+        return {str(index.engine.uri(i)) for i in nodes}
+
+    for uri in engine.uris:
+        a, b = engine.node_id(uri), rebuilt.engine.node_id(uri)
+        assert uris(incremental, incremental.all_prerequisites(a)) == uris(rebuilt, rebuilt.all_prerequisites(b))
+        assert uris(incremental, incremental.all_dependents(a)) == uris(rebuilt, rebuilt.all_dependents(b))
+        assert uris(incremental, incremental.direct_dependents(a)) == uris(rebuilt, rebuilt.direct_dependents(b))
+
+    for index in (incremental, rebuilt):
+        a, b = index.engine.node_id(source), index.engine.node_id(target)
+        assert index.is_prerequisite(a, b)
+        assert str(target) in uris(index, index.direct_dependents(a))
+        _assert_topological(index, study_plan(index, b))
+
+    a, b = engine.node_id(source), engine.node_id(target)
+    assert uris(incremental, study_plan(incremental, b)) == uris(rebuilt, study_plan(rebuilt, rebuilt.engine.node_id(target)))
+    chain = shortest_chain(incremental, a, b)
+    expected = shortest_chain(rebuilt, rebuilt.engine.node_id(source), rebuilt.engine.node_id(target))
+    assert chain == [a, b] and len(expected) == 2
+
+def test_add_prerequisite_twice_is_a_no_op(abox):
+    source, target = _new_edges(abox)["along_order"]
+    index = _index(abox)
+    a, b = index.engine.node_id(source), index.engine.node_id(target)
+    assert index.add_prerequisite(a, b)
+    assert not index.add_prerequisite(a, b)
+    assert index.direct_dependents(a).count(b) == 1
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+import prompt_encoder
+from llm_provider import estimate_tokens
+from prompt_encoder import LEGEND, PromptSizeStats, encode_rows, format_data_summary, split_row
+from reasoning_engine import build_answer_prompt
+
+def _rows(count):
+    return [{
+        "target": f"http://snu.ac.kr/math/Con_{i:04d}",
+        "targetLabel": f"개념{i}",
+        "targetSubject": f"과목{i % 3}",
+        "targetChapter": f"단원{i % 5}",
+        "targetDesc": "설명 " * (i % 7),
+    } for i in range(count)]
+
+@pytest.mark.parametrize("budget", [40, 60, 97, 150, 333, 600, 1200])
+def test_summary_stays_within_the_token_budget(budget):
+    rows = _rows(300)
+    summary, kept, omitted = encode_rows(rows, "", budget)
+    assert estimate_tokens(summary) <= budget
+    assert kept >= 1 and kept + omitted == 300
+    assert summary.splitlines()[-1] == f"(+{omitted} less relevant concepts omitted)"
+
+def test_everything_fits_without_an_omission_note():
+    summary, kept, omitted = encode_rows(_rows(4), "", 0)
+    assert (kept, omitted) == (4, 0)
+    assert "omitted" not in summary
+
+def test_top_concept_is_kept_even_over_budget():
+    summary, kept, omitted = encode_rows(_rows(3), "", 1)
+    assert kept == 1 and omitted == 2
+
+def test_duplicate_rows_collapse_into_one_line():
+    row = {"targetLabel": "정적분", "targetSubject": "수학II", "targetChapter": "적분", "prereqLabel": "부정적분"}
+    rows = [row, dict(row), {**row, "prereqLabel": "극한"}, dict(row)]
+    summary, kept, omitted = encode_rows(rows, "", 0)
+    assert (kept, omitted) == (1, 0)
+    assert summary.splitlines() == [LEGEND, "[수학II > 적분]", "- 정적분 (prereqLabel: 부정적분, 극한)"]
+
+def test_rows_are_grouped_by_subject_and_chapter():
+    rows = [
+        {"targetLabel": "정적분", "targetSubject": "수학II", "targetChapter": "적분"},
+        {"targetLabel": "미분계수", "targetSubject": "수학II", "targetChapter": "미분"},
+        {"targetLabel": "부정적분", "targetSubject": "수학II", "targetChapter": "적분"},
+        {"targetLabel": "집합"},
+    ]
+    summary, _, _ = encode_rows(rows, "", 0)
+    assert summary.splitlines()[1:] == [
+        "[수학II > 적분]", "- 정적분", "- 부정적분",
+        "[수학II > 미분]", "- 미분계수",
+        "[Unknown > Unknown]", "- 집합",
+    ]
+
+def test_ranking_prefers_named_concepts_then_fewer_hops():
+    rows = [
+        {"Label": "먼 개념", "hops": "3"},
+        {"Label": "가까운 개념", "hops": "1"},
+        {"Label": "정적분", "hops": "2"},
+    ]
+    summary, _, _ = encode_rows(rows, "정적분이 뭐야?", 0)
+    assert summary.splitlines()[2:] == ["- 정적분", "- 가까운 개념", "- 먼 개념"]
+    # Truncation drops from the end of the ranking
+    summary, kept, omitted = encode_rows(rows, "정적분이 뭐야?", 1)
+    assert summary.splitlines()[2:] == ["- 정적분", "(+2 less relevant concepts omitted)"]
+
+def test_split_row_drops_the_label_uri_and_shortens_uris():
+    label, subject, chapter, details = split_row({
+        "target": "http://snu.ac.kr/math/Con_0001",
+        "targetLabel": "정적분",
+        "targetSubject": "수학II",
+        "prereq": "http://snu.ac.kr/math/Con_0002",
+        "empty": "",
+    })
+    assert (label, subject, chapter) == ("정적분", "수학II", "Unknown")
+    assert details == [("prereq", "Con_0002")]
+
+def test_format_data_summary_formats():
+    rows = _rows(2)
+    assert format_data_summary([], "") == ("No data found.", 0, 0)
+    assert format_data_summary(rows, "", data_format="json") == (json.dumps(rows, ensure_ascii=False), 2, 0)
+    assert format_data_summary(rows, "", data_format="grouped")[0].startswith(LEGEND)
+
+def test_prompt_size_stats_accounting():
+    stats = PromptSizeStats()
+    stats.record(rows=10, kept=4, omitted=2, json_prompt_tokens=1000, prompt_tokens=400)
+    stats.record(rows=5, kept=5, omitted=0, json_prompt_tokens=200, prompt_tokens=200)
+    report = stats.stats()
+    assert {key: report[key] for key in ("prompts", "rows", "concepts_kept", "concepts_omitted", "saved_tokens", "saved_pct")} == {
+        "prompts": 2, "rows": 15, "concepts_kept": 9, "concepts_omitted": 2, "saved_tokens": 600, "saved_pct": 50.0,
+    }
+    assert PromptSizeStats().stats()["saved_pct"] == 0.0
+
+def test_answer_prompt_records_its_size(monkeypatch):
+    stats = PromptSizeStats()
+    monkeypatch.setattr("reasoning_engine.prompt_size_stats", stats)
+    rows = _rows(200)
+    prompt = build_answer_prompt("개념1이 뭐야?", rows, "")
+    report = stats.stats()
+    assert report["prompts"] == 1 and report["rows"] == 200
+    assert report["prompt_tokens"] == estimate_tokens(prompt)
+    assert report["concepts_kept"] + report["concepts_omitted"] == 200
+    assert 0 < report["prompt_tokens"] < report["json_prompt_tokens"]
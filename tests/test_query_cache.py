@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+from conftest import MATH_PREFIXES, plain_rows, app_rows
+
+from query_cache import PreparedQueryCache, parameterize_query
+from reasoning_engine import execute_sparql
+from sparql_pool import evaluate_query
+
+EXISTS_QUERIES = {
+    "not_exists": MATH_PREFIXES + """
+        SELECT ?c ?label WHERE {
+            ?c a :Concept ; rdfs:label ?label .
+            FILTER NOT EXISTS { ?c :prerequisiteOf ?next }
+        }""",
+    "exists": MATH_PREFIXES + """
+        SELECT ?c ?label WHERE {
+            ?c rdfs:label ?label .
+            FILTER EXISTS { ?c :prerequisiteOf ?next }
+        }""",
+    "exists_with_regex": MATH_PREFIXES + """
+        SELECT ?section ?label WHERE {
+            ?section a :Section ; rdfs:label ?label .
+            FILTER EXISTS { ?section :hasConcept ?c . ?c rdfs:label ?cl . FILTER(regex(?cl, '미분', 'i')) }
+        }""",
+    "nested_not_exists": MATH_PREFIXES + """
+        SELECT ?c WHERE {
+            ?c a :Concept .
+            FILTER NOT EXISTS { ?c :prerequisiteOf ?x . FILTER NOT EXISTS { ?x :prerequisiteOf ?y } }
+        }""",
+}
+
+@pytest.mark.parametrize("name", sorted(EXISTS_QUERIES))
+def test_exists_matches_plain_rdflib(name, full_graph, plain_graph):
+    query = EXISTS_QUERIES[name]
+    expected = plain_rows(plain_graph, query)
+    assert expected, "query should return rows on the current data"
+    # Twice: the second run uses the cached template (copied algebra)
+    for _ in range(2):
+        rows = execute_sparql(query, full_graph, use_cache=False)
+        assert app_rows(rows) == expected
+
+def test_exists_through_evaluate_query_with_rewriter(full_graph, plain_graph):
+    from graph_loader import get_label_index
+    query = EXISTS_QUERIES["exists_with_regex"]
+    cache = PreparedQueryCache()
+    for label_index in (None, get_label_index(full_graph)):
+        rows, _, _ = evaluate_query(full_graph, query, cache, label_index)
+        assert app_rows(rows) == plain_rows(plain_graph, query)
+
+def test_copied_algebra_is_private(full_graph):
+    cache = PreparedQueryCache()
+    first, _, _ = cache.prepare(EXISTS_QUERIES["exists"], full_graph)
+    second, _, _ = cache.prepare(EXISTS_QUERIES["exists"], full_graph)
+    assert cache.hits == 1
+    assert first.algebra is not second.algebra
+
+def test_concurrent_exists_queries(full_graph, plain_graph):
+    query = EXISTS_QUERIES["not_exists"]
+    expected = plain_rows(plain_graph, query)
+    failures = []
+
+    def run():
+        for _ in range(5):
+            if app_rows(execute_sparql(query, full_graph, use_cache=False)) != expected:
+                failures.append(True)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not failures
+
+def test_parameterize_query_extracts_regex_patterns():
+    template, bindings = parameterize_query("SELECT ?l WHERE { ?c rdfs:label ?l FILTER(regex(?l, '미분', 'i')) }")
+    assert "'미분'" not in template
+    assert [str(value) for value in bindings.values()] == ["미분"]
+
+def test_select_star_does_not_leak_pattern_variables(full_graph, plain_graph):
+    query = MATH_PREFIXES + "SELECT * WHERE { ?t a :Concept ; rdfs:label ?l FILTER(regex(?l, '미분계수', 'i')) }"
+    rows = execute_sparql(query, full_graph, use_cache=False)
+    assert rows
+    assert all(not key.startswith("__pattern") for row in rows for key in row)
+    assert app_rows(rows) == plain_rows(plain_graph, query)
+
+PATTERN_LITERALS = {
+    "lang_tag": "'수열'@ko",
+    "datatype_prefixed": "'수열'^^xsd:string",
+    "datatype_iri": "'수열'^^<http://www.w3.org/2001/XMLSchema#string>",
+    "long_double": '"""수열"""',
+    "long_single": "'''수열'''",
+    "long_with_quote": '"""수"열|수열"""',
+}
+
+@pytest.mark.parametrize("name", sorted(PATTERN_LITERALS))
+def test_pattern_literal_forms_match_plain_rdflib(name, full_graph, plain_graph):
+    literal = PATTERN_LITERALS[name]
+    query = MATH_PREFIXES + "PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n" \
+        f"SELECT ?c ?l WHERE {{ ?c rdfs:label ?l . FILTER(regex(?l, {literal})) }}"
+    expected = plain_rows(plain_graph, query)
+    assert expected, "query should return rows on the current data"
+    assert app_rows(execute_sparql(query, full_graph, use_cache=False)) == expected
+
+@pytest.mark.parametrize("literal, pattern", [('"""수열"""', "수열"), ("'''미\"분'''", '미"분')])
+def test_parameterize_query_strips_long_quotes(literal, pattern):
+    template, bindings = parameterize_query(f"SELECT ?l WHERE {{ ?c rdfs:label ?l FILTER(regex(?l, {literal})) }}")
+    assert literal not in template and '"' not in template and "'" not in template
+    assert [str(value) for value in bindings.values()] == [pattern]
+
+@pytest.mark.parametrize("literal", ["'수열'@ko", "'수열'^^xsd:string"])
+def test_parameterize_query_keeps_tagged_patterns_inline(literal):
+    template, bindings = parameterize_query(f"SELECT ?l WHERE {{ ?c rdfs:label ?l FILTER(regex(?l, {literal})) }}")
+    assert literal in template
+    assert not bindings
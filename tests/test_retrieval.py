@@ -0,0 +1,44 @@
+import pytest
+
+import retrieval
+from graph_engine import get_graph_engine
+from retrieval import RELATIONS, find_seed_nodes, retrieve_subgraph
+
+QUESTION = "합성함수의 미분법 알려줘"
+
+def _seed_labels(question, graph):
+    engine = get_graph_engine(graph)
+    return [engine.label(node) for node in find_seed_nodes(question, graph)]
+
+def test_seeds_are_the_labels_named_in_the_question(full_graph):
+    assert _seed_labels(QUESTION, full_graph) == ["합성함수의 미분법"]
+
+def test_seeds_fall_back_to_the_ngram_index(full_graph, monkeypatch):
+    # No label is long enough to match verbatim: only the n-gram index can find the concept
+    monkeypatch.setattr(retrieval, "RETRIEVAL_MIN_LABEL_CHARS", 100)
+    assert _seed_labels("합성함수미분법", full_graph)[0] == "합성함수의 미분법"
+    monkeypatch.setattr(retrieval, "RETRIEVAL_FUZZY_MIN_SCORE", 1.01)
+    assert _seed_labels("합성함수미분법", full_graph) == []
+
+def test_unknown_question_retrieves_nothing(full_graph):
+    assert retrieve_subgraph("오늘 날씨 어때?", full_graph) is None
+
+@pytest.mark.parametrize("hops", [0, 1, 2, 3])
+def test_subgraph_stays_within_the_hop_limit(full_graph, hops):
+    rows = retrieve_subgraph(QUESTION, full_graph, hops=hops, max_nodes=1000)["rows"]
+    assert rows[0]["targetLabel"] == "합성함수의 미분법" and rows[0]["relation"] == RELATIONS[0]
+    assert max(row["hops"] for row in rows) == hops
+    # Ranked by hop distance first
+    assert [row["hops"] for row in rows] == sorted(row["hops"] for row in rows)
+    if hops:
+        closer = retrieve_subgraph(QUESTION, full_graph, hops=hops - 1, max_nodes=1000)["rows"]
+        assert {row["targetLabel"] for row in closer} < {row["targetLabel"] for row in rows}
+
+def test_subgraph_rows_are_capped_and_classified(full_graph):
+    rows = retrieve_subgraph(QUESTION, full_graph, hops=2, max_nodes=3)["rows"]
+    assert len(rows) == 3
+    relations = {row["targetLabel"]: row["relation"] for row in retrieve_subgraph(QUESTION, full_graph, hops=2)["rows"]}
+    assert relations["여러 가지 미분법"] == "상위 단원"
+    assert relations["미분계수와 도함수"] == "선수 학습"
+    assert relations["도함수의 활용"] == "후속 학습"
+    assert all(row["targetSubject"] and row["targetChapter"] for row in rows)
@@ -0,0 +1,66 @@
+import pytest
+from rdflib.plugins.sparql import prepareQuery
+
+from conftest import MATH_PREFIXES, plain_rows
+
+from query_cache import PreparedQueryCache
+from sparql_guard import QueryRejected, analyze_query, apply_row_limit, check_query_cost
+from sparql_pool import evaluate_query
+
+def _prepared(where, modifiers=""):
+    return prepareQuery(MATH_PREFIXES + f"SELECT * WHERE {{ {where} }} {modifiers}")
+
+@pytest.mark.parametrize("where", [
+    "?a :prerequisiteOf+ ?b",
+    "?a :prerequisiteOf* ?b",
+    "?a (:hasChapter/:hasSection)+ ?b",
+    "?a ^:prerequisiteOf+ ?b",
+])
+def test_unanchored_unbounded_path_is_rejected(where):
+    with pytest.raises(QueryRejected, match="unbounded property path"):
+        check_query_cost(_prepared(where))
+
+@pytest.mark.parametrize("where", [
+    ":Con_0146 :prerequisiteOf+ ?b",
+    "?a :prerequisiteOf+ :Con_0146",
+    "?a a :Concept . ?a :prerequisiteOf+ ?b",
+    "?a :prerequisiteOf ?b",
+])
+def test_anchored_or_bounded_paths_pass(where):
+    assert check_query_cost(_prepared(where))["unbounded_paths"] == []
+
+def test_cross_products_over_the_limit_are_rejected():
+    where = "?a a :Subject . ?b a :Chapter . ?c a :Section . ?d a :Concept"
+    assert analyze_query(_prepared(where))["cross_products"] == 3
+    with pytest.raises(QueryRejected, match="3 cross products"):
+        check_query_cost(_prepared(where), max_cross_products=2)
+    check_query_cost(_prepared(where), max_cross_products=3)
+
+def test_row_limit_is_injected_when_missing():
+    query = _prepared("?c a :Concept")
+    assert analyze_query(query)["limit"] is None
+    assert apply_row_limit(query, 5)
+    assert analyze_query(query)["limit"] == 5
+
+@pytest.mark.parametrize("limit, expected, changed", [(1000, 5, True), (3, 3, False), (5, 5, False)])
+def test_existing_limit_is_lowered_only_when_larger(limit, expected, changed):
+    query = _prepared("?c a :Concept", f"LIMIT {limit}")
+    assert apply_row_limit(query, 5) == changed
+    assert analyze_query(query)["limit"] == expected
+
+def test_row_limit_ignores_ask_queries_and_zero():
+    ask = prepareQuery(MATH_PREFIXES + "ASK { ?c a :Concept }")
+    assert not apply_row_limit(ask, 5)
+    assert not apply_row_limit(_prepared("?c a :Concept"), 0)
+
+def test_evaluate_query_caps_rows(full_graph, plain_graph):
+    query = MATH_PREFIXES + "SELECT ?c WHERE { ?c a :Concept }"
+    assert len(plain_rows(plain_graph, query)) > 7
+    rows, _, _ = evaluate_query(full_graph, query, PreparedQueryCache(), max_rows=7)
+    assert len(rows) == 7
+    rows, _, _ = evaluate_query(full_graph, query + " LIMIT 3", PreparedQueryCache(), max_rows=7)
+    assert len(rows) == 3
+
+def test_evaluate_query_rejects_before_evaluating(full_graph):
+    with pytest.raises(QueryRejected):
+        evaluate_query(full_graph, MATH_PREFIXES + "SELECT * WHERE { ?a :prerequisiteOf+ ?b }", PreparedQueryCache())
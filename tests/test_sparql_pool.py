@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from conftest import ABOX_PATH, TBOX_PATH, MATH_PREFIXES, plain_rows, app_rows
+
+from sparql_guard import QueryRejected
+from sparql_pool import SparqlTimeout, SparqlWorkerPool
+
+# Three disconnected patterns (two cross products, allowed by the guard): ~10^9 rows without a LIMIT
+RUNAWAY_QUERY = "SELECT * WHERE { ?a ?p ?b . ?c ?q ?d . ?e ?r ?f }"
+
+@pytest.fixture(scope="module")
+def pool():
+    """
+    One real worker process (the suite itself runs with SPARQL_WORKERS=0).
+    """
+    pool = SparqlWorkerPool([ABOX_PATH, TBOX_PATH], workers=1, timeout=1.0, max_rows=50)
+    yield pool
+    pool.close()
+
+def test_worker_answers_like_plain_rdflib(pool, plain_graph):
+    query = MATH_PREFIXES + "SELECT ?c ?l WHERE { ?c a :Section ; rdfs:label ?l } LIMIT 1000"
+    rows, _, _ = pool.execute(query, max_rows=0)
+    assert app_rows(rows) == plain_rows(plain_graph, query)
+
+def test_worker_drops_bound_pattern_columns(pool, plain_graph):
+    query = MATH_PREFIXES + "SELECT * WHERE { ?c a :Concept ; rdfs:label ?l FILTER(regex(?l, '미분', 'i')) }"
+    rows, _, _ = pool.execute(query, max_rows=0)
+    assert rows and all(set(row) == {"c", "l"} for row in rows)
+    assert app_rows(rows) == plain_rows(plain_graph, query)
+
+def test_worker_applies_the_row_limit(pool):
+    rows, _, _ = pool.execute(MATH_PREFIXES + "SELECT ?c WHERE { ?c a :Concept }")
+    assert len(rows) == 50
+
+def test_worker_reports_rejected_queries(pool):
+    rejected = pool.stats()["rejected"]
+    with pytest.raises(QueryRejected):
+        pool.execute(MATH_PREFIXES + "SELECT * WHERE { ?a :prerequisiteOf+ ?b }")
+    assert pool.stats()["rejected"] == rejected + 1
+    # The worker stays in service
+    assert pool.execute(MATH_PREFIXES + "SELECT ?c WHERE { ?c a :Subject }", timeout=5)[0]
+
+def test_timeout_kills_the_worker_and_the_pool_serves_the_next_query(pool):
+    before = pool.stats()
+    pid = pool._idle.queue[0].process.pid
+    start = time.monotonic()
+    with pytest.raises(SparqlTimeout):
+        pool.execute(RUNAWAY_QUERY, timeout=0.5, max_rows=0)
+    assert time.monotonic() - start < 2.0
+
+    # The next query waits for the replacement worker (graph reload) instead of failing
+    rows, _, _ = pool.execute(MATH_PREFIXES + "SELECT ?c WHERE { ?c a :Subject }", timeout=60)
+    assert rows
+    stats = pool.stats()
+    assert stats["timeouts"] == before["timeouts"] + 1
+    assert stats["restarts"] == before["restarts"] + 1
+    assert stats["workers"] == 1
+    assert pool._idle.queue[0].process.pid != pid
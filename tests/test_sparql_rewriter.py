@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import MATH_PREFIXES, plain_rows, app_rows
+
+from query_cache import PreparedQueryCache
+from sparql_pool import evaluate_query
+from sparql_rewriter import rewrite_label_filters
+
+# name -> (WHERE clause, whether the regex filter is pushed down into VALUES)
+CASES = {
+    "substring": ("?c a :Concept ; rdfs:label ?l . FILTER(regex(?l, '미분'))", True),
+    "alternation": ("?c rdfs:label ?l . FILTER(regex(?l, '정적분|부정적분|없는개념'))", True),
+    "str_wrapped": ("?c a :Section ; rdfs:label ?l . FILTER(regex(str(?l), '함수'))", True),
+    "anchor_start": ("?c rdfs:label ?l . FILTER(regex(?l, '^정'))", True),
+    "anchor_end": ("?c rdfs:label ?l . FILTER(regex(?l, '분$'))", True),
+    "dot": ("?c rdfs:label ?l . FILTER(regex(?l, '미.법'))", True),
+    "group_alternation": ("?c rdfs:label ?l . FILTER(regex(?l, '(정|부정)적분'))", True),
+    "char_class": ("?c rdfs:label ?l . FILTER(regex(?l, '^[가-나]'))", True),
+    "quantifier": ("?c rdfs:label ?l . FILTER(regex(?l, '^수{1,2}열'))", True),
+    "escaped_caret": ("?c rdfs:label ?l . FILTER(regex(?l, 'x\\\\^3'))", True),
+    "escaped_arrow": ("?c rdfs:label ?l . FILTER(regex(?l, 'p-\\\\>q'))", True),
+    "unescaped_caret": ("?c rdfs:label ?l . FILTER(regex(?l, 'x^3'))", True),
+    "ignore_case": ("?c rdfs:label ?l . FILTER(regex(?l, 'SUBJECT|section', 'i'))", True),
+    "ignore_case_mixed": ("?c rdfs:label ?l . FILTER(regex(?l, 'I의|P->Q', 'i'))", True),
+    "case_sensitive_miss": ("?c rdfs:label ?l . FILTER(regex(?l, 'SUBJECT'))", True),
+    "multiline_flag": ("?c rdfs:label ?l . FILTER(regex(?l, '^함수$', 'm'))", True),
+    "dotall_flag": ("?c rdfs:label ?l . FILTER(regex(?l, '합성.*미분', 's'))", True),
+    "no_match": ("?c rdfs:label ?l . FILTER(regex(?l, '존재하지않는라벨'))", True),
+    "bound_subject": (":Con_0146 rdfs:label ?l . FILTER(regex(?l, '적분'))", True),
+    "with_other_conjunct": ("?c a :Concept ; rdfs:label ?l . FILTER(regex(?l, '함수') && ?c != :Con_0055)", True),
+    "two_regexes": ("?s :hasConcept ?c . ?s rdfs:label ?sl . ?c rdfs:label ?cl . FILTER(regex(?sl, '미분') && regex(?cl, '법'))", True),
+    "optional_left": ("?s a :Section ; rdfs:label ?sl . OPTIONAL { ?s :hasConcept ?c . ?c rdfs:label ?cl } FILTER(regex(?sl, '적분'))", True),
+    "optional_right": ("?s a :Section ; rdfs:label ?sl . OPTIONAL { ?s :hasConcept ?c . ?c rdfs:label ?cl } FILTER(regex(?cl, '적분'))", False),
+    "optional_inner_filter": ("?s a :Section ; rdfs:label ?sl . FILTER(regex(?sl, '미분')) OPTIONAL { ?s :hasConcept ?c . ?c rdfs:label ?cl FILTER(regex(?cl, '법')) }", True),
+    "union_outer": ("{ ?c a :Concept ; rdfs:label ?l } UNION { ?c a :Section ; rdfs:label ?l } FILTER(regex(?l, '적분'))", False),
+    "union_branches": ("{ ?c a :Concept ; rdfs:label ?l FILTER(regex(?l, '적분')) } UNION { ?c a :Section ; rdfs:label ?l FILTER(regex(?l, '미분')) }", True),
+    "minus_outer": ("?c a :Concept ; rdfs:label ?l . FILTER(regex(?l, '함수')) MINUS { ?c :prerequisiteOf ?x }", False),
+    "minus_inner": ("?c a :Concept ; rdfs:label ?l . MINUS { ?c rdfs:label ?l2 FILTER(regex(?l2, '함수')) }", True),
+    "exists": ("?s a :Section ; rdfs:label ?sl . FILTER EXISTS { ?s :hasConcept ?c . ?c rdfs:label ?cl FILTER(regex(?cl, '미분')) }", None),
+    "not_exists_and_regex": ("?s a :Section ; rdfs:label ?sl . FILTER(regex(?sl, '함수') && NOT EXISTS { ?s :hasConcept ?c . ?c rdfs:label ?cl FILTER(regex(?cl, '그래프')) })", True),
+}
+
+def _query(where):
+    return MATH_PREFIXES + "SELECT * WHERE { " + where + " }"
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_rewritten_query_matches_original(name, full_graph, plain_graph):
+    from graph_loader import get_label_index
+    where, pushed_down = CASES[name]
+    query = _query(where)
+    index = get_label_index(full_graph)
+
+    if pushed_down is not None:
+        assert (rewrite_label_filters(query, index) is not None) == pushed_down
+
+    original, _, _ = evaluate_query(full_graph, query, PreparedQueryCache(), None)
+    rewritten, _, _ = evaluate_query(full_graph, query, PreparedQueryCache(), index)
+    assert app_rows(rewritten) == app_rows(original) == plain_rows(plain_graph, query)
+
+def test_cases_return_rows(full_graph, plain_graph):
+    # Guards the table against silently comparing empty results
+    empty = {name for name, (where, _) in CASES.items() if not plain_rows(plain_graph, _query(where))}
+    assert empty == {"no_match", "case_sensitive_miss", "unescaped_caret"}
+
+@pytest.mark.parametrize("pattern, flags", [("^함수", "m"), ("줄.함수", "s"), ("^첫 줄$", "mi")])
+def test_multiline_labels(pattern, flags):
+    import rdflib
+    from graph_loader import build_label_index
+    graph = rdflib.Graph()
+    graph.parse(data='@prefix : <http://snu.ac.kr/math/> . @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> . :A rdfs:label """첫 줄\n함수""" .', format="turtle")
+    query = _query(f"?c rdfs:label ?l . FILTER(regex(?l, '{pattern}', '{flags}'))")
+    rows, _, _ = evaluate_query(graph, query, PreparedQueryCache(), build_label_index(graph))
+    assert app_rows(rows) == plain_rows(graph, query) != []
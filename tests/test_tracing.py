@@ -0,0 +1,90 @@
+import json
+import logging
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import tracing
+
+QUESTION = {"message": "합성함수의 미분법이 뭐야?"}
+SERVER_TIMING_ENTRY = re.compile(r"^[\w.-]+;dur=\d+\.\d$")
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+def _timings(header):
+    entries = header.split(", ")
+    assert all(SERVER_TIMING_ENTRY.match(entry) for entry in entries), header
+    return [entry.split(";")[0] for entry in entries]
+
+@pytest.mark.parametrize("url, headers", [("/chat?debug=1", {}), ("/chat", {"X-Debug-Trace": "1"})])
+def test_debug_chat_returns_trace_and_server_timing(client, url, headers):
+    response = client.post(url, json=QUESTION, headers=headers)
+    assert response.status_code == 200
+    names = _timings(response.headers["Server-Timing"])
+    assert names[0] == "total"
+    assert {"fast_path", "execute_sparql", "answer_llm"} <= set(names)
+    trace = response.json()["trace"]
+    assert trace["name"] == "chat" and trace["attrs"]["route"] == "fast_path"
+    assert [child["name"] for child in trace["children"]][:2] == ["fast_path", "execute_sparql"]
+
+def test_unsampled_chat_has_no_trace(client, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    response = client.post("/chat", json=QUESTION)
+    assert "Server-Timing" not in response.headers
+    assert "trace" not in response.json()
+
+def test_sampled_chat_gets_only_the_header(client, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    response = client.post("/chat", json=QUESTION)
+    assert _timings(response.headers["Server-Timing"])[0] == "total"
+    assert "trace" not in response.json()
+
+def test_server_timing_stops_at_max_depth():
+    with tracing.start_trace("chat", sampled=True) as trace:
+        with tracing.span("answer_llm"):
+            with tracing.span("generate_answer"):
+                with tracing.span("llm_call"):
+                    pass
+    assert _timings(trace.server_timing()) == ["total", "answer_llm", "generate_answer"]
+    assert _timings(trace.server_timing(max_depth=3))[-1] == "llm_call"
+
+@pytest.fixture
+def trace_log(tmp_path, monkeypatch):
+    path = tmp_path / "traces" / "trace.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_LOG_PATH", str(path))
+    monkeypatch.setattr(tracing, "TRACE_LOG_MAX_BYTES", 2000)
+    monkeypatch.setattr(tracing, "TRACE_LOG_BACKUPS", 2)
+    monkeypatch.setattr(tracing, "_trace_logger", None)
+    yield path
+    logger = logging.getLogger("math_bot.trace")
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+def test_traces_are_appended_as_json_lines(trace_log):
+    with tracing.start_trace("chat", sampled=True, mode="retrieval") as trace:
+        with tracing.span("retrieve_subgraph", rows=3):
+            pass
+    lines = trace_log.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["trace_id"] == trace.trace_id
+    assert record["attrs"] == {"mode": "retrieval"}
+    assert record["children"][0]["attrs"] == {"rows": 3}
+
+def test_trace_log_rotates_and_keeps_the_configured_backups(trace_log):
+    trace_ids = []
+    for _ in range(60):
+        with tracing.start_trace("chat", sampled=True, question="정적분" * 20) as trace:
+            trace_ids.append(trace.trace_id)
+    files = sorted(path.name for path in trace_log.parent.iterdir())
+    assert files == ["trace.jsonl", "trace.jsonl.1", "trace.jsonl.2"]
+    for path in trace_log.parent.iterdir():
+        assert path.stat().st_size <= 2000
+    # The newest traces survive rotation, one valid JSON object per line
+    kept = [json.loads(line)["trace_id"] for name in reversed(files) for line in (trace_log.parent / name).read_text(encoding="utf-8").splitlines()]
+    assert kept == trace_ids[-len(kept):]
@@ -0,0 +1,54 @@
+import json
+
+import rdflib
+import pytest
+
+pytest.importorskip("pyvis")
+from visualize_graph import expand_highlights
+
+NS = rdflib.Namespace("http://snu.ac.kr/math/")
+
+def _reference_expansion(g, highlight_labels):
+    """
+    The triple-scan expansion expand_highlights() replaces.
+    """
+    label_to_uri = {str(o): s for s, o in g.subject_objects(rdflib.RDFS.label)}
+    expanded, queue = set(highlight_labels), list(highlight_labels)
+    while queue:
+        current = queue.pop(0)
+        if current not in label_to_uri:
+            continue
+        for parent in g.subjects(None, label_to_uri[current]):
+            parent_lbl = g.value(parent, rdflib.RDFS.label)
+            if parent_lbl and str(parent_lbl) not in expanded:
+                expanded.add(str(parent_lbl))
+                queue.append(str(parent_lbl))
+    return expanded
+
+@pytest.mark.parametrize("labels", [["정적분"], ["정적분", "미분"], ["수학 개념"], ["중/소단원", "교과목"], ["없는 라벨"]])
+def test_expansion_matches_triple_scan(full_graph, plain_graph, labels):
+    assert expand_highlights(full_graph, labels) == _reference_expansion(plain_graph, labels)
+
+def test_expansion_follows_every_predicate_and_skips_unlabelled_parents():
+    g = rdflib.Graph()
+    g.add((NS.A, rdflib.RDFS.label, rdflib.Literal("A")))
+    g.add((NS.B, rdflib.RDFS.label, rdflib.Literal("B")))
+    g.add((NS.C, rdflib.RDFS.label, rdflib.Literal("C")))
+    g.add((NS.B, NS.relatedTo, NS.A)) # Not a hierarchy/prerequisite predicate
+    g.add((NS.C, NS.hasConcept, NS.B))
+    g.add((NS.Unlabelled, NS.hasConcept, NS.A))
+    assert expand_highlights(g, ["A"]) == {"A", "B", "C"} == _reference_expansion(g, ["A"])
+
+def test_expansion_sees_writes_after_the_first_call():
+    from graph_loader import VersionedGraph
+    g = VersionedGraph()
+    g.add((NS.A, rdflib.RDFS.label, rdflib.Literal("A")))
+    assert expand_highlights(g, ["A"]) == {"A"}
+    g.add((NS.B, rdflib.RDFS.label, rdflib.Literal("B")))
+    g.add((NS.B, NS.hasConcept, NS.A))
+    assert expand_highlights(g, ["A"]) == {"A", "B"}
+
+def test_visualize_ontology_renders_highlights(full_graph, tmp_path):
+    from visualize_graph import visualize_ontology
+    html = visualize_ontology(graph=full_graph, highlight_labels=["정적분"], output_file=str(tmp_path / "graph.html"), return_html_str=True)
+    assert json.dumps("정적분") in html # pyvis embeds the nodes as ASCII JSON
@@ -1,8 +1,51 @@
 import rdflib
 from pyvis.network import Network
 import os
+import sys
 import webbrowser
 
+# Add 'app' directory to path to import graph_engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from graph_engine import compile_graph, get_graph_engine
+from graph_loader import graph_version
+
+def get_parent_engine(g):
+    """
+    GraphEngine over every predicate between two URIs, for the highlight
+    expansion: any labelled subject pointing at a node counts as its parent,
+    not only the hierarchy/prerequisite edges of get_graph_engine().
+    Memoized on the graph per graph_version.
+    """
+    version = graph_version(g)
+    cached = getattr(g, "_parent_engine", None)
+    if cached is None or cached[0] != version:
+        predicates = {str(p): p for p in set(g.predicates()) if p != rdflib.RDFS.label}
+        cached = (version, compile_graph(g, predicates))
+        g._parent_engine = cached
+    return cached[1]
+
+def expand_highlights(g, highlight_labels):
+    """
+    Adds the labels of every ancestor (breadth-first over incoming edges of
+    any predicate) to the highlighted labels. Parents come from the compiled
+    all-predicate engine's reverse adjacency instead of triple scans per label.
+    """
+    engine = get_parent_engine(g)
+    expanded_labels = set(highlight_labels)
+    queue = list(highlight_labels)
+
+    while queue:
+        current_lbl = queue.pop(0)
+        for node in engine.find(current_lbl):
+            for parent in engine.neighbors(node, direction="in"):
+                parent_lbl = g.value(engine.uri(parent), rdflib.RDFS.label)
+                if parent_lbl:
+                    str_parent_lbl = str(parent_lbl)
+                    if str_parent_lbl not in expanded_labels:
+                        expanded_labels.add(str_parent_lbl)
+                        queue.append(str_parent_lbl)
+    return expanded_labels
+
 def visualize_ontology(graph=None, highlight_labels=None, output_file="math_graph.html", return_html_str=False):
     # 1. Load the Graph
     if graph:
@@ -24,33 +67,7 @@ def visualize_ontology(graph=None, highlight_labels=None, output_file="math_grap
         
         # [Visual Fix] Connectivity Enhancement: Infer Parents
         # If a Concept is highlighted, also highlight its Chapter and Subject to show connection.
-        # We need URI to query parents, so let's build a Label->URI map first.
-        label_to_uri = {}
-        for s, p, o in g.triples((None, rdflib.RDFS.label, None)):
-            label_to_uri[str(o)] = s
-            
-        # Optimization: Expand highlight_labels to include parents
-        expanded_labels = set(highlight_labels)
-        queue = list(highlight_labels)
-        
-        while queue:
-            current_lbl = queue.pop(0)
-            if current_lbl not in label_to_uri: continue
-            
-            curr_uri = label_to_uri[current_lbl]
-            
-            # Find parents: ?parent ?p ?curr_uri
-            # We are looking for structural parents (hasSection, hasChapter, hasConcept)
-            for parent in g.subjects(None, curr_uri):
-                # Check if predicate is relevant (optional, but safe to just proceed)
-                parent_lbl = g.value(parent, rdflib.RDFS.label)
-                if parent_lbl:
-                    str_parent_lbl = str(parent_lbl)
-                    if str_parent_lbl not in expanded_labels:
-                        expanded_labels.add(str_parent_lbl)
-                        queue.append(str_parent_lbl)
-        
-        highlight_labels = expanded_labels
+        highlight_labels = expand_highlights(g, highlight_labels)
 
     else:
         highlight_labels = set()
@@ -103,19 +120,18 @@ def visualize_ontology(graph=None, highlight_labels=None, output_file="math_grap
     RDF = rdflib.Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
 
     # 4. Extract Nodes & Edges
+    # Labels and groups come from the engine's interned arrays (no per-node graph lookups)
+    engine = get_graph_engine(g)
+
     def get_label(uri):
-        label = g.value(uri, RDFS.label)
-        if label:
-            return str(label)
+        i = engine.node_id(uri)
+        if i >= 0:
+            return engine.label(i)
         return str(uri).split("/")[-1]
 
     def get_group(uri):
-        types = list(g.objects(uri, RDF.type))
-        if NS.Subject in types: return "Subject"
-        if NS.Chapter in types: return "Chapter"
-        if NS.Section in types: return "Section"
-        if NS.Concept in types: return "Concept"
-        return "Other"
+        i = engine.node_id(uri)
+        return engine.node_type(i) if i >= 0 else "Other"
 
     # Define Styles (Shapes mimic the 'Mode' from the notebook)
     styles = {